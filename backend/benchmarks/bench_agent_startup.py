@@ -0,0 +1,100 @@
+"""
+Job process startup: importing agent and its plugins, prewarm, the first turns.
+
+Each run is a fresh interpreter, as a new job process is: it imports agent
+and the provider plugins (as the forkserver it is forked from has done),
+runs prewarm as the worker does before assigning a job, then one session
+takes its first turns (browse the catalog, add to the cart, check out)
+against the scripted LLM and stub TTS of bench_sessions, with no latency,
+so the turn times are the agent's own. Runs share a scratch directory
+whose catalog, search index and stock files the first run created, as on
+a worker that has been up for a while.
+
+    uv run python benchmarks/bench_agent_startup.py [runs]
+"""
+
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, "..", "src")
+LABELS = {
+    "import": "import agent",
+    "preload": "plugin preload",
+    "prewarm": "prewarm",
+    "browse": "first browse turn",
+    "add_to_cart": "first add_to_cart turn",
+    "checkout": "first checkout turn",
+}
+
+PROBE = """
+import asyncio, importlib, json, sys, time, types
+started = time.perf_counter()
+import agent
+imported = time.perf_counter()
+for module in agent.plugin_modules():
+    importlib.import_module(module)
+preloaded = time.perf_counter()
+agent.prewarm(types.SimpleNamespace(userdata={}))
+prewarmed = time.perf_counter()
+
+import logging
+logging.getLogger().setLevel(logging.WARNING)
+import merchant
+from livekit.agents import AgentSession
+from bench_sessions import InstantAudioOutput, ScriptedLLM, StubTTS, _script
+
+async def turns():
+    script = _script(merchant.CATALOG.get("hoodie-001"))
+    session = AgentSession(llm=ScriptedLLM([calls for _, calls in script]), tts=StubTTS())
+    session.output.audio = InstantAudioOutput()
+    await session.start(agent=agent.Assistant(customer_id="probe"))
+    times = []
+    for utterance, _ in script:
+        turn_started = time.perf_counter()
+        await session.run(user_input=utterance)
+        times.append(time.perf_counter() - turn_started)
+    await session.aclose()
+    return times
+
+browse, add, checkout = asyncio.run(turns())
+print(json.dumps({"import": imported - started, "preload": preloaded - imported, "prewarm": prewarmed - preloaded,
+                  "browse": browse, "add_to_cart": add, "checkout": checkout}), flush=True)
+merchant._close_orders()
+"""
+
+
+def _run(directory: str):
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join([os.path.abspath(SRC), HERE]),
+        CATALOG_SOURCE=os.path.join(directory, "catalog.json"),
+        INVENTORY_SOURCE=os.path.join(directory, "inventory.json"),
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=directory, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main() -> None:
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    with tempfile.TemporaryDirectory() as directory:
+        for name in ("catalog.json", "inventory.json"):
+            shutil.copy(os.path.join(HERE, "..", name), directory)
+        _run(directory)  # builds the shared files, as the worker's first job process would
+        results = [_run(directory) for _ in range(runs)]
+
+    print(f"median of {runs} fresh processes, {os.cpu_count()} CPUs")
+    for key, label in LABELS.items():
+        seconds = statistics.median(result[key] for result in results)
+        print(f"{label:<24} {seconds * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
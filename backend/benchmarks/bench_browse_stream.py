@@ -0,0 +1,78 @@
+"""
+Time until the first product of a large browse can be handed to TTS.
+
+Without streaming, the whole tool result is formatted and returned, and
+the LLM has to read it and speak it back before the first product is
+heard; with BROWSE_STREAMING the first product line goes to TTS as soon as
+it is formatted. LLM and TTS latency aren't measured here (they need the
+real services), so the text-mode figure is the agent's share only, and the
+tool result size shows how much the LLM has to take in first.
+
+    uv run python benchmarks/bench_browse_stream.py [n_results] [rounds]
+"""
+
+import asyncio
+import sys
+import time
+
+from synthetic import iter_products
+
+import agent
+import merchant
+from catalog import Catalog
+
+
+def _concatenated(products, offset: int, has_more: bool) -> str:
+    # browse_catalog's formatting before it moved to _product_lines
+    result = f"Found {len(products)} {'more ' if offset else ''}product(s):\n"
+    for idx, product in enumerate(products, offset + 1):
+        sizes = f", sizes: {', '.join(product['sizes'])}" if "sizes" in product else ""
+        result += f"{idx}. {product['name']} (ID: {product['id']}) - {product['description']} - {product['currency']} {product['price']}{sizes}\n"
+    if has_more:
+        result += "More products are available for this search.\n"
+    return result
+
+
+async def _first_line(products) -> str:
+    stream = agent._stream(agent._spoken_lines(products, 0, True))
+    try:
+        return await stream.__anext__()
+    finally:
+        await stream.aclose()
+
+
+def _time(fn, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    merchant.CATALOG = Catalog.from_products(iter_products(max(1000, 2 * n)))
+    merchant.CATALOG_GENERATION += 1
+    agent.BROWSE_PAGE_SIZE = n
+
+    def lookup():
+        agent._browse.cache_clear()
+        return agent._browse("hoodies", merchant.CATALOG_GENERATION)
+
+    products, has_more, result = lookup()
+    loop = asyncio.new_event_loop()
+
+    looked_up = _time(lookup, rounds)
+    concatenated = _time(lambda: _concatenated(products, 0, has_more), rounds)
+    joined = _time(lambda: "".join(agent._product_lines(products, 0, has_more)), rounds)
+    first = _time(lambda: loop.run_until_complete(_first_line(products)), rounds)
+    loop.close()
+
+    print(f"{len(products)} results, lookup {looked_up * 1e6:.0f} us (same in both modes)")
+    print(f"text mode:  whole result += {concatenated * 1e6:6.1f} us, join {joined * 1e6:6.1f} us,")
+    print(f"            then the LLM reads {len(result):,} chars (~{len(result) // 4:,} tokens) and speaks them back")
+    print(f"streaming:  first product line to TTS after {first * 1e6:6.1f} us")
+
+
+if __name__ == "__main__":
+    main()
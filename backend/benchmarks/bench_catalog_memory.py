@@ -0,0 +1,47 @@
+"""
+Per-product memory of the compact Product records vs plain product dicts.
+
+    uv run python benchmarks/bench_catalog_memory.py [n_products]
+
+Both layouts are built from the same JSON text, as if read from a catalog
+file, and measured with tracemalloc so unique strings count for both.
+"""
+
+import gc
+import json
+import sys
+import tracemalloc
+
+from synthetic import iter_products
+
+import merchant
+
+
+def _measure(build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    data = build()
+    gc.collect()
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return used
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    lines = [json.dumps(p) for p in iter_products(n)]
+
+    dict_bytes = _measure(lambda: [json.loads(line) for line in lines])
+    compact_bytes = _measure(
+        lambda: [merchant.Product.from_dict(json.loads(line)) for line in lines]
+    )
+
+    print(f"products:         {n}")
+    print(f"dict layout:      {dict_bytes / n:8.1f} bytes/product")
+    print(f"Product records:  {compact_bytes / n:8.1f} bytes/product")
+    print(f"saving:           {1 - compact_bytes / dict_bytes:8.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Stock reservations under a sale: many processes on one hot SKU.
+
+Worker processes reserve and commit one unit of the same SKU as fast as
+they can while one more process buys other, unrelated SKUs. With per-SKU
+locks the unrelated purchases shouldn't queue behind the sale; the same
+run with one global lock (every SKU sharing a single lock, as a plain
+"lock the stock file" design would) shows what they'd wait otherwise.
+Both runs check that exactly the stocked units were sold, never more.
+
+    uv run python benchmarks/bench_inventory.py [hot_processes] [seconds]
+"""
+
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import inventory
+from inventory import Inventory, OutOfStockError
+
+SKUS = 64
+HOT_STOCK = 10_000_000
+
+
+class GlobalLockInventory(Inventory):
+    """The same store, with every SKU behind one lock."""
+
+    def _after_fork(self):
+        super()._after_fork()
+        self._global = threading.Lock()
+
+    @contextmanager
+    def _locked(self, i):
+        with self._global:
+            inventory.fcntl.lockf(self._fd, inventory.fcntl.LOCK_EX, inventory.HEADER.size, 0)
+            try:
+                yield
+            finally:
+                inventory.fcntl.lockf(self._fd, inventory.fcntl.LOCK_UN, inventory.HEADER.size, 0)
+
+
+def _hot(cls, path: str, deadline: float, results):
+    store = cls(path)
+    sold = 0
+    while time.time() < deadline:
+        try:
+            store.commit(store.reserve("hot", 1, ttl=60))
+            sold += 1
+        except OutOfStockError:
+            pass
+    results.put(("hot", sold))
+
+
+def _cold(cls, path: str, deadline: float, results):
+    store = cls(path)
+    latencies = []
+    n = 0
+    while time.time() < deadline:
+        key = f"sku-{n % SKUS}"
+        started = time.perf_counter()
+        store.commit(store.reserve(key, 1, ttl=60))
+        latencies.append(time.perf_counter() - started)
+        n += 1
+    results.put(("cold", latencies))
+
+
+def _run(name: str, cls, hot_processes: int, seconds: float):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "inventory.bin")
+        stock = {"hot": HOT_STOCK, **{f"sku-{i}": HOT_STOCK for i in range(SKUS)}}
+        Inventory.create(path, stock).close()
+
+        ctx = multiprocessing.get_context("fork")
+        results = ctx.Queue()
+        deadline = time.time() + 0.5 + seconds  # let every process get going first
+        workers = [ctx.Process(target=_hot, args=(cls, path, deadline, results)) for _ in range(hot_processes)]
+        workers.append(ctx.Process(target=_cold, args=(cls, path, deadline, results)))
+        for worker in workers:
+            worker.start()
+        hot = 0
+        cold = []
+        for _ in workers:
+            kind, value = results.get()
+            if kind == "hot":
+                hot += value
+            else:
+                cold = value
+        for worker in workers:
+            worker.join()
+
+        store = Inventory(path)
+        on_hand, held = store.levels()["hot"]
+        assert held == 0 and on_hand == HOT_STOCK - hot, "oversold"
+        store.close()
+
+    cold.sort()
+    print(
+        f"{name:<8} hot {hot / seconds:9,.0f} sales/s   other SKUs {len(cold) / seconds:8,.0f} sales/s  "
+        f"p50 {statistics.median(cold) * 1e6:7.1f} us  p99 {cold[int(len(cold) * 0.99)] * 1e6:8.1f} us"
+    )
+
+
+def main() -> None:
+    hot_processes = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+    print(f"{hot_processes} processes on one hot SKU, 1 process on {SKUS} others, {os.cpu_count()} CPUs")
+    _run("per-SKU", Inventory, hot_processes, seconds)
+    _run("global", GlobalLockInventory, hot_processes, seconds)
+
+
+if __name__ == "__main__":
+    main()
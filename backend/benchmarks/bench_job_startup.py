@@ -0,0 +1,105 @@
+"""
+Startup time and memory of concurrent job processes, private vs shared state.
+
+N processes start at once in a scratch directory holding a synthetic
+catalog, as LiveKit's job processes would: each imports merchant, runs the
+merchant part of prewarm and answers one search, then waits until all of
+them are up so memory is measured while they coexist. "private" builds the
+search index in every process (as before it was shared); "shared" maps
+the index file the first process built. The catalog and stock files are
+mapped in both.
+
+PSS splits shared pages between the processes mapping them, so it is the
+fair per-process cost; private is memory no other process can use.
+
+    uv run python benchmarks/bench_job_startup.py [n_products] [jobs ...]
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from synthetic import iter_products
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+INVENTORY = os.path.abspath("inventory.json")
+
+PROBE = """
+import sys, time
+started = time.perf_counter()
+import merchant
+if sys.argv[1] == "private":
+    from search import SearchIndex
+    merchant._search = (merchant.CATALOG, SearchIndex(merchant.CATALOG))
+else:
+    merchant.prewarm()
+merchant.search_products("black hoodie", limit=5)
+print(time.perf_counter() - started, flush=True)
+sys.stdin.readline()
+"""
+
+
+def _memory(pid: int):
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return fields["Pss"], fields["Private_Clean"] + fields["Private_Dirty"]
+
+
+def _run(directory: str, mode: str, jobs: int):
+    env = dict(os.environ, PYTHONPATH=os.path.abspath(SRC), INVENTORY_SOURCE=INVENTORY)
+    started = time.perf_counter()
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-c", PROBE, mode],
+            cwd=directory,
+            env=env,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for _ in range(jobs)
+    ]
+    startups = [float(p.stdout.readline()) for p in procs]
+    all_up = time.perf_counter() - started
+    memory = [_memory(p.pid) for p in procs]
+    for p in procs:
+        p.stdin.close()
+        p.wait()
+
+    pss = sum(m[0] for m in memory) / jobs
+    private = sum(m[1] for m in memory) / jobs
+    print(
+        f"{mode:<8} {jobs:>4} jobs  startup mean {sum(startups) / jobs:6.2f}s  max {max(startups):6.2f}s  "
+        f"all up {all_up:6.2f}s  PSS {pss / 2**20:7.1f}MB  private {private / 2**20:7.1f}MB"
+    )
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    jobs = [int(arg) for arg in sys.argv[2:]] or [1, 8, 32]
+    print(f"{n:,} products, {os.cpu_count()} CPUs")
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "catalog.json"), "w") as f:
+            json.dump(list(iter_products(n)), f)
+        # Compile the catalog and create the stock and search index files up
+        # front, as the first job process's prewarm would; a one-off cost
+        subprocess.run(
+            [sys.executable, "-c", "import merchant; merchant.prewarm()"],
+            cwd=directory,
+            env=dict(os.environ, PYTHONPATH=os.path.abspath(SRC), INVENTORY_SOURCE=INVENTORY),
+            check=True,
+        )
+        for mode in ("private", "shared"):
+            for count in jobs:
+                _run(directory, mode, count)
+
+
+if __name__ == "__main__":
+    main()
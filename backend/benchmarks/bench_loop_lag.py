@@ -0,0 +1,65 @@
+"""
+Event-loop lag while many sessions place orders, sync vs async persistence.
+
+    uv run python benchmarks/bench_loop_lag.py [sessions] [orders_per_session]
+
+Each session places orders with a short think time in between, as voice
+sessions sharing one worker would. The log is fsynced on every order to
+show the cost of durable writes on the loop.
+"""
+
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import merchant
+from telemetry import LoopLagMonitor
+
+LINE_ITEMS = [{"product_id": "hoodie-001", "quantity": 1, "size": "M"}]
+
+
+async def _session(place, orders: int):
+    for _ in range(orders):
+        await asyncio.sleep(random.uniform(0, 0.01))
+        await place()
+
+
+async def _run(mode: str, sessions: int, orders: int):
+    async def place_sync():
+        merchant.create_order(LINE_ITEMS)
+
+    async def place_async():
+        await merchant.create_order_async(LINE_ITEMS)
+
+    place = place_sync if mode == "sync" else place_async
+    monitor = LoopLagMonitor(interval=0.005)
+    monitor.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(_session(place, orders) for _ in range(sessions)))
+    elapsed = time.perf_counter() - started
+    monitor.stop()
+    lag = monitor.summary()
+    print(
+        f"{mode:5}  {sessions * orders / elapsed:8.0f} orders/s  "
+        f"lag p50 {lag['p50_ms']:6.2f} ms  p99 {lag['p99_ms']:6.2f} ms  max {lag['max_ms']:6.2f} ms"
+    )
+
+
+def main() -> None:
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    orders = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    with tempfile.TemporaryDirectory() as tmp:
+        merchant.ORDERS_FILE = str(Path(tmp) / "orders.json")
+        merchant.ORDERS_LOG_FILE = str(Path(tmp) / "orders.log")
+        merchant.ORDERS_FSYNC_EVERY = 1
+        for mode in ("sync", "async"):
+            merchant._load_orders()
+            asyncio.run(_run(mode, sessions, orders))
+        merchant._close_orders()
+
+
+if __name__ == "__main__":
+    main()
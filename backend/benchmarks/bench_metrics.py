@@ -0,0 +1,114 @@
+"""
+Cost per pipeline metrics event: logging every event vs aggregating them.
+
+A voice turn produces a handful of metrics events (VAD, STT, end of
+utterance, LLM, TTS); a busy worker handles thousands a minute. The
+per-event mode is what the entrypoint did before (and does with
+METRICS_DEBUG=1): metrics.log_metrics into the worker's JSON log handler,
+plus the usage collector. The aggregated mode folds each event into the
+MetricsAggregator instead, and logs one summary line per window.
+
+    uv run python benchmarks/bench_metrics.py [events]
+
+The log is written to /dev/null, so this is the formatting and logging
+cost alone; shipping the lines off the host comes on top.
+"""
+
+import logging
+import os
+import sys
+import time
+
+from livekit.agents import metrics
+from livekit.agents.cli.log import JsonFormatter
+
+from telemetry import MetricsAggregator
+
+
+class _Counting:
+    """A stream that only counts what is written to it."""
+
+    def __init__(self):
+        self.written = 0
+        self._null = open(os.devnull, "w")  # noqa: SIM115 - the log stream for the whole run
+
+    def write(self, text: str):
+        self.written += len(text)
+        return self._null.write(text)
+
+    def flush(self):
+        pass
+
+
+def _turn(n: int):
+    """The metrics events of one voice turn."""
+    now = time.time()
+    return [
+        metrics.VADMetrics(label="silero", timestamp=now, idle_time=0.2, inference_duration_total=0.01, inference_count=32),
+        metrics.STTMetrics(
+            label="assemblyai", request_id=f"stt-{n}", timestamp=now, duration=0.0, audio_duration=2.4, streamed=True
+        ),
+        metrics.EOUMetrics(
+            timestamp=now, end_of_utterance_delay=0.45, transcription_delay=0.3,
+            on_user_turn_completed_delay=0.001, speech_id=f"speech-{n}",
+        ),
+        metrics.LLMMetrics(
+            label="google", request_id=f"llm-{n}", timestamp=now, duration=0.9, ttft=0.35 + n % 7 / 100,
+            cancelled=False, completion_tokens=42, prompt_tokens=1800, prompt_cached_tokens=0,
+            total_tokens=1842, tokens_per_second=48.0, speech_id=f"speech-{n}",
+        ),
+        metrics.TTSMetrics(
+            label="murf", request_id=f"tts-{n}", timestamp=now, ttfb=0.2 + n % 5 / 100, duration=1.1,
+            audio_duration=3.2, cancelled=False, characters_count=96, streamed=True, speech_id=f"speech-{n}",
+        ),
+    ]
+
+
+def _measure(name: str, events, handle, stream: _Counting):
+    written = stream.written
+    started = time.perf_counter()
+    for event in events:
+        handle(event)
+    elapsed = time.perf_counter() - started
+    per_event = elapsed / len(events)
+    print(
+        f"{name:<12} {per_event * 1e6:8.2f} us/event  {(stream.written - written) / len(events):8.1f} log bytes/event"
+    )
+    return per_event
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    events = [event for turn in range(n // 5) for event in _turn(turn)]
+
+    # The worker's production log setup: JSON lines at INFO
+    stream = _Counting()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JsonFormatter())
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+
+    usage = metrics.UsageCollector()
+
+    def per_event(event):
+        metrics.log_metrics(event)
+        usage.collect(event)
+
+    aggregator = MetricsAggregator()
+
+    def aggregated(event):
+        aggregator.collect(event)
+        usage.collect(event)
+
+    print(f"{len(events):,} events")
+    logged = _measure("per-event", events, per_event, stream)
+    folded = _measure("aggregated", events, aggregated, stream)
+    written = stream.written
+    aggregator.flush()
+    print(f"{'':<12} one summary line per window: {stream.written - written} bytes")
+    print(f"aggregating is {logged / folded:.1f}x cheaper per event")
+
+
+if __name__ == "__main__":
+    main()
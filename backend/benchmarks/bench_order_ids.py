@@ -0,0 +1,28 @@
+"""
+Order id generation throughput.
+
+    uv run python benchmarks/bench_order_ids.py [n_ids]
+"""
+
+import sys
+import time
+
+from merchant import OrderIdGenerator
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    next_id = OrderIdGenerator()
+
+    started = time.perf_counter()
+    for _ in range(n):
+        next_id()
+    elapsed = time.perf_counter() - started
+
+    print(f"ids:        {n}")
+    print(f"throughput: {n / elapsed:,.0f} ids/s ({elapsed / n * 1e9:.0f} ns/id)")
+    print(f"example:    {next_id()}")
+
+
+if __name__ == "__main__":
+    main()
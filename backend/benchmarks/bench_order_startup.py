@@ -0,0 +1,76 @@
+"""
+Import time and memory of merchant against order histories of growing size.
+
+Each size gets a scratch directory holding that many stored orders; a fresh
+interpreter then imports merchant there, as a new job process would.
+
+    uv run python benchmarks/bench_order_startup.py [n_orders ...]
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from synthetic import iter_orders
+
+from order_store import OrderStore
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+CATALOG = os.path.abspath("catalog.json")
+
+# Memory from /proc where available: ru_maxrss survives exec on Linux, so it
+# would report this (large) parent process instead of the child. Private
+# memory leaves out page-cache pages of mapped files, which processes share.
+PROBE = """
+import resource, sys, time
+started = time.perf_counter()
+import merchant
+elapsed = time.perf_counter() - started
+merchant.get_orders("customer-1", limit=10)
+try:
+    with open("/proc/self/status") as f:
+        status = {line.split(":")[0]: int(line.split()[1]) * 1024 for line in f if line.startswith(("VmHWM", "RssAnon"))}
+    peak, private = status["VmHWM"], status["RssAnon"]
+except OSError:
+    peak = private = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+print(elapsed, peak, private)
+"""
+
+
+def _probe(directory: str):
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.path.abspath(SRC),
+        CATALOG_SOURCE=CATALOG,
+        CATALOG_FILE=os.path.join(directory, "catalog.bin"),
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=directory, env=env, capture_output=True, text=True, check=True
+    )
+    elapsed, peak, private = out.stdout.split()
+    return float(elapsed), int(peak), int(private)
+
+
+def main() -> None:
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    print(f"{'orders':>10}  {'import':>9}  {'peak RSS':>9}  {'private':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        _probe(directory)
+        elapsed, peak, private = _probe(directory)
+        print(f"{0:>10,}  {elapsed * 1e3:7.0f}ms  {peak / 2**20:7.1f}MB  {private / 2**20:7.1f}MB")
+
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "orders.json"), "w") as f:
+                json.dump(list(iter_orders(n)), f)
+            # Let the store settle on disk first (an upgrade is a one-off cost)
+            OrderStore(os.path.join(directory, "orders.json"), os.path.join(directory, "orders.log")).close()
+            _probe(directory)  # warm the page cache and compile the catalog
+            elapsed, peak, private = _probe(directory)
+            print(f"{n:>10,}  {elapsed * 1e3:7.0f}ms  {peak / 2**20:7.1f}MB  {private / 2**20:7.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
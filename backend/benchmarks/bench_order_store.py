@@ -0,0 +1,98 @@
+"""
+Order storage backends at scale: JSON snapshot + log vs SQLite.
+
+Both stores start from n existing orders spread over 10,000 customers
+(bulk-loaded, not timed), then take batches of new orders the way the order
+writer thread hands them over, and answer customer history and last-order
+lookups.
+
+    uv run python benchmarks/bench_order_store.py [n_orders]
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from synthetic import iter_orders
+
+from order_db import SqliteOrderStore
+from order_store import OrderStore
+
+CUSTOMERS = 10_000
+BATCH = 16  # orders per writer batch under moderate load
+NEW_ORDERS = 20_000
+LOOKUPS = 2_000
+
+
+def _seed_json(directory: str, n: int):
+    with open(os.path.join(directory, "orders.json"), "w") as f:
+        json.dump(list(iter_orders(n, CUSTOMERS)), f)
+    # Settle the snapshot into the store's own layout before timing anything
+    OrderStore(os.path.join(directory, "orders.json"), os.path.join(directory, "orders.log")).close()
+
+
+def _seed_sqlite(directory: str, n: int):
+    store = SqliteOrderStore(os.path.join(directory, "orders.db"))
+    for start in range(0, n, 10_000):
+        store.append_many(list(iter_orders(min(n - start, 10_000), CUSTOMERS, start)))
+    store.close()
+
+
+def _run(name: str, open_store, n: int):
+    started = time.perf_counter()
+    store = open_store()
+    opened = time.perf_counter() - started
+
+    new = list(iter_orders(NEW_ORDERS, CUSTOMERS, n))
+    started = time.perf_counter()
+    for i in range(0, len(new), BATCH):
+        store.append_many(new[i : i + BATCH])
+    writes = NEW_ORDERS / (time.perf_counter() - started)
+
+    customers = [f"customer-{random.randrange(CUSTOMERS)}" for _ in range(LOOKUPS)]
+    started = time.perf_counter()
+    for customer in customers:
+        store.for_customer(customer, limit=10)
+    history = (time.perf_counter() - started) / LOOKUPS
+
+    started = time.perf_counter()
+    for _ in range(LOOKUPS):
+        store.last()
+    last = (time.perf_counter() - started) / LOOKUPS
+
+    # The JSON store does this every ORDERS_COMPACT_EVERY orders
+    started = time.perf_counter()
+    store.compact()
+    compacted = time.perf_counter() - started
+    store.close()
+
+    print(
+        f"{name:<7} open {opened * 1e3:8.0f} ms  write {writes:8,.0f} orders/s  "
+        f"history(10) {history * 1e6:7.0f} us  last {last * 1e6:6.0f} us  compact {compacted * 1e3:6.0f} ms"
+    )
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"{n:,} existing orders, {NEW_ORDERS:,} new in batches of {BATCH}, {CUSTOMERS:,} customers")
+    with tempfile.TemporaryDirectory() as directory:
+        _seed_json(directory, n)
+        _run(
+            "json",
+            lambda: OrderStore(
+                os.path.join(directory, "orders.json"),
+                os.path.join(directory, "orders.log"),
+                compact_every=NEW_ORDERS + 1,  # keep the full-snapshot rewrite out of the timing
+            ),
+            n,
+        )
+    with tempfile.TemporaryDirectory() as directory:
+        _seed_sqlite(directory, n)
+        _run("sqlite", lambda: SqliteOrderStore(os.path.join(directory, "orders.db")), n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+search_products latency on a synthetic catalog.
+
+    uv run python benchmarks/bench_search.py [n_products]
+
+Fails if any query, multi-term ones included, takes a millisecond or more.
+"""
+
+import sys
+import time
+
+from synthetic import iter_products
+
+from catalog import Catalog
+from search import SearchIndex
+
+QUERIES = [
+    ("black hoodies", {"category": "hoodie", "color": "black"}),
+    ("warm zip jacket", {}),
+    ("hoody", {}),
+    ("leathr bag", {}),
+    ("canvas tote under 1000", {"max_price": 1000}),
+    ("ceramic mug", {"category": "mug"}),
+]
+BUDGET = 0.001  # seconds per query
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    catalog = Catalog.from_products(iter_products(n))
+
+    started = time.perf_counter()
+    index = SearchIndex(catalog)
+    print(f"products: {n}, index build: {time.perf_counter() - started:.2f}s")
+
+    slow = []
+    for query, filters in QUERIES:
+        repeat = 200
+        started = time.perf_counter()
+        for _ in range(repeat):
+            positions = index.search(query, limit=10, **filters)
+        elapsed = (time.perf_counter() - started) / repeat
+        print(f"{query!r:28} {elapsed * 1e6:9.1f} us  ({len(positions)} results)")
+        if elapsed >= BUDGET:
+            slow.append(query)
+    assert not slow, f"over {BUDGET * 1e6:.0f} us: {', '.join(slow)}"
+
+
+if __name__ == "__main__":
+    main()
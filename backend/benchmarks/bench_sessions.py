@@ -0,0 +1,316 @@
+"""
+Offline load test: many concurrent voice sessions in one worker process.
+
+Each simulated caller runs AgentSessions with the real Assistant and its
+tools, back to back, against local stand-ins for the model providers:
+
+    LLM  a scripted model that browses for a product, adds it to the cart
+         and checks out, then answers with a line of text; it waits
+         --llm-latency before every response, as a hosted model would
+    STT  each user turn is handed to the session as text --stt-latency
+         after the caller "stops speaking"
+    TTS  synthesizes a short burst of silence after --tts-latency, into an
+         audio output that plays it out instantly
+
+so the only real work in the process is the agent framework, our tools and
+the order and stock stores. The number of callers rises level by level;
+each level reports tool latency percentiles (tool call to tool output, as
+the session sees it), event-loop lag and orders per second. A worker is
+saturated at the level where adding callers no longer adds orders per
+second, or where the loop lag p99 goes over --max-lag.
+
+    uv run python benchmarks/bench_sessions.py [--levels 1,4,16,64,128] [--seconds 10]
+                                               [--llm-latency 0.5] [--stt-latency 0.3] [--tts-latency 0.2]
+                                               [--max-lag 0.05]
+
+Orders and stock go to a scratch directory; every product is stocked
+deep enough that no checkout runs out.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from livekit import rtc
+from livekit.agents import AgentSession, APIConnectOptions, llm, tts, utils
+from livekit.agents.types import DEFAULT_API_CONNECT_OPTIONS
+from livekit.agents.voice.io import AudioOutput, AudioOutputCapabilities
+
+import merchant
+from agent import Assistant
+from telemetry import LoopLagMonitor, _percentile
+
+SAMPLE_RATE = 24000
+SPOKEN = 0.02  # seconds of silence the stub TTS returns per request
+STOCK = 10_000_000
+COLORS = ("black", "white", "navy", "grey", "blue", "green", "red", "brown")
+
+
+class ScriptedLLM(llm.LLM):
+    """
+    Plays back a fixed list of tool calls for each user turn.
+
+    Turn n of the script is used for the n-th user message in the chat; its
+    calls are issued one response at a time, each after the previous call's
+    output is in the chat, and once they have all run the reply is text.
+    """
+
+    def __init__(self, script: List[List[Tuple[str, Dict]]], latency: float = 0.0):
+        super().__init__()
+        self.script = script
+        self.latency = latency
+
+    def chat(
+        self,
+        *,
+        chat_ctx: llm.ChatContext,
+        tools=None,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+        **kwargs,
+    ) -> llm.LLMStream:
+        return _ScriptedStream(self, chat_ctx=chat_ctx, tools=tools or [], conn_options=conn_options)
+
+
+class _ScriptedStream(llm.LLMStream):
+    async def _run(self):
+        items = self.chat_ctx.items
+        users = [i for i, item in enumerate(items) if item.type == "message" and item.role == "user"]
+        turn = self._llm.script[len(users) - 1] if 0 < len(users) <= len(self._llm.script) else []
+        done = sum(1 for item in items[users[-1] if users else 0 :] if item.type == "function_call")
+        await asyncio.sleep(self._llm.latency)
+
+        request_id = utils.shortuuid()
+        if done < len(turn):
+            name, arguments = turn[done]
+            call = llm.FunctionToolCall(name=name, arguments=json.dumps(arguments), call_id=utils.shortuuid())
+            delta = llm.ChoiceDelta(role="assistant", tool_calls=[call])
+        else:
+            delta = llm.ChoiceDelta(role="assistant", content="Is there anything else I can help with?")
+        self._event_ch.send_nowait(llm.ChatChunk(id=request_id, delta=delta))
+
+
+class StubTTS(tts.TTS):
+    """Silence, after a fixed delay."""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__(capabilities=tts.TTSCapabilities(streaming=False), sample_rate=SAMPLE_RATE, num_channels=1)
+        self.latency = latency
+
+    def synthesize(self, text: str, *, conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS):
+        return _SilentStream(tts=self, input_text=text, conn_options=conn_options)
+
+
+class _SilentStream(tts.ChunkedStream):
+    async def _run(self, output_emitter: tts.AudioEmitter):
+        await asyncio.sleep(self._tts.latency)
+        output_emitter.initialize(
+            request_id=utils.shortuuid(), sample_rate=SAMPLE_RATE, num_channels=1, mime_type="audio/pcm"
+        )
+        output_emitter.push(bytes(int(SAMPLE_RATE * SPOKEN) * 2))
+        output_emitter.flush()
+
+
+class InstantAudioOutput(AudioOutput):
+    """Takes the agent's audio and reports it played as soon as it is flushed."""
+
+    def __init__(self):
+        super().__init__(label="InstantAudioOutput", capabilities=AudioOutputCapabilities(pause=True))
+        self._pushed = 0.0
+
+    async def capture_frame(self, frame: rtc.AudioFrame):
+        await super().capture_frame(frame)
+        self._pushed += frame.duration
+
+    def flush(self):
+        super().flush()
+        self._finish(interrupted=False)
+
+    def clear_buffer(self):
+        self._finish(interrupted=True)
+
+    def _finish(self, interrupted: bool):
+        if self._pending_playback_count:
+            self.on_playback_finished(playback_position=self._pushed, interrupted=interrupted)
+        self._pushed = 0.0
+
+
+def _script(product: Dict) -> List[Tuple[str, List[Tuple[str, Dict]]]]:
+    """What a caller says and the tool calls the model makes for it, per turn."""
+    color = next((color for color in COLORS if color in product["name"].lower()), "")
+    query = f"{color} {product['category']}".strip()
+    size = product["sizes"][0] if product.get("sizes") else None
+    return [
+        (f"show me {query}s", [("browse_catalog", {"search_query": query})]),
+        (f"I'll take the {product['name']}", [("add_to_cart", {"product_identifier": product["id"], "size": size})]),
+        ("that's all, please place the order", [("checkout", {})]),
+    ]
+
+
+class Load:
+    """Tool latencies and orders placed by every session in one level."""
+
+    def __init__(self):
+        self.tools: Dict[str, List[float]] = defaultdict(list)
+        self.orders = 0
+        self.conversations = 0
+        self.errors = 0
+
+
+async def _conversation(caller: int, products: List[Dict], args, load: Load):
+    script = _script(random.choice(products))
+    session = AgentSession(
+        llm=ScriptedLLM([calls for _, calls in script], latency=args.llm_latency),
+        tts=StubTTS(latency=args.tts_latency),
+    )
+
+    @session.on("function_tools_executed")
+    def _on_tools(ev):
+        for call, output in ev.zipped():
+            load.tools[call.name].append(output.created_at - call.created_at)
+            if call.name == "checkout" and output.output.startswith("Order "):
+                load.orders += 1
+
+    assistant = Assistant(customer_id=f"caller-{caller}")
+    session.output.audio = InstantAudioOutput()
+    await session.start(agent=assistant)
+    try:
+        for utterance, _ in script:
+            await asyncio.sleep(args.stt_latency)
+            await session.run(user_input=utterance)
+        load.conversations += 1
+    finally:
+        await assistant.release_cart()
+        await session.aclose()
+
+
+async def _caller(caller: int, products: List[Dict], args, load: Load, deadline: float):
+    while time.perf_counter() < deadline:
+        try:
+            await _conversation(caller, products, args, load)
+        except Exception as e:
+            load.errors += 1
+            print(f"caller {caller}: {e!r}")
+
+
+async def _level(callers: int, products: List[Dict], args) -> Dict:
+    load = Load()
+    loop_lag = LoopLagMonitor(interval=0.01)
+    loop_lag.start()
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(_caller(caller, products, args, load, started + args.seconds) for caller in range(callers))
+    )
+    elapsed = time.perf_counter() - started
+    loop_lag.stop()
+
+    lag = loop_lag.summary()
+    every = sorted(latency for latencies in load.tools.values() for latency in latencies)
+    result = {
+        "callers": callers,
+        "orders_per_s": load.orders / elapsed,
+        "conversations": load.conversations,
+        "errors": load.errors,
+        "tool_p50_ms": _percentile(every, 0.50) * 1000,
+        "tool_p99_ms": _percentile(every, 0.99) * 1000,
+        "lag_p50_ms": lag["p50_ms"],
+        "lag_p99_ms": lag["p99_ms"],
+        "lag_max_ms": lag["max_ms"],
+    }
+    print(
+        f"{callers:>6} {result['orders_per_s']:9.2f} {load.conversations:>6} {load.errors:>5}  "
+        f"tool p50 {result['tool_p50_ms']:7.1f} p99 {result['tool_p99_ms']:7.1f} ms  "
+        f"lag p50 {lag['p50_ms']:6.1f} p99 {lag['p99_ms']:7.1f} max {lag['max_ms']:7.1f} ms",
+        flush=True,
+    )
+    for name, latencies in sorted(load.tools.items()):
+        latencies.sort()
+        print(
+            f"{'':>6} {name:<22} {len(latencies):>6} calls  p50 {_percentile(latencies, 0.50) * 1000:7.1f}  "
+            f"p99 {_percentile(latencies, 0.99) * 1000:7.1f} ms"
+        )
+    return result
+
+
+def saturation(results: List[Dict], max_lag_ms: float, min_gain: float = 0.1):
+    """
+    The level a worker saturates at.
+
+    That is the last level before orders per second stopped growing by at
+    least min_gain of the growth in callers, or the first whose loop lag
+    p99 went over budget; None if every level kept scaling.
+    """
+    for previous, result in zip(results, results[1:]):
+        if result["lag_p99_ms"] > max_lag_ms:
+            return result["callers"]
+        wanted = result["callers"] / previous["callers"] - 1
+        gained = result["orders_per_s"] / max(previous["orders_per_s"], 1e-9) - 1
+        if gained < wanted * min_gain:
+            return previous["callers"]
+    if results and results[0]["lag_p99_ms"] > max_lag_ms:
+        return results[0]["callers"]
+    return None
+
+
+async def _main(args):
+    levels = [int(level) for level in args.levels.split(",")]
+    products = list(merchant.CATALOG)
+    print(
+        f"{len(products)} products, {os.cpu_count()} CPUs, {args.seconds:g}s per level, latency "
+        f"LLM {args.llm_latency:g}s STT {args.stt_latency:g}s TTS {args.tts_latency:g}s\n"
+        f"{'callers':>6} {'orders/s':>9} {'convs':>6} {'errs':>5}"
+    )
+    # One conversation first, so imports and first-use caches aren't in the first level
+    await _conversation(0, products, args, Load())
+    results = [await _level(callers, products, args) for callers in levels]
+    saturated = saturation(results, args.max_lag * 1000)
+    if saturated is None:
+        print(f"\nStill scaling at {levels[-1]} callers; try higher levels")
+    else:
+        print(f"\nSaturates at about {saturated} concurrent callers")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--levels", default="1,4,16,64,128", help="concurrent callers per level, comma separated")
+    parser.add_argument("--seconds", type=float, default=10.0, help="how long each level runs")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds before each LLM response")
+    parser.add_argument("--stt-latency", type=float, default=0.3, help="seconds before each transcript")
+    parser.add_argument("--tts-latency", type=float, default=0.2, help="seconds before each synthesis")
+    parser.add_argument("--max-lag", type=float, default=0.05, help="loop lag p99 a healthy worker stays under")
+    args = parser.parse_args()
+
+    # The framework logs every turn; that is not what's being measured
+    logging.getLogger("livekit.agents").setLevel(logging.WARNING)
+    logging.getLogger("agent").setLevel(logging.WARNING)
+    logging.getLogger("telemetry").setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as directory:
+        merchant.ORDERS_FILE = os.path.join(directory, "orders.json")
+        merchant.ORDERS_LOG_FILE = os.path.join(directory, "orders.log")
+        merchant.INVENTORY_SOURCE = os.path.join(directory, "inventory.json")
+        merchant.INVENTORY_FILE = os.path.join(directory, "inventory.bin")
+        with open(merchant.INVENTORY_SOURCE, "w") as f:
+            json.dump(
+                {
+                    product["id"]: dict.fromkeys(product["sizes"], STOCK) if product.get("sizes") else STOCK
+                    for product in merchant.CATALOG
+                },
+                f,
+            )
+        merchant._load_inventory()
+        merchant._load_orders()
+        try:
+            asyncio.run(_main(args))
+        finally:
+            merchant._close_orders()
+            merchant._close_inventory()
+
+
+if __name__ == "__main__":
+    main()
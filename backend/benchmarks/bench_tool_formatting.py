@@ -0,0 +1,93 @@
+"""
+Formatting cost of tool responses: rendering every call vs cached snippets.
+
+Times the text-building part of browse_catalog (a page of products),
+checkout (a confirmation) and get_order_history (the last order),
+each as the tools did it before (re-formatting every field on every call)
+and with merchant's cached product snippets and order summaries.
+
+    uv run python benchmarks/bench_tool_formatting.py [page_size] [rounds]
+"""
+
+import sys
+import time
+
+import agent
+import merchant
+
+ORDER = {
+    "id": "order_20250101_120000_000a1b2c3d40000",
+    "items": [
+        {"product_id": "hoodie-001", "product_name": "Black Logo Hoodie", "quantity": 1, "size": "L", "price": 1499, "line_total": 1499},
+        {"product_id": "mug-001", "product_name": "Stoneware Coffee Mug", "quantity": 2, "size": None, "price": 800, "line_total": 1600},
+        {"product_id": "cap-001", "product_name": "Classic Baseball Cap", "quantity": 1, "size": None, "price": 599, "line_total": 599},
+    ],
+    "total": 3698,
+    "currency": "INR",
+    "created_at": "2025-01-01T12:00:00.000000",
+    "status": "completed",
+}
+
+
+def _browse_before(products) -> str:
+    result = f"Found {len(products)} product(s):\n"
+    for idx, product in enumerate(products, 1):
+        sizes = f", sizes: {', '.join(product['sizes'])}" if "sizes" in product else ""
+        result += f"{idx}. {product['name']} (ID: {product['id']}) - {product['description']} - {product['currency']} {product['price']}{sizes}\n"
+    return result
+
+
+def _confirmation_before(order) -> str:
+    result = f"Order {order['id']} created successfully!\n"
+    for item in order["items"]:
+        size_info = f" (size {item['size']})" if item.get("size") else ""
+        result += f"- {item['quantity']} x {item['product_name']}{size_info}: {order['currency']} {item['line_total']}\n"
+    result += f"Total: {order['currency']} {order['total']}"
+    return result
+
+
+def _history_before(order) -> str:
+    result = f"Your last order ({order['id']}):\n"
+    for item in order["items"]:
+        size_info = f" (size {item['size']})" if item.get("size") else ""
+        result += f"- {item['quantity']} x {item['product_name']}{size_info}: {order['currency']} {item['line_total']}\n"
+    result += f"Total: {order['currency']} {order['total']}\n"
+    result += f"Placed at: {order['created_at']}"
+    return result
+
+
+def _confirmation_after(order) -> str:
+    return f"Order {order['id']} created successfully!\n{merchant.order_summary(order)}"
+
+
+def _history_after(order) -> str:
+    return f"Your last order ({order['id']}):\n{merchant.order_summary(order)}\nPlaced at: {order['created_at']}"
+
+
+def _time(fn, rounds: int) -> float:
+    fn()  # fill caches
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds
+
+
+def main() -> None:
+    page = int(sys.argv[1]) if len(sys.argv) > 1 else agent.BROWSE_PAGE_SIZE
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    products = merchant.list_products(limit=page)
+
+    cases = [
+        (f"browse_catalog ({len(products)} products)", lambda: _browse_before(products),
+         lambda: "".join(agent._product_lines(products, 0, False))),
+        ("checkout", lambda: _confirmation_before(ORDER), lambda: _confirmation_after(ORDER)),
+        ("get_order_history", lambda: _history_before(ORDER), lambda: _history_after(ORDER)),
+    ]
+    for name, before, after in cases:
+        assert before() == after(), name
+        t_before, t_after = _time(before, rounds), _time(after, rounds)
+        print(f"{name:<30} {t_before * 1e9:7.0f} ns -> {t_after * 1e9:6.0f} ns  ({t_before / t_after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Benchmark suite for the merchant and agent tool hot paths.
+
+Every case runs against synthetic catalogs of each size (and order
+histories of each size, for the order paths) and is reported in seconds
+per operation, lower being better. Results are written as JSON, keyed by
+case and parameters; pass an earlier run as the baseline and any case that
+got slower by more than the tolerance is flagged and fails the run, so a
+regression is caught before deploy.
+
+    uv run python benchmarks/suite.py [--sizes 24,10000,1000000] [--histories 0,10000,100000]
+                                      [--output results.json] [--baseline baseline.json] [--tolerance 0.25]
+
+Cases:
+    list_products       each filter combination, first page
+    tool.browse_catalog a search the tool hasn't cached, formatted for the LLM
+    tool.checkout       add_to_cart twice, then checkout (one order)
+    tool.get_order_history
+    create_order        one order, with the history already stored
+    load_orders         opening the order store, with the history already stored
+
+Times are the median of several batches, each long enough to swamp timer
+overhead. The 1M-product catalog takes a few minutes to build and index.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict
+
+from synthetic import iter_orders, iter_products
+
+import agent
+import merchant
+from catalog import Catalog
+
+FILTERS = {
+    "none": {},
+    "category": {"category": "hoodie"},
+    "color": {"color": "black"},
+    "category+color": {"category": "tshirt", "color": "white"},
+    "max_price": {"max_price": 600},
+    "category+max_price": {"category": "mug", "max_price": 700},
+}
+BROWSE_QUERIES = ["black hoodies", "mugs under 700", "leathr bag", "something warm"]
+CUSTOMER = "customer-1"
+BATCHES = 5
+BATCH_TIME = 0.05  # seconds per batch, at least
+
+
+def _measure(fn: Callable[[], object], batches: int = BATCHES) -> float:
+    """Median seconds per call over several batches."""
+    fn()  # warm up
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= BATCH_TIME:
+            break
+        loops = loops * 2 if elapsed <= 0 else max(loops * 2, int(loops * BATCH_TIME / elapsed) + 1)
+    per_call = [elapsed / loops]
+    for _ in range(batches - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        per_call.append((time.perf_counter() - started) / loops)
+    return statistics.median(per_call)
+
+
+class Suite:
+    def __init__(self):
+        self.results: Dict[str, float] = {}
+        self.loop = asyncio.new_event_loop()
+
+    def record(self, name: str, seconds: float):
+        self.results[name] = seconds
+        print(f"{name:<70} {seconds * 1e6:12.1f} us", flush=True)
+
+    def run(self, coro_fn):
+        return lambda: self.loop.run_until_complete(coro_fn())
+
+    def use_catalog(self, n: int):
+        """Swap in a synthetic catalog of n products, indexed on first search."""
+        merchant.CATALOG = Catalog.from_products(iter_products(n))
+        merchant.CATALOG_GENERATION += 1
+        merchant._search = None
+        agent._browse.cache_clear()
+
+    def use_history(self, directory: str, n: int):
+        """Point the order store at a scratch directory holding n orders."""
+        history = tempfile.mkdtemp(prefix=f"history-{n}-", dir=directory)
+        merchant.ORDERS_FILE = os.path.join(history, "orders.json")
+        merchant.ORDERS_LOG_FILE = os.path.join(history, "orders.log")
+        with open(merchant.ORDERS_FILE, "w") as f:
+            json.dump(list(iter_orders(n)), f)
+        merchant._load_orders()  # settle the snapshot into the store's own layout
+
+    def catalog_cases(self, n: int):
+        for name, filters in FILTERS.items():
+            self.record(
+                f"list_products[products={n},filters={name}]",
+                _measure(lambda filters=filters: merchant.list_products(filters, limit=10)),
+            )
+
+        assistant = agent.Assistant(customer_id=CUSTOMER)
+        for query in BROWSE_QUERIES:
+            async def browse(query=query):
+                agent._browse.cache_clear()
+                return await assistant.browse_catalog(None, query)
+
+            self.record(f"tool.browse_catalog[products={n},query={query}]", _measure(self.run(browse)))
+
+        product_ids = [merchant.CATALOG[0]["id"], merchant.CATALOG[len(merchant.CATALOG) - 1]["id"]]
+
+        async def checkout():
+            for product_id in product_ids:
+                product = merchant.CATALOG.get(product_id)
+                await assistant.add_to_cart(None, product_id, 1, "M" if "sizes" in product else None)
+            return await assistant.checkout(None)
+
+        self.record(f"tool.checkout[products={n},items=2]", _measure(self.run(checkout)))
+
+    def history_cases(self, h: int):
+        # Before any orders are placed, so the log replayed on open is always empty
+        opens = []
+        for _ in range(BATCHES):
+            merchant._close_orders()  # flushing the log isn't part of opening it
+            started = time.perf_counter()
+            merchant._load_orders()
+            opens.append(time.perf_counter() - started)
+        self.record(f"load_orders[orders={h}]", statistics.median(opens))
+
+        assistant = agent.Assistant(customer_id=CUSTOMER)
+        self.record(
+            f"tool.get_order_history[orders={h}]",
+            _measure(self.run(lambda: assistant.get_order_history(None))),
+        )
+        line_items = [{"product_id": "hoodie-001", "quantity": 1, "size": "M"}]
+        self.record(
+            f"create_order[orders={h}]",
+            _measure(lambda: merchant.create_order(line_items, customer_id=CUSTOMER)),
+        )
+
+
+def _meta() -> Dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> int:
+    """Print how each case moved against the baseline; get the number of regressions."""
+    regressions = 0
+    print(f"\n{'case':<70} {'baseline':>12} {'now':>12}  change")
+    for name, seconds in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:<70} {'-':>12} {seconds * 1e6:10.1f}us  new")
+            continue
+        change = seconds / before - 1
+        flag = ""
+        if change > tolerance:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{name:<70} {before * 1e6:10.1f}us {seconds * 1e6:10.1f}us  {change:+7.1%}{flag}")
+    for name in baseline.keys() - results.keys():
+        print(f"{name:<70} {baseline[name] * 1e6:10.1f}us {'-':>12}  not run")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="24,10000,1000000", help="catalog sizes, comma separated")
+    parser.add_argument("--histories", default="0,10000,100000", help="order history sizes, comma separated")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="slowdown allowed before a case fails")
+    args = parser.parse_args()
+
+    suite = Suite()
+    catalog = merchant.CATALOG
+    with tempfile.TemporaryDirectory() as directory:
+        # Stock isn't tracked for synthetic products; keep it out of the repo's stock file
+        merchant.INVENTORY_SOURCE = os.path.join(directory, "inventory.json")
+        merchant.INVENTORY_FILE = os.path.join(directory, "inventory.bin")
+        merchant._load_inventory()
+        suite.use_history(directory, 0)
+        for n in (int(size) for size in args.sizes.split(",")):
+            suite.use_catalog(n)
+            suite.catalog_cases(n)
+
+        merchant.CATALOG = catalog
+        merchant._search = None
+        for h in (int(size) for size in args.histories.split(",")):
+            suite.use_history(directory, h)
+            suite.history_cases(h)
+        merchant._close_orders()
+
+    report = {"meta": _meta(), "results": suite.results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(suite.results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{regressions} case(s) slower than the baseline by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Synthetic data for the benchmarks: catalogs of any size built by cloning
+the hardcoded products with unique ids, names and image URLs, and order
+histories of any size spread over a fixed set of customers.
+"""
+
+from collections.abc import Iterator
+from typing import Dict
+
+import merchant
+
+_SEED = [dict(p) for p in merchant.CATALOG]
+
+
+def iter_products(n: int) -> Iterator[Dict]:
+    """Yield n product dicts shaped exactly like the hardcoded catalog."""
+    for i in range(n):
+        product = dict(_SEED[i % len(_SEED)])
+        if "sizes" in product:
+            product["sizes"] = list(product["sizes"])
+        batch = i // len(_SEED)
+        if batch:
+            product["id"] = f"{product['id']}-{batch}"
+            product["name"] = f"{product['name']} {batch}"
+            product["price"] += batch % 500
+            product["image"] = product["image"].replace("?w=", f"-{batch}?w=")
+        yield product
+
+
+def iter_orders(n: int, customers: int = 10_000, start: int = 0) -> Iterator[Dict]:
+    """Yield n single-item orders shaped like create_order's, with ascending ids."""
+    for i in range(start, start + n):
+        yield {
+            "id": f"order_20250101_000000_000{i:016x}",
+            "items": [
+                {
+                    "product_id": "hoodie-001",
+                    "product_name": "Black Logo Hoodie",
+                    "quantity": 1,
+                    "size": "M",
+                    "price": 1499,
+                    "line_total": 1499,
+                }
+            ],
+            "total": 1499,
+            "currency": "INR",
+            "created_at": f"2025-01-01T00:00:00.{i % 1_000_000:06d}",
+            "status": "completed",
+            "customer_id": f"customer-{i % customers}",
+        }
@@ -1,8 +1,31 @@
+import asyncio
+import gc
+import importlib
+import inspect
 import logging
-from typing import Optional
+import os
+import re
+import sys
+from functools import lru_cache
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 from dotenv import load_dotenv
-from merchant import list_products, create_order, get_last_order
+from merchant import (
+    HoldsFullError,
+    list_products,
+    search_products,
+    create_order_async,
+    get_orders,
+    catalog_status,
+    start_catalog_watcher,
+    product_snippet,
+    order_summary,
+    quote_order,
+    release_reservations,
+    reserve_items,
+    resolve_product,
+    prewarm as prewarm_merchant,
+)
 from livekit.agents import (
     Agent,
     AgentSession,
@@ -17,16 +40,145 @@ from livekit.agents import (
     function_tool,
     RunContext
 )
-from livekit.plugins import murf, silero, google, deepgram, assemblyai, noise_cancellation
-from livekit.plugins.turn_detector.multilingual import MultilingualModel
+from livekit.agents.telemetry import tracer
+from telemetry import METRICS_DEBUG, TOOL_METRICS, LoopLagMonitor, MetricsAggregator, instrument_tool, set_tracer, span
 
 logger = logging.getLogger("agent")
 
 load_dotenv(".env")
 
+# Search keywords in priority order: the first category and the first color
+# found in a query win. Matching is by substring, so "hoodies" finds "hoodie".
+CATEGORY_KEYWORDS = {
+    "mug": "mug",
+    "cup": "mug",
+    "hoodie": "hoodie",
+    "tshirt": "tshirt",
+    "t-shirt": "tshirt",
+    "tee": "tshirt",
+    "shirt": "tshirt",
+    "cap": "cap",
+    "hat": "cap",
+    "bag": "bag",
+}
+COLOR_KEYWORDS = {
+    "black": "black",
+    "white": "white",
+    "blue": "blue",
+    "grey": "grey",
+    "gray": "grey",
+    "red": "red",
+    "brown": "brown",
+    "green": "green",
+    "navy": "navy",
+}
+_CATEGORY_RANK = {keyword: rank for rank, keyword in enumerate(CATEGORY_KEYWORDS)}
+_COLOR_RANK = {keyword: rank for rank, keyword in enumerate(COLOR_KEYWORDS)}
+# One pass over the query finds every keyword and the "under N" price limit
+_QUERY_PATTERN = re.compile(
+    r"under\s+(?P<max_price>\d+)|"
+    + "|".join(re.escape(k) for k in sorted({**CATEGORY_KEYWORDS, **COLOR_KEYWORDS}, key=len, reverse=True))
+)
+
+
+def parse_query(query: str) -> Dict:
+    """Turn a lowercased search query into list_products filters."""
+    filters = {}
+    category = color = None
+    for match in _QUERY_PATTERN.finditer(query):
+        if match.group("max_price"):
+            filters.setdefault("max_price", int(match.group("max_price")))
+            continue
+        keyword = match.group()
+        if keyword in _CATEGORY_RANK and (category is None or _CATEGORY_RANK[keyword] < _CATEGORY_RANK[category]):
+            category = keyword
+        elif keyword in _COLOR_RANK and (color is None or _COLOR_RANK[keyword] < _COLOR_RANK[color]):
+            color = keyword
+    if category:
+        filters["category"] = CATEGORY_KEYWORDS[category]
+    if color:
+        filters["color"] = COLOR_KEYWORDS[color]
+    return filters
+
+
+# Products read out per browse turn; the rest wait for show_more_products
+BROWSE_PAGE_SIZE = 5
+# Read browse results straight to TTS as they are formatted, instead of
+# waiting for the LLM to take in the whole list and speak it back
+BROWSE_STREAMING = os.getenv("BROWSE_STREAMING", "0") == "1"
+BROWSE_STREAMED_NOTE = (
+    "These products are being read out to the user right now. "
+    "Do not list them again; just ask which one they would like.\n"
+)
+
+# Model providers. Only the plugins of the configured ones are imported,
+# see plugin_modules; each takes a second or so to import.
+STT_PROVIDER = os.getenv("STT_PROVIDER", "assemblyai")  # "assemblyai" or "deepgram"
+NOISE_CANCELLATION = os.getenv("NOISE_CANCELLATION", "1") == "1"
+
+
+def _product_lines(products: Sequence, offset: int, has_more: bool) -> Iterator[str]:
+    """Yield the tool text for a page of products, line by line."""
+    yield f"Found {len(products)} {'more ' if offset else ''}product(s):\n"
+    for idx, product in enumerate(products, offset + 1):
+        yield f"{idx}. {product_snippet(product)}\n"
+    if has_more:
+        yield "More products are available for this search.\n"
+
+
+def _spoken_lines(products: Sequence, offset: int, has_more: bool) -> Iterator[str]:
+    """Yield a page of products the way the instructions say to read them out."""
+    yield f"I found {len(products)} {'more ' if offset else ''}product{'s' if len(products) != 1 else ''}. "
+    for idx, product in enumerate(products, offset + 1):
+        sizes = f", available in sizes {', '.join(product['sizes'])}" if "sizes" in product else ""
+        yield f"Number {idx}, {product['name']}, {product['price']} rupees{sizes}. "
+    if has_more:
+        yield "There are more if you'd like to hear them. "
+    yield "Which one would you like?"
+
+
+async def _stream(lines: Iterable[str]) -> AsyncIterator[str]:
+    """Hand lines to TTS one at a time, so it starts on the first one."""
+    for line in lines:
+        yield line
+        await asyncio.sleep(0)
+
+
+@lru_cache(maxsize=1024)
+def _browse(query: str, catalog_generation: int, offset: int = 0) -> Tuple[Tuple, bool, str]:
+    """
+    Look up and format one page of products for a normalized query.
+
+    Cached per catalog generation, so repeated voice queries skip parsing and
+    searching entirely and a catalog reload never serves stale results.
+
+    Returns:
+        The page of products, whether more are available, and the tool text
+    """
+    with span("parse_query"):
+        filters = parse_query(query)
+    with span("search_products"):
+        searched = bool(filters or search_products(query, limit=1))
+        if searched:
+            products = search_products(query, filters, limit=BROWSE_PAGE_SIZE + 1, offset=offset)
+    if not searched:
+        # Nothing specific asked for or found: offer the whole catalog
+        with span("list_products"):
+            products = list_products(limit=BROWSE_PAGE_SIZE + 1, offset=offset)
+    has_more = len(products) > BROWSE_PAGE_SIZE
+    products = tuple(products[:BROWSE_PAGE_SIZE])
+
+    if not products:
+        if offset:
+            return products, False, "There are no more products for that search."
+        return products, False, "No products found matching those criteria."
+
+    # Format products for the LLM with product IDs, numbered across pages
+    return products, has_more, "".join(_product_lines(products, offset, has_more))
+
 
 class Assistant(Agent):
-    def __init__(self) -> None:
+    def __init__(self, customer_id: Optional[str] = None) -> None:
         super().__init__(
             instructions="""You are a friendly voice shopping assistant for EchoMart, an e-commerce store. The user is interacting with you via voice.
             
@@ -38,12 +190,15 @@ class Assistant(Agent):
             - For each product, say: "Number [1/2/3], [Product Name], [Price] rupees, available in sizes [sizes]"
             - Example: "Number 1, Black Logo Hoodie, 1499 rupees, available in sizes S, M, L, XL"
             - After listing products, ALWAYS ask: "Which one would you like?"
+            - If the results say more products are available, offer to list more and use the show_more_products tool when the user wants them
             
-            PLACING ORDERS:
+            ADDING TO CART:
             - When user selects a product, ask for size if applicable: "What size would you like?"
             - Then confirm: "Great! You want [quantity] [product name] in size [size]. That will be [price] rupees. Should I add this to your cart?"
-            - After confirmation, use create_new_order tool with the product ID (like hoodie-001)
-            - After placing order, say: "Perfect! I've added [product name] to your cart for [price] rupees. Would you like to see more products or complete your order?"
+            - After confirmation, use add_to_cart tool with the product ID (like hoodie-001)
+            - After adding, say: "Perfect! I've added [product name] to your cart for [price] rupees. Would you like to see more products or complete your order?"
+            - If the user wants several products at once, call add_to_cart for each of them in the same turn
+            - Use view_cart when the user asks what is in their cart, and update_cart_item or remove_from_cart when they change their mind
             
             COLLECTING DELIVERY INFORMATION:
             - After ALL products are selected and user is done shopping, ask: "Would you like to complete your order?"
@@ -51,10 +206,11 @@ class Assistant(Agent):
               1. "What's your full name?"
               2. "What's your delivery address?"
               3. "Any special delivery instructions?"
+            - Then use the checkout tool once; it places a single order for everything in the cart
             - Confirm all details: "Great! I have your order for [items] being delivered to [name] at [address]. Your order is confirmed!"
             
             IMPORTANT RULES:
-            - Use product IDs for orders: hoodie-001, tshirt-002, mug-003, cap-001, bag-002
+            - Use product IDs for the cart: hoodie-001, tshirt-002, mug-003, cap-001, bag-002
             - Never repeat the same product multiple times in one response
             - Keep responses natural and conversational for voice
             - No emojis, asterisks, or complex formatting
@@ -63,9 +219,21 @@ class Assistant(Agent):
             Product categories: mugs, hoodies, t-shirts, caps, bags""",
         )
         self.last_products = []  # Track last shown products
+        self.browse_cursor = None  # (query, offset) of the next page to show
         self.customer_info = {}  # Track customer delivery info
+        self.customer_id = customer_id  # Key for this caller's orders (participant or room identity)
+        self.cart: Dict[Tuple[str, Optional[str]], int] = {}  # (product_id, size) -> quantity
+        self.holds: Dict[Tuple[str, Optional[str]], List] = {}  # (product_id, size) -> stock reservations
+
+    def _present(self, context: RunContext, products: Sequence, offset: int, has_more: bool, result: str) -> str:
+        """Start reading a page of products aloud when streaming; get the tool result."""
+        if not BROWSE_STREAMING or not products:
+            return result
+        context.session.say(_stream(_spoken_lines(products, offset, has_more)))
+        return result + BROWSE_STREAMED_NOTE
 
     @function_tool
+    @instrument_tool
     async def browse_catalog(
         self,
         context: RunContext,
@@ -83,144 +251,240 @@ class Assistant(Agent):
         """
         logger.info(f"Browsing catalog with query: {search_query}")
         
-        # Parse the query
-        query_lower = search_query.lower()
-        filters = {}
-        
-        # Extract category
-        if "mug" in query_lower or "cup" in query_lower:
-            filters["category"] = "mug"
-        elif "hoodie" in query_lower:
-            filters["category"] = "hoodie"
-        elif "tshirt" in query_lower or "t-shirt" in query_lower or "tee" in query_lower or "shirt" in query_lower:
-            filters["category"] = "tshirt"
-        elif "cap" in query_lower or "hat" in query_lower:
-            filters["category"] = "cap"
-        elif "bag" in query_lower:
-            filters["category"] = "bag"
-        
-        # Extract color
-        colors = ["black", "white", "blue", "grey", "gray", "red", "brown", "green", "navy"]
-        for color in colors:
-            if color in query_lower:
-                filters["color"] = color if color != "gray" else "grey"
-                break
-        
-        # Extract price limit
-        import re
-        price_match = re.search(r'under\s+(\d+)', query_lower)
-        if price_match:
-            filters["max_price"] = int(price_match.group(1))
+        query = " ".join(search_query.lower().split())
+        products, has_more, result = _browse(query, catalog_status()["generation"])
+
+        # Store products for reference
+        if products:
+            self.last_products = list(products)
+        self.browse_cursor = (query, len(products)) if has_more else None
+
+        return self._present(context, products, 0, has_more, result)
+
+    @function_tool
+    @instrument_tool
+    async def show_more_products(self, context: RunContext):
+        """Show the next products for the last catalog search.
         
-        products = list_products(filters if filters else None)
+        Use this tool when browse_catalog said more products are available and the user wants to hear them.
+        """
+        logger.info(f"Showing more products: cursor={self.browse_cursor}")
         
-        if not products:
-            return "No products found matching those criteria."
+        if self.browse_cursor is None:
+            return "There are no more products for that search."
         
-        # Store products for reference
-        self.last_products = products
+        query, offset = self.browse_cursor
+        products, has_more, result = _browse(query, catalog_status()["generation"], offset)
         
-        # Format products for the LLM with product IDs
-        result = f"Found {len(products)} product(s):\n"
-        for idx, product in enumerate(products, 1):
-            sizes = f", sizes: {', '.join(product['sizes'])}" if "sizes" in product else ""
-            result += f"{idx}. {product['name']} (ID: {product['id']}) - {product['description']} - {product['currency']} {product['price']}{sizes}\n"
+        # Keep numbering continuous so "number 7" still resolves
+        self.last_products.extend(products)
+        self.browse_cursor = (query, offset + len(products)) if has_more else None
         
-        return result
+        return self._present(context, products, offset, has_more, result)
+
+    def _cart_items(self) -> List[Dict]:
+        return [
+            {"product_id": product_id, "quantity": quantity, "size": size}
+            for (product_id, size), quantity in self.cart.items()
+        ]
+
+    def _cart_text(self) -> str:
+        if not self.cart:
+            return "The cart is empty."
+        return f"Cart:\n{order_summary(quote_order(self._cart_items()))}"
+
+    def _resolve(self, product_identifier: str):
+        product = resolve_product(product_identifier, self.last_products)
+        if product is not None:
+            logger.info(f"Resolved '{product_identifier}' to product_id: {product['id']}")
+        return product
+
+    @staticmethod
+    def _not_found(product_identifier: str) -> str:
+        return f"Sorry, I couldn't find a product matching '{product_identifier}'. Please ask the user which product they mean."
 
     @function_tool
-    async def create_new_order(
+    @instrument_tool
+    async def add_to_cart(
         self,
         context: RunContext,
         product_identifier: str,
         quantity: int = 1,
         size: Optional[str] = None,
     ):
-        """Place an order for a product.
+        """Add a product to the user's cart.
         
-        Use this tool when the user confirms they want to buy a product.
+        Use this tool when the user confirms they want a product. Nothing is ordered until checkout.
         
         Args:
             product_identifier: The product ID (e.g., "hoodie-001") OR product name (e.g., "Black Logo Hoodie") OR index number (e.g., "1" for first product shown)
-            quantity: Number of items to order (default: 1)
+            quantity: Number of items to add (default: 1)
             size: Size for apparel items (S, M, L, XL)
         """
-        logger.info(f"Creating order: product_identifier={product_identifier}, quantity={quantity}, size={size}")
+        logger.info(f"Adding to cart: product_identifier={product_identifier}, quantity={quantity}, size={size}")
         
-        # Try to resolve product_identifier to actual product_id
-        product_id = product_identifier
+        if quantity < 1:
+            return "The quantity to add must be at least 1; use update_cart_item to take items out of the cart."
+        product = self._resolve(product_identifier)
+        if product is None:
+            return self._not_found(product_identifier)
+        size = size.strip().upper() if size and "sizes" in product else None
+        key = (product["id"], size)
         
-        # Check if it's an index number
-        if product_identifier.isdigit():
-            idx = int(product_identifier) - 1
-            if 0 <= idx < len(self.last_products):
-                product_id = self.last_products[idx]["id"]
-                logger.info(f"Resolved index {product_identifier} to product_id: {product_id}")
+        try:
+            # Check the product, size and quantity now rather than at checkout,
+            # and hold the stock so it can't sell out while the user shops
+            quote_order([{"product_id": key[0], "quantity": self.cart.get(key, 0) + quantity, "size": size}])
+            with span("reserve_items"):
+                held = reserve_items([{"product_id": key[0], "quantity": quantity, "size": size}])
+        except ValueError as e:
+            return f"Sorry, I couldn't add that to the cart: {e}"
+        except HoldsFullError:
+            return "Sorry, I can't reserve that right now; please try again in a moment."
+        self.cart[key] = self.cart.get(key, 0) + quantity
+        self.holds[key] = self.holds.get(key, []) + held
         
-        # Check if it's a product name - search in last shown products first
-        elif not product_identifier.startswith(("mug-", "hoodie-", "tshirt-", "cap-", "bag-")):
-            # Search in last shown products
-            for product in self.last_products:
-                if product["name"].lower() == product_identifier.lower():
-                    product_id = product["id"]
-                    logger.info(f"Resolved name '{product_identifier}' to product_id: {product_id}")
-                    break
-            else:
-                # Search in all products
-                all_products = list_products()
-                for product in all_products:
-                    if product["name"].lower() == product_identifier.lower():
-                        product_id = product["id"]
-                        logger.info(f"Resolved name '{product_identifier}' to product_id: {product_id}")
-                        break
+        size_info = f" (size {size})" if size else ""
+        return f"Added {quantity} x {product['name']}{size_info} to the cart.\n{self._cart_text()}"
+
+    @function_tool
+    @instrument_tool
+    async def update_cart_item(
+        self,
+        context: RunContext,
+        product_identifier: str,
+        quantity: int,
+        size: Optional[str] = None,
+    ):
+        """Change how many of a product are in the cart; a quantity of 0 removes it.
         
+        Args:
+            product_identifier: The product ID, name or index number, as for add_to_cart
+            quantity: The new quantity
+            size: The size of the cart item to change, if the product has sizes
+        """
+        logger.info(f"Updating cart: product_identifier={product_identifier}, quantity={quantity}, size={size}")
+        
+        product = self._resolve(product_identifier)
+        if product is None:
+            return self._not_found(product_identifier)
+        keys = [key for key in self.cart if key[0] == product["id"] and (not size or key[1] == size.strip().upper())]
+        if not keys:
+            return f"{product['name']} isn't in the cart.\n{self._cart_text()}"
+        if len(keys) > 1:
+            sizes = ", ".join(key[1] for key in keys)
+            return f"The cart has {product['name']} in sizes {sizes}; ask the user which size to change."
+        key = keys[0]
+        current = self.cart[key]
+        if quantity > current:
+            try:
+                with span("reserve_items"):
+                    held = reserve_items([{"product_id": key[0], "quantity": quantity - current, "size": key[1]}])
+            except ValueError as e:
+                return f"Sorry, I couldn't change the quantity: {e}"
+            except HoldsFullError:
+                return "Sorry, I can't reserve more right now; please try again in a moment."
+            self.holds[key] = self.holds.get(key, []) + held
+        elif quantity < current:
+            self.holds[key] = release_reservations(self.holds.get(key, ()), current - max(quantity, 0))
+        if quantity <= 0:
+            del self.cart[key]
+            self.holds.pop(key, None)
+        else:
+            self.cart[key] = quantity
+        return self._cart_text()
+
+    @function_tool
+    @instrument_tool
+    async def remove_from_cart(
+        self,
+        context: RunContext,
+        product_identifier: str,
+        size: Optional[str] = None,
+    ):
+        """Remove a product from the cart.
+        
+        Args:
+            product_identifier: The product ID, name or index number, as for add_to_cart
+            size: Only remove this size of the product (default: all sizes)
+        """
+        logger.info(f"Removing from cart: product_identifier={product_identifier}, size={size}")
+        
+        product = self._resolve(product_identifier)
+        if product is None:
+            return self._not_found(product_identifier)
+        keys = [key for key in self.cart if key[0] == product["id"] and (not size or key[1] == size.strip().upper())]
+        if not keys:
+            return f"{product['name']} isn't in the cart.\n{self._cart_text()}"
+        for key in keys:
+            del self.cart[key]
+            release_reservations(self.holds.pop(key, ()))
+        return f"Removed {product['name']} from the cart.\n{self._cart_text()}"
+
+    @function_tool
+    @instrument_tool
+    async def view_cart(self, context: RunContext):
+        """List what is in the user's cart and the total.
+        
+        Use this tool when the user asks what is in their cart.
+        """
+        return self._cart_text()
+
+    @function_tool
+    @instrument_tool
+    async def checkout(self, context: RunContext):
+        """Place one order for everything in the cart.
+        
+        Use this tool once, after the user has finished shopping and given their delivery details.
+        """
+        logger.info(f"Checking out {len(self.cart)} cart item(s)")
+        
+        if not self.cart:
+            return "The cart is empty, so there is nothing to order yet."
+        reservations = [reservation for held in self.holds.values() for reservation in held]
         try:
-            line_items = [
-                {
-                    "product_id": product_id,
-                    "quantity": quantity,
-                    "size": size,
-                }
-            ]
-            
-            order = create_order(line_items)
-            
-            # Format order confirmation
-            result = f"Order {order['id']} created successfully!\n"
-            for item in order["items"]:
-                size_info = f" (size {item['size']})" if item.get("size") else ""
-                result += f"- {item['quantity']} x {item['product_name']}{size_info}: {order['currency']} {item['line_total']}\n"
-            result += f"Total: {order['currency']} {order['total']}"
-            
-            return result
+            with span("create_order"):
+                order = await create_order_async(self._cart_items(), customer_id=self.customer_id, reservations=reservations)
         except Exception as e:
             logger.error(f"Error creating order: {e}")
             return f"Sorry, I couldn't create the order: {str(e)}"
+        self.cart.clear()
+        self.holds.clear()
+        
+        # Format order confirmation
+        return f"Order {order['id']} created successfully!\n{order_summary(order)}"
+
+    async def release_cart(self):
+        """Give back the stock held by a cart that was never checked out."""
+        for held in self.holds.values():
+            release_reservations(held)
+        self.holds.clear()
+        self.cart.clear()
 
     @function_tool
+    @instrument_tool
     async def get_order_history(self, context: RunContext):
         """Check the most recent order.
         
         Use this tool when the user asks what they just bought or about their last order.
         """
-        logger.info("Checking last order")
+        logger.info(f"Checking last order for customer {self.customer_id}")
         
-        order = get_last_order()
+        orders = []
+        if self.customer_id:
+            # Reads the order files under a shared lock: keep it off the event loop
+            with span("get_orders"):
+                orders = await asyncio.to_thread(get_orders, self.customer_id, limit=1)
+        order = orders[0] if orders else None
         
         if not order:
             return "You haven't placed any orders yet."
         
         # Format order details
-        result = f"Your last order ({order['id']}):\n"
-        for item in order["items"]:
-            size_info = f" (size {item['size']})" if item.get("size") else ""
-            result += f"- {item['quantity']} x {item['product_name']}{size_info}: {order['currency']} {item['line_total']}\n"
-        result += f"Total: {order['currency']} {order['total']}\n"
-        result += f"Placed at: {order['created_at']}"
-        
-        return result
+        return f"Your last order ({order['id']}):\n{order_summary(order)}\nPlaced at: {order['created_at']}"
 
     @function_tool
+    @instrument_tool
     async def save_customer_info(
         self,
         context: RunContext,
@@ -248,9 +512,58 @@ class Assistant(Agent):
         return f"Customer information saved: {name}, {address}"
 
 
+TURN_DETECTOR = "livekit.plugins.turn_detector.multilingual"
+
+
+def plugin_modules() -> List[str]:
+    """The provider plugins this worker is configured to use."""
+    if STT_PROVIDER not in ("assemblyai", "deepgram"):
+        raise ValueError(f"Unknown STT_PROVIDER {STT_PROVIDER!r}; expected 'assemblyai' or 'deepgram'")
+    plugins = ["silero", "google", "murf", STT_PROVIDER]
+    if NOISE_CANCELLATION:
+        plugins.append("noise_cancellation")
+    return [TURN_DETECTOR] + [f"livekit.plugins.{plugin}" for plugin in plugins]
+
+
+def load_plugins():
+    """
+    Import the provider plugins this worker is configured to use.
+
+    LiveKit plugins must be imported on the main thread. Job processes do
+    this in prewarm, which costs nothing when the forkserver they were
+    forked from has already imported them (see __main__).
+    """
+    for module in plugin_modules():
+        importlib.import_module(module)
+
+
+def _stt():
+    if STT_PROVIDER == "deepgram":
+        from livekit.plugins import deepgram
+
+        return deepgram.STT()
+    from livekit.plugins import assemblyai
+
+    return assemblyai.STT()
+
+
 def prewarm(proc: JobProcess):
+    load_plugins()
+    from livekit.plugins import silero
+
     proc.userdata["vad"] = silero.VAD.load()
 
+    # Attach to the catalog, search and name indexes, stock and order store
+    # every job process shares
+    prewarm_merchant()
+    # Pick up catalog and inventory.json edits without restarting the worker
+    start_catalog_watcher()
+    # Everything loaded so far lives as long as the process: collect once now
+    # and keep it out of later collections, or the first full collection
+    # (typically during the first turn) walks all of it
+    gc.collect()
+    gc.freeze()
+
 
 async def entrypoint(ctx: JobContext):
     # Logging setup
@@ -258,12 +571,16 @@ async def entrypoint(ctx: JobContext):
     ctx.log_context_fields = {
         "room": ctx.room.name,
     }
+    logger.info(f"Catalog: {catalog_status()}")
+
+    from livekit.plugins import google, murf
+    from livekit.plugins.turn_detector.multilingual import MultilingualModel
 
     # Set up a voice AI pipeline using AssemblyAI, Google Gemini, Murf, and the LiveKit turn detector
     session = AgentSession(
         # Speech-to-text (STT) is your agent's ears, turning the user's speech into text that the LLM can understand
         # See all available models at https://docs.livekit.io/agents/models/stt/
-        stt=assemblyai.STT(),
+        stt=_stt(),
         # A Large Language Model (LLM) is your agent's brain, processing user input and generating a response
         # See all available models at https://docs.livekit.io/agents/models/llm/
         llm=google.LLM(
@@ -299,15 +616,32 @@ async def entrypoint(ctx: JobContext):
     # Metrics collection, to measure pipeline performance
     # For more information, see https://docs.livekit.io/agents/build/metrics/
     usage_collector = metrics.UsageCollector()
+    # Our tools' latency, per tool and per step, traced under the framework's tool spans
+    set_tracer(tracer)
+    # Event-loop lag shows whether anything (e.g. our tools) blocks the worker
+    loop_lag = LoopLagMonitor()
+    loop_lag.start()
+
+    # Per-event logging is a debug mode; normally a summary, with our tools'
+    # latency, is logged every minute
+    pipeline_metrics = MetricsAggregator(tools=TOOL_METRICS)
+    pipeline_metrics.start()
 
     @session.on("metrics_collected")
     def _on_metrics_collected(ev: MetricsCollectedEvent):
-        metrics.log_metrics(ev.metrics)
+        if METRICS_DEBUG:
+            metrics.log_metrics(ev.metrics)
+        pipeline_metrics.collect(ev.metrics)
         usage_collector.collect(ev.metrics)
 
     async def log_usage():
         summary = usage_collector.get_summary()
         logger.info(f"Usage: {summary}")
+        pipeline_metrics.stop()
+        pipeline_metrics.flush()
+        loop_lag.stop()
+        logger.info(f"Event loop lag: {loop_lag.summary()}")
+        logger.info(f"Tool latency: {TOOL_METRICS.summary()}")
 
     ctx.add_shutdown_callback(log_usage)
 
@@ -319,19 +653,40 @@ async def entrypoint(ctx: JobContext):
     # # Start the avatar and wait for it to join
     # await avatar.start(session, room=ctx.room)
 
+    # Orders are kept per caller; the room stands in until the caller joins
+    assistant = Assistant(customer_id=ctx.room.name)
+    # Stock held by an abandoned cart goes back now rather than when it lapses
+    ctx.add_shutdown_callback(assistant.release_cart)
+
+    room_input_options = RoomInputOptions()
+    if NOISE_CANCELLATION:
+        from livekit.plugins import noise_cancellation
+
+        # For telephony applications, use `BVCTelephony` for best results
+        room_input_options = RoomInputOptions(noise_cancellation=noise_cancellation.BVC())
+
     # Start the session, which initializes the voice pipeline and warms up the models
     await session.start(
-        agent=Assistant(),
+        agent=assistant,
         room=ctx.room,
-        room_input_options=RoomInputOptions(
-            # For telephony applications, use `BVCTelephony` for best results
-            noise_cancellation=noise_cancellation.BVC(),
-        ),
+        room_input_options=room_input_options,
     )
 
     # Join the room and connect to the user
     await ctx.connect()
+    participant = await ctx.wait_for_participant()
+    assistant.customer_id = participant.identity
 
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
+    if "download-files" in sys.argv:
+        load_plugins()
+    else:
+        # Its model runs in the worker's inference process, which only
+        # serves runners registered before the worker starts
+        importlib.import_module(TURN_DETECTOR)
+    options = {}
+    if "preload_modules" in inspect.signature(WorkerOptions).parameters:
+        # The forkserver imports the plugins once and job processes share them
+        options["preload_modules"] = plugin_modules()
+    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm, **options))
@@ -0,0 +1,409 @@
+"""
+Product catalog storage.
+
+The catalog is compiled from catalog.json into a flat binary file that
+worker processes mmap, so opening it doesn't depend on catalog size and all
+processes on a host share the same page-cached pages. Product records are
+only decoded when a lookup or filter actually returns them.
+
+File layout (offsets are absolute, arrays use native byte order):
+
+    header    magic, version, count and section offsets
+    records   compact JSON per product, in catalog order
+    entries   count x (record offset, record length, price)
+    ids       count x (id offset, id length, position), sorted by id
+    prices    count ascending prices, then count positions in that order
+    postings  sorted position arrays per category and per color
+    meta      JSON {"category": {value: [offset, count]}, "color": {...}}
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping, Sequence
+from itertools import compress
+from typing import Any, ClassVar, Dict, Iterable, Iterator, List, Optional, Tuple
+
+MAGIC = b"ECATALOG"
+VERSION = 1
+# magic, version, count, entries, ids, prices, meta offset, meta length
+HEADER = struct.Struct("=8sIIQQQQQ")
+ENTRY = struct.Struct("=QII")
+ID_ENTRY = struct.Struct("=QII")
+MAX_DECODED = 10_000  # decoded products kept per catalog
+
+
+class Product(Mapping):
+    """
+    Compact, read-only product record.
+
+    Fields live in __slots__ rather than a per-product dict, repeated strings
+    (category, color, currency) are interned and identical size lists share
+    one tuple, so a large catalog costs a fraction of the plain-dict layout.
+    It still behaves like the product dicts callers already use:
+    product["name"], product.get("color"), "sizes" in product, dict(product).
+    """
+
+    __slots__ = ("category", "color", "currency", "description", "id", "image", "name", "price", "sizes")
+
+    # The fields in the order they are listed and serialized
+    FIELDS: ClassVar[Tuple[str, ...]] = (
+        "id", "name", "description", "price", "currency", "category", "color", "image", "sizes",
+    )
+    _shared_sizes: ClassVar[Dict[Tuple[str, ...], Tuple[str, ...]]] = {}
+
+    def __init__(
+        self,
+        id: str,  # noqa: A002 - matches the catalog's field name
+        name: str,
+        description: str,
+        price: int,
+        currency: str,
+        category: str,
+        color: str = "",
+        image: str = "",
+        sizes: Optional[Iterable[str]] = None,
+    ):
+        self.id = id
+        self.name = name
+        self.description = description
+        self.price = price
+        self.currency = sys.intern(currency)
+        self.category = sys.intern(category)
+        self.color = sys.intern(color)
+        self.image = image
+        if sizes is not None:
+            sizes = tuple(sizes)
+            sizes = self._shared_sizes.setdefault(sizes, sizes)
+        self.sizes = sizes
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> "Product":
+        """Build a product from a catalog record, ignoring fields it doesn't have."""
+        if isinstance(data, cls):
+            return data
+        return cls(**{field: data[field] for field in cls.FIELDS if field in data})
+
+    def _fields(self) -> Iterator[str]:
+        for field in self.FIELDS:
+            if field != "sizes" or self.sizes is not None:
+                yield field
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.FIELDS:
+            value = getattr(self, key)
+            if value is not None or key != "sizes":
+                return value
+        raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        if key == "sizes":
+            return self.sizes is not None
+        return key in self.FIELDS
+
+    def __iter__(self) -> Iterator[str]:
+        return self._fields()
+
+    def __len__(self) -> int:
+        return len(self.FIELDS) - (self.sizes is None)
+
+    def __repr__(self) -> str:
+        return f"Product({dict(self)!r})"
+
+
+def _align(out: bytearray) -> int:
+    out.extend(b"\0" * (-len(out) % 8))
+    return len(out)
+
+
+REQUIRED_FIELDS = ("id", "name", "description", "price", "currency", "category")
+TEXT_FIELDS = ("id", "name", "description", "currency", "category", "color", "image")
+
+
+def normalize_product(data: Any, pos: int) -> Dict[str, Any]:
+    """
+    Check one catalog record and keep only the fields Product has.
+
+    Args:
+        data: The record, e.g. one object of catalog.json
+        pos: Its position in the catalog, for error messages
+
+    Returns:
+        The record as a plain dict, ready to encode
+
+    Raises:
+        ValueError: if a field is missing or has the wrong type
+    """
+    if not isinstance(data, Mapping):
+        raise ValueError(f"Catalog record {pos} is not an object")
+    where = f"Catalog record {pos} ({data.get('id')!r})"
+    missing = [field for field in REQUIRED_FIELDS if data.get(field) is None]
+    if missing:
+        raise ValueError(f"{where} is missing {', '.join(missing)}")
+    product = {field: data[field] for field in Product.FIELDS if data.get(field) is not None}
+    for field in TEXT_FIELDS:
+        if not isinstance(product.get(field, ""), str):
+            raise ValueError(f"{where}: {field} must be a string")
+    if not product["id"]:
+        raise ValueError(f"{where}: id must not be empty")
+    price = product["price"]
+    if isinstance(price, float) and price.is_integer():
+        price = product["price"] = int(price)
+    if isinstance(price, bool) or not isinstance(price, int) or not 0 <= price < 2**32:
+        raise ValueError(f"{where}: price must be a whole number of at least 0")
+    sizes = product.get("sizes")
+    if sizes is not None:
+        if not isinstance(sizes, (list, tuple)) or not all(isinstance(size, str) for size in sizes):
+            raise ValueError(f"{where}: sizes must be a list of strings")
+        product["sizes"] = list(sizes)
+    return product
+
+
+def encode_catalog(products: Iterable[Mapping]) -> bytes:
+    """
+    Serialize products into the binary catalog layout.
+
+    Raises:
+        ValueError: if a record is invalid (see normalize_product) or an id repeats
+    """
+    products = [normalize_product(p, pos) for pos, p in enumerate(products)]
+    count = len(products)
+    out = bytearray(HEADER.size)
+
+    entries = []
+    for product in products:
+        record = json.dumps(product, separators=(",", ":"), ensure_ascii=False).encode()
+        entries.append((len(out), len(record), product["price"]))
+        out += record
+
+    entries_offset = _align(out)
+    for entry in entries:
+        out += ENTRY.pack(*entry)
+
+    # Ids are stored once more next to the index so lookups don't decode records
+    ids = sorted((p["id"].encode(), pos) for pos, p in enumerate(products))
+    for (key, _), (next_key, pos) in zip(ids, ids[1:]):
+        if key == next_key:
+            raise ValueError(f"Catalog record {pos} repeats the id {key.decode()!r}")
+    id_offsets = []
+    for key, _ in ids:
+        id_offsets.append(len(out))
+        out += key
+    ids_offset = _align(out)
+    for (key, pos), offset in zip(ids, id_offsets):
+        out += ID_ENTRY.pack(offset, len(key), pos)
+
+    prices_offset = _align(out)
+    by_price = sorted(range(count), key=lambda pos: entries[pos][2])
+    out += array("I", (entries[pos][2] for pos in by_price)).tobytes()
+    out += array("I", by_price).tobytes()
+
+    meta: Dict[str, Dict[str, List[int]]] = {"category": {}, "color": {}}
+    for facet, postings in meta.items():
+        values: Dict[str, List[int]] = {}
+        for pos, product in enumerate(products):
+            values.setdefault(str(product.get(facet, "")).lower(), []).append(pos)
+        for value, positions in values.items():
+            postings[value] = [_align(out), len(positions)]
+            out += array("I", positions).tobytes()
+
+    meta_bytes = json.dumps(meta, separators=(",", ":")).encode()
+    meta_offset = _align(out)
+    out += meta_bytes
+
+    HEADER.pack_into(
+        out, 0, MAGIC, VERSION, count, entries_offset, ids_offset, prices_offset, meta_offset, len(meta_bytes)
+    )
+    return bytes(out)
+
+
+def write_atomic(data: bytes, path: str):
+    """Write a file atomically, so readers never see a partial file."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def write_catalog(products: Iterable[Mapping], path: str):
+    """Write a catalog file atomically, so readers never see a partial file."""
+    write_atomic(encode_catalog(products), path)
+
+
+def compile_catalog(source: str, path: str):
+    """
+    Compile a JSON array of products (catalog.json) into a catalog file.
+
+    Raises:
+        ValueError: if the source isn't a JSON array of valid products; the
+            catalog file is left as it was
+    """
+    with open(source, "r", encoding="utf-8") as f:
+        products = json.load(f)
+    if not isinstance(products, list):
+        raise ValueError(f"{source} must hold a JSON array of products")
+    write_catalog(products, path)
+
+
+class Catalog(Sequence):
+    """
+    Read-only product catalog over an encoded catalog buffer.
+
+    Lookups by id binary-search the sorted id table, facet filters walk the
+    smallest posting array and max_price is a bisect over the price array.
+    Products are decoded on first access and cached per position, up to
+    MAX_DECODED of them.
+    """
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        view = memoryview(buffer)
+        magic, version, count, entries, ids, prices, meta, meta_len = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a catalog file (or written by another version)")
+        self._count = count
+        self._entries = entries
+        self._ids = ids
+        self._prices = view[prices : prices + 4 * count].cast("I")
+        self._by_price = view[prices + 4 * count : prices + 8 * count].cast("I")
+        # Each entry's price, by position: the last of its four uint32 fields
+        self._price_at = view[entries : entries + ENTRY.size * count].cast("I")[3::4]
+        self._postings = {
+            facet: {value: view[offset : offset + 4 * n].cast("I") for value, (offset, n) in values.items()}
+            for facet, values in json.loads(bytes(view[meta : meta + meta_len])).items()
+        }
+        self._decoded: Dict[int, Product] = {}
+        self.path: Optional[str] = None
+        # Size and mtime of the file it was mapped from, so derived files
+        # (the search index) can tell which catalog they were built for
+        self.signature: Tuple[int, int] = (len(buffer), 0)
+
+    @classmethod
+    def open(cls, path: str) -> "Catalog":
+        """Map a catalog file read-only; its pages are shared between processes."""
+        with open(path, "rb") as f:
+            catalog = cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            st = os.fstat(f.fileno())
+        catalog.path = path
+        catalog.signature = (st.st_size, st.st_mtime_ns)
+        return catalog
+
+    @classmethod
+    def from_products(cls, products: Iterable[Mapping]) -> "Catalog":
+        """Build an in-memory catalog, e.g. for tests and benchmarks."""
+        return cls(encode_catalog(products))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [self[i] for i in range(*pos.indices(self._count))]
+        if pos < 0:
+            pos += self._count
+        if not 0 <= pos < self._count:
+            raise IndexError("catalog index out of range")
+        product = self._decoded.get(pos)
+        if product is None:
+            offset, length, _ = ENTRY.unpack_from(self._buffer, self._entries + pos * ENTRY.size)
+            product = Product.from_dict(json.loads(self._buffer[offset : offset + length]))
+            if len(self._decoded) >= MAX_DECODED:
+                self._decoded.clear()
+            self._decoded[pos] = product
+        return product
+
+    def price_at(self, pos: int) -> int:
+        """Get the price of the product at a position without decoding it."""
+        return self._price_at[pos]
+
+    def position(self, product_id: str) -> Optional[int]:
+        """Get a product's position in the catalog, or None if it doesn't exist."""
+        key = product_id.encode()
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset, length, pos = ID_ENTRY.unpack_from(self._buffer, self._ids + mid * ID_ENTRY.size)
+            candidate = self._buffer[offset : offset + length]
+            if candidate == key:
+                return pos
+            if candidate < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def get(self, product_id: str) -> Optional[Product]:
+        """Get a product by id, or None if it doesn't exist."""
+        pos = self.position(product_id)
+        return None if pos is None else self[pos]
+
+    def iter_positions(
+        self,
+        category: Optional[str] = None,
+        color: Optional[str] = None,
+        max_price: Optional[int] = None,
+    ) -> Iterator[int]:
+        """Lazily yield the positions of products matching every given facet, ascending."""
+        postings = []
+        if category is not None:
+            postings.append(self._postings["category"].get(category, ()))
+        if color is not None:
+            postings.append(self._postings["color"].get(color, ()))
+        cut = self._count if max_price is None else bisect_right(self._prices, max_price)
+
+        if not postings:
+            if cut == self._count:
+                yield from range(self._count)
+            elif cut * 16 <= self._count:
+                # Few matches: sorting just those beats looking at every price
+                yield from sorted(self._by_price[:cut])
+            else:
+                # Many: stream them, so a page of a few products stops after a few
+                yield from compress(range(self._count), map(max_price.__ge__, self._price_at))
+            return
+
+        postings.sort(key=len)
+        smallest, others = postings[0], postings[1:]
+        for pos in smallest:
+            if cut < self._count and self.price_at(pos) > max_price:
+                continue
+            if all(_contains(other, pos) for other in others):
+                yield pos
+
+    def positions(
+        self,
+        category: Optional[str] = None,
+        color: Optional[str] = None,
+        max_price: Optional[int] = None,
+    ) -> List[int]:
+        """Get the positions of products matching every given facet, ascending."""
+        return list(self.iter_positions(category, color, max_price))
+
+    def filter(
+        self,
+        category: Optional[str] = None,
+        color: Optional[str] = None,
+        max_price: Optional[int] = None,
+    ) -> List[Product]:
+        """Get the products matching every given facet, in catalog order."""
+        return [self[pos] for pos in self.positions(category, color, max_price)]
+
+
+def _contains(positions: Sequence, pos: int) -> bool:
+    """Membership test on a sorted position array."""
+    i = bisect_left(positions, pos)
+    return i < len(positions) and positions[i] == pos
+
+
+if __name__ == "__main__":
+    # uv run python src/catalog.py [catalog.json] [catalog.bin]
+    compile_catalog(
+        sys.argv[1] if len(sys.argv) > 1 else "catalog.json",
+        sys.argv[2] if len(sys.argv) > 2 else "catalog.bin",
+    )
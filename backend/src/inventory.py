@@ -0,0 +1,412 @@
+"""
+Stock levels and reservations shared by every job and worker process on a host.
+
+Stock lives in a small memory-mapped file with one fixed-size slot per SKU
+(a product, or a product in one size) and a table of reservation holds. A
+reservation moves units from available to held; committing it takes them
+out of stock for good, releasing it gives them back, and a hold that is
+never committed or released (the voice session dropped before checkout)
+expires and is returned the next time someone needs that SKU's stock.
+
+Every SKU has its own lock: a thread lock inside the process plus an OS
+byte-range lock on its slot across processes, so a sale hammering one SKU
+never waits behind orders for any other. Free hold slots are claimed with a
+non-blocking byte-range lock on the hold itself; once claimed, a hold is
+only touched under its SKU's lock. A SKU's holds are chained through the
+table (a doubly linked list from the SKU's slot), so sweeping its lapsed
+holds visits just those, however large the table.
+
+File layout (native byte order):
+
+    header    magic, version, SKU count, hold capacity
+    skus      count x (key, on hand, held, earliest hold expiry, first hold)
+    holds     capacity x (SKU, quantity, token, expiry, previous and next
+              hold of the SKU); token 0 is free
+"""
+
+import math
+import mmap
+import os
+import random
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Mapping, NamedTuple, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, one worker per host
+    fcntl = None
+
+MAGIC = b"ESTOCK\x00\x00"
+VERSION = 2
+# magic, version, SKU count, hold capacity (padded to one SKU slot)
+HEADER = struct.Struct("=8sIII52x")
+SKU = struct.Struct("=40sqqdI4x")
+HOLD = struct.Struct("=IIQdII")
+MAX_KEY = 40
+NO_HOLD = 0xFFFFFFFF  # end of a SKU's chain of holds
+# Version 1 had no chains; its files are upgraded on open
+V1_HEADER = struct.Struct("=8sIII44x")
+V1_SKU = struct.Struct("=40sqqd")
+
+
+class OutOfStockError(ValueError):
+    """Not enough unreserved stock for a reservation."""
+
+    def __init__(self, message: str, available: int):
+        super().__init__(message)
+        self.available = available
+
+
+class HoldsFullError(RuntimeError):
+    """Every reservation slot is taken by a live hold."""
+
+
+class Reservation(NamedTuple):
+    """A hold on stock, returned by Inventory.reserve."""
+
+    sku: int
+    slot: int
+    token: int
+    quantity: int
+
+
+def sku_key(product_id: str, size: Optional[str] = None) -> str:
+    """Key of a product's stock slot; apparel is stocked per size."""
+    return f"{product_id}/{size}" if size else product_id
+
+
+class Inventory:
+    """Per-SKU stock counters with reserve, commit, release and expiry."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR)
+        try:
+            self._map = mmap.mmap(self._fd, 0)
+        except BaseException:
+            os.close(self._fd)
+            raise
+        magic, version, count, capacity = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} stock file")
+        self._count = count
+        self.hold_capacity = capacity
+        self._holds_offset = HEADER.size + count * SKU.size
+        self._index: Dict[str, int] = {}
+        for i in range(count):
+            key = SKU.unpack_from(self._map, self._sku_offset(i))[0]
+            self._index[key.rstrip(b"\0").decode()] = i
+        self._after_fork()
+
+    def _after_fork(self):
+        """Fresh thread locks, and a different place to look for free holds."""
+        self._locks = [threading.Lock() for _ in range(self._count)]
+        self._hold_lock = threading.Lock()
+        self._cursor = random.randrange(self.hold_capacity) if self.hold_capacity else 0
+
+    @staticmethod
+    def _write_new(path: str, stock: Mapping[str, int], hold_capacity: int) -> str:
+        """Write a stock file beside path; get the temporary file's name."""
+        parts = [HEADER.pack(MAGIC, VERSION, len(stock), hold_capacity)]
+        for key, quantity in stock.items():
+            encoded = key.encode()
+            if len(encoded) > MAX_KEY:
+                raise ValueError(f"SKU key {key!r} is longer than {MAX_KEY} bytes")
+            parts.append(SKU.pack(encoded, quantity, 0, math.inf, NO_HOLD))
+        parts.append(bytes(hold_capacity * HOLD.size))
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(b"".join(parts))
+            f.flush()
+            os.fsync(f.fileno())
+        return tmp
+
+    @classmethod
+    def create(cls, path: str, stock: Mapping[str, int], hold_capacity: int = 65536) -> "Inventory":
+        """
+        Write a new stock file (unless one already exists) and open it.
+
+        The file is built aside and linked into place, so processes racing
+        to create it all end up opening the same one.
+
+        Args:
+            path: Stock file to create
+            stock: Units on hand per SKU key, see sku_key
+            hold_capacity: Most reservations held at once
+        """
+        tmp = cls._write_new(path, stock, hold_capacity)
+        try:
+            os.link(tmp, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(tmp)
+        return cls.open(path)
+
+    @classmethod
+    def open(cls, path: str) -> "Inventory":
+        """
+        Open a stock file, upgrading one written by version 1 first.
+
+        An upgrade keeps every SKU's units on hand but drops its holds, so
+        carts holding stock at the time find their reservations lapsed.
+        Processes opening the file at once upgrade it only once, under a
+        lock; anything still running an old version keeps the old file.
+        """
+        with open(path, "rb") as f:
+            magic, version = V1_HEADER.unpack(f.read(V1_HEADER.size))[:2]
+        if magic == MAGIC and version == 1:
+            with open(f"{path}.lock", "a+b") as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                with open(path, "rb") as f:
+                    data = f.read()
+                magic, version, count, capacity = V1_HEADER.unpack_from(data, 0)
+                if version == 1:
+                    stock = {}
+                    for i in range(count):
+                        key, on_hand, _, _ = V1_SKU.unpack_from(data, V1_HEADER.size + i * V1_SKU.size)
+                        stock[key.rstrip(b"\0").decode()] = on_hand
+                    os.replace(cls._write_new(path, stock, capacity), path)
+        return cls(path)
+
+    def close(self):
+        """Unmap the stock file."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+            os.close(self._fd)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def _sku_offset(self, i: int) -> int:
+        return HEADER.size + i * SKU.size
+
+    def _hold_offset(self, slot: int) -> int:
+        return self._holds_offset + slot * HOLD.size
+
+    @contextmanager
+    def _locked(self, i: int) -> Iterator[None]:
+        with self._locks[i]:
+            if fcntl is None:
+                yield
+                return
+            offset = self._sku_offset(i)
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, offset)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, offset)
+
+    def _read(self, i: int) -> Tuple[int, int, float]:
+        _, on_hand, held, expiry, _ = SKU.unpack_from(self._map, self._sku_offset(i))
+        return on_hand, held, expiry
+
+    def _write(self, i: int, on_hand: int, held: int, expiry: float):
+        # The key is never rewritten, so only the counters go back
+        struct.pack_into("=qqd", self._map, self._sku_offset(i) + MAX_KEY, on_hand, held, expiry)
+
+    def _first_hold(self, i: int) -> int:
+        return struct.unpack_from("=I", self._map, self._sku_offset(i) + MAX_KEY + 24)[0]
+
+    def _set_first_hold(self, i: int, slot: int):
+        struct.pack_into("=I", self._map, self._sku_offset(i) + MAX_KEY + 24, slot)
+
+    def _link(self, i: int, slot: int):
+        """Put a hold at the front of SKU i's chain; called under its lock."""
+        first = self._first_hold(i)
+        struct.pack_into("=II", self._map, self._hold_offset(slot) + 24, NO_HOLD, first)
+        if first != NO_HOLD:
+            struct.pack_into("=I", self._map, self._hold_offset(first) + 24, slot)
+        self._set_first_hold(i, slot)
+
+    def _free(self, i: int, slot: int):
+        """Take a hold out of SKU i's chain and give its slot back; called under its lock."""
+        offset = self._hold_offset(slot)
+        previous, following = struct.unpack_from("=II", self._map, offset + 24)
+        if previous == NO_HOLD:
+            self._set_first_hold(i, following)
+        else:
+            struct.pack_into("=I", self._map, self._hold_offset(previous) + 28, following)
+        if following != NO_HOLD:
+            struct.pack_into("=I", self._map, self._hold_offset(following) + 24, previous)
+        struct.pack_into("=Q", self._map, offset + 8, 0)
+
+    def _sku(self, key: str) -> int:
+        try:
+            return self._index[key]
+        except KeyError:
+            raise KeyError(f"No stock is kept for {key!r}") from None
+
+    def _expire(self, i: int, now: float) -> Tuple[int, int, float]:
+        """Return SKU i's expired holds to stock; called under its lock."""
+        on_hand, held, _ = self._read(i)
+        earliest = math.inf
+        slot = self._first_hold(i)
+        while slot != NO_HOLD:
+            _, quantity, _, expiry, _, following = HOLD.unpack_from(self._map, self._hold_offset(slot))
+            if expiry <= now:
+                self._free(i, slot)
+                held -= quantity
+            else:
+                earliest = min(earliest, expiry)
+            slot = following
+        self._write(i, on_hand, held, earliest)
+        return on_hand, held, earliest
+
+    def _claim_hold(self, i: int, quantity: int, expiry: float) -> Tuple[int, int]:
+        """Take a free hold slot for SKU i; called under its lock."""
+        token = random.getrandbits(63) | 1
+        with self._hold_lock:
+            for n in range(self.hold_capacity):
+                slot = (self._cursor + n) % self.hold_capacity
+                offset = self._hold_offset(slot)
+                if HOLD.unpack_from(self._map, offset)[2]:
+                    continue
+                if fcntl is not None:
+                    try:
+                        fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, offset)
+                    except OSError:
+                        continue  # another process is claiming it
+                try:
+                    if HOLD.unpack_from(self._map, offset)[2]:
+                        continue
+                    # The token goes last: a hold with a token is complete
+                    struct.pack_into("=II", self._map, offset, i, quantity)
+                    struct.pack_into("=d", self._map, offset + 16, expiry)
+                    self._link(i, slot)
+                    struct.pack_into("=Q", self._map, offset + 8, token)
+                finally:
+                    if fcntl is not None:
+                        fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, offset)
+                self._cursor = slot + 1
+                return slot, token
+        raise HoldsFullError(f"All {self.hold_capacity} reservation slots are in use")
+
+    def _held(self, reservation: Reservation) -> int:
+        sku, quantity, token, *_ = HOLD.unpack_from(self._map, self._hold_offset(reservation.slot))
+        return quantity if token == reservation.token and sku == reservation.sku else 0
+
+    def available(self, key: str) -> int:
+        """Units of a SKU neither sold nor reserved."""
+        i = self._sku(key)
+        with self._locked(i):
+            on_hand, held, expiry = self._read(i)
+            now = time.time()
+            if expiry <= now:
+                on_hand, held, _ = self._expire(i, now)
+        return on_hand - held
+
+    def reserve(self, key: str, quantity: int, ttl: float) -> Reservation:
+        """
+        Hold units of a SKU for a while.
+
+        Args:
+            key: SKU key, see sku_key
+            quantity: Units to hold
+            ttl: Seconds until the hold lapses if not committed or released
+
+        Returns:
+            The reservation, for commit or release
+
+        Raises:
+            OutOfStockError: if fewer than quantity units are available
+        """
+        if quantity < 1:
+            raise ValueError(f"Quantity must be at least 1, got {quantity}")
+        i = self._sku(key)
+        with self._locked(i):
+            on_hand, held, earliest = self._read(i)
+            now = time.time()
+            if on_hand - held < quantity and earliest <= now:
+                on_hand, held, earliest = self._expire(i, now)
+            if on_hand - held < quantity:
+                raise OutOfStockError(
+                    f"Only {max(on_hand - held, 0)} of {key} available", max(on_hand - held, 0)
+                )
+            expiry = now + ttl
+            slot, token = self._claim_hold(i, quantity, expiry)
+            self._write(i, on_hand, held + quantity, min(earliest, expiry))
+        return Reservation(i, slot, token, quantity)
+
+    def commit(self, reservation: Reservation) -> Reservation:
+        """
+        Sell reserved units.
+
+        A hold that already lapsed is taken again from available stock.
+
+        Returns:
+            The reservation with the quantity sold, for cancel
+
+        Raises:
+            OutOfStockError: if the hold lapsed and its units were sold
+        """
+        i = reservation.sku
+        with self._locked(i):
+            on_hand, held, earliest = self._read(i)
+            quantity = self._held(reservation)
+            if quantity:
+                self._free(i, reservation.slot)
+                held -= quantity
+            elif on_hand - held < reservation.quantity:
+                raise OutOfStockError(
+                    f"Reservation lapsed; only {max(on_hand - held, 0)} available", max(on_hand - held, 0)
+                )
+            else:
+                quantity = reservation.quantity
+            self._write(i, on_hand - quantity, held, earliest)
+        return reservation._replace(quantity=quantity)
+
+    def release(self, reservation: Reservation, quantity: Optional[int] = None) -> Reservation:
+        """
+        Give reserved units back, all of them or just some.
+
+        Returns:
+            What is still reserved (quantity 0 once it is all released)
+        """
+        i = reservation.sku
+        with self._locked(i):
+            current = self._held(reservation)
+            if not current:
+                return reservation._replace(quantity=0)
+            quantity = current if quantity is None else min(quantity, current)
+            on_hand, held, earliest = self._read(i)
+            offset = self._hold_offset(reservation.slot)
+            remaining = current - quantity
+            if remaining:
+                struct.pack_into("=I", self._map, offset + 4, remaining)
+            else:
+                self._free(i, reservation.slot)
+            self._write(i, on_hand, held - quantity, earliest)
+        return reservation._replace(quantity=remaining)
+
+    def cancel(self, reservation: Reservation):
+        """Put committed units back in stock, e.g. when saving the order failed."""
+        i = reservation.sku
+        with self._locked(i):
+            on_hand, held, earliest = self._read(i)
+            self._write(i, on_hand + reservation.quantity, held, earliest)
+
+    def restock(self, key: str, quantity: int):
+        """Add units on hand (or take them away, with a negative quantity)."""
+        i = self._sku(key)
+        with self._locked(i):
+            on_hand, held, earliest = self._read(i)
+            self._write(i, on_hand + quantity, held, earliest)
+
+    def levels(self) -> Dict[str, Tuple[int, int]]:
+        """Units on hand and held per SKU, without sweeping lapsed holds."""
+        return {key: self._read(i)[:2] for key, i in self._index.items()}
+
+    def reservations(self) -> List[Reservation]:
+        """Every hold currently in the table, lapsed or not."""
+        return [
+            Reservation(sku, slot, token, quantity)
+            for slot, (sku, quantity, token, _, _, _) in enumerate(HOLD.iter_unpack(self._map[self._holds_offset :]))
+            if token
+        ]
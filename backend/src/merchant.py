@@ -3,285 +3,497 @@ E-commerce merchant module for voice shopping assistant.
 Implements product catalog, order management, and merchant functions.
 """
 
+import asyncio
+import atexit
+import heapq
 import json
 import os
+import queue
+import re
+import threading
+import time
 from datetime import datetime
-from typing import Optional, List, Dict
-
-# Product catalog
-PRODUCTS = [
-    # Mugs
-    {
-        "id": "mug-001",
-        "name": "Stoneware Coffee Mug",
-        "description": "Handcrafted stoneware mug, 350ml",
-        "price": 800,
-        "currency": "INR",
-        "category": "mug",
-        "color": "white",
-        "image": "https://images.unsplash.com/photo-1514228742587-6b1558fcca3d?w=400&h=400&fit=crop",
-    },
-    {
-        "id": "mug-002",
-        "name": "Blue Travel Mug",
-        "description": "Insulated travel mug, 400ml",
-        "price": 950,
-        "currency": "INR",
-        "category": "mug",
-        "color": "blue",
-        "image": "https://images.unsplash.com/photo-1534889156217-d643df14f14a?w=400&h=400&fit=crop",
-    },
-    {
-        "id": "mug-003",
-        "name": "Ceramic Espresso Cup",
-        "description": "Small ceramic espresso cup, 100ml",
-        "price": 650,
-        "currency": "INR",
-        "category": "mug",
-        "color": "black",
-        "image": "https://images.unsplash.com/photo-1517256064527-09c73fc73e38?w=400&h=400&fit=crop",
-    },
-    {
-        "id": "mug-004",
-        "name": "Red Ceramic Mug",
-        "description": "Classic ceramic mug, 300ml",
-        "price": 750,
-        "currency": "INR",
-        "category": "mug",
-        "color": "red",
-        "image": "https://images.unsplash.com/photo-1572490122747-3968b75cc699?w=400&h=400&fit=crop",
-    },
-    {
-        "id": "mug-005",
-        "name": "Green Tea Cup",
-        "description": "Elegant tea cup with saucer, 250ml",
-        "price": 900,
-        "currency": "INR",
-        "category": "mug",
-        "color": "green",
-        "image": "https://images.unsplash.com/photo-1556679343-c7306c1976bc?w=400&h=400&fit=crop",
-    },
-    # Hoodies
-    {
-        "id": "hoodie-001",
-        "name": "Black Logo Hoodie",
-        "description": "Unisex cotton hoodie with logo",
-        "price": 1499,
-        "currency": "INR",
-        "category": "hoodie",
-        "color": "black",
-        "sizes": ["S", "M", "L", "XL"],
-        "image": "https://images.unsplash.com/photo-1556821840-3a63f95609a7?w=400&h=400&fit=crop",
-    },
-    {
-        "id": "hoodie-002",
-        "name": "Grey Zip Hoodie",
-        "description": "Premium zip-up hoodie",
-        "price": 1799,
-        "currency": "INR",
-        "category": "hoodie",
-        "color": "grey",
-        "sizes": ["S", "M", "L", "XL"],
-        "image": "https://images.unsplash.com/photo-1620799140408-edc6dcb6d633?w=400&h=400&fit=crop",
-    },
-    {
-        "id": "hoodie-003",
-        "name": "Navy Blue Pullover Hoodie",
-        "description": "Warm fleece-lined hoodie",
-        "price": 1599,
-        "currency": "INR",
-        "category": "hoodie",
-        "color": "blue",
-        "sizes": ["S", "M", "L", "XL"],
-        "image": "https://images.unsplash.com/photo-1578587018452-892bacefd3f2?w=400&h=400&fit=crop",
-    },
-    {
-        "id": "hoodie-004",
-        "name": "White Minimalist Hoodie",
-        "description": "Clean design cotton hoodie",
-        "price": 1399,
-        "currency": "INR",
-        "category": "hoodie",
-        "color": "white",
-        "sizes": ["S", "M", "L", "XL"],
-        "image": "https://images.unsplash.com/photo-1620799140188-3b2a02fd9a77?w=400&h=400&fit=crop",
-    },
-    # T-Shirts
-    {
-        "id": "tshirt-001",
-        "name": "White Classic T-Shirt",
-        "description": "Soft cotton t-shirt",
-        "price": 699,
-        "currency": "INR",
-        "category": "tshirt",
-        "color": "white",
-        "sizes": ["S", "M", "L", "XL"],
-        "image": "https://images.unsplash.com/photo-1521572163474-6864f9cf17ab?w=400&h=400&fit=crop",
-    },
-    {
-        "id": "tshirt-002",
-        "name": "Navy Blue T-Shirt",
-        "description": "Premium cotton t-shirt",
-        "price": 749,
-        "currency": "INR",
-        "category": "tshirt",
-        "color": "blue",
-        "sizes": ["S", "M", "L", "XL"],
-        "image": "https://images.unsplash.com/photo-1583743814966-8936f5b7be1a?w=400&h=400&fit=crop",
-    },
-    {
-        "id": "tshirt-003",
-        "name": "Black Graphic Tee",
-        "description": "Cotton t-shirt with graphic print",
-        "price": 799,
-        "currency": "INR",
-        "category": "tshirt",
-        "color": "black",
-        "sizes": ["S", "M", "L", "XL"],
-        "image": "https://images.unsplash.com/photo-1503341504253-dff4815485f1?w=400&h=400&fit=crop",
-    },
-    {
-        "id": "tshirt-004",
-        "name": "Grey V-Neck T-Shirt",
-        "description": "Stylish v-neck cotton tee",
-        "price": 729,
-        "currency": "INR",
-        "category": "tshirt",
-        "color": "grey",
-        "sizes": ["S", "M", "L", "XL"],
-        "image": "https://images.unsplash.com/photo-1562157873-818bc0726f68?w=400&h=400&fit=crop",
-    },
-    {
-        "id": "tshirt-005",
-        "name": "Red Polo T-Shirt",
-        "description": "Classic polo style t-shirt",
-        "price": 899,
-        "currency": "INR",
-        "category": "tshirt",
-        "color": "red",
-        "sizes": ["S", "M", "L", "XL"],
-        "image": "https://images.unsplash.com/photo-1586790170083-2f9ceadc732d?w=400&h=400&fit=crop",
-    },
-    # Caps
-    {
-        "id": "cap-001",
-        "name": "Black Baseball Cap",
-        "description": "Classic baseball cap with adjustable strap",
-        "price": 499,
-        "currency": "INR",
-        "category": "cap",
-        "color": "black",
-        "image": "https://images.unsplash.com/photo-1588850561407-ed78c282e89b?w=400&h=400&fit=crop",
-    },
-    {
-        "id": "cap-002",
-        "name": "White Sports Cap",
-        "description": "Breathable sports cap",
-        "price": 549,
-        "currency": "INR",
-        "category": "cap",
-        "color": "white",
-        "image": "https://images.unsplash.com/photo-1575428652377-a2d80e2277fc?w=400&h=400&fit=crop",
-    },
-    {
-        "id": "cap-003",
-        "name": "Blue Trucker Cap",
-        "description": "Mesh back trucker style cap",
-        "price": 599,
-        "currency": "INR",
-        "category": "cap",
-        "color": "blue",
-        "image": "https://images.unsplash.com/photo-1521369909029-2afed882baee?w=400&h=400&fit=crop",
-    },
-    {
-        "id": "cap-004",
-        "name": "Grey Snapback Cap",
-        "description": "Urban style snapback cap",
-        "price": 649,
-        "currency": "INR",
-        "category": "cap",
-        "color": "grey",
-        "image": "https://images.unsplash.com/photo-1589487391730-58f20eb2c308?w=400&h=400&fit=crop",
-    },
-    # Bags
-    {
-        "id": "bag-001",
-        "name": "Black Backpack",
-        "description": "Spacious laptop backpack, 25L",
-        "price": 1999,
-        "currency": "INR",
-        "category": "bag",
-        "color": "black",
-        "image": "https://images.unsplash.com/photo-1553062407-98eeb64c6a62?w=400&h=400&fit=crop",
-    },
-    {
-        "id": "bag-002",
-        "name": "Grey Messenger Bag",
-        "description": "Professional messenger bag",
-        "price": 1799,
-        "currency": "INR",
-        "category": "bag",
-        "color": "grey",
-        "image": "https://images.unsplash.com/photo-1548036328-c9fa89d128fa?w=400&h=400&fit=crop",
-    },
-    {
-        "id": "bag-003",
-        "name": "Blue Gym Bag",
-        "description": "Durable gym duffle bag",
-        "price": 1499,
-        "currency": "INR",
-        "category": "bag",
-        "color": "blue",
-        "image": "https://images.unsplash.com/photo-1564859228273-274232fdb516?w=400&h=400&fit=crop",
-    },
-    {
-        "id": "bag-004",
-        "name": "Brown Leather Tote",
-        "description": "Premium leather tote bag",
-        "price": 2499,
-        "currency": "INR",
-        "category": "bag",
-        "color": "brown",
-        "image": "https://images.unsplash.com/photo-1590874103328-eac38a683ce7?w=400&h=400&fit=crop",
-    },
-    {
-        "id": "bag-005",
-        "name": "White Canvas Tote",
-        "description": "Eco-friendly canvas tote",
-        "price": 899,
-        "currency": "INR",
-        "category": "bag",
-        "color": "white",
-        "image": "https://images.unsplash.com/photo-1591561954557-26941169b49e?w=400&h=400&fit=crop",
-    },
-]
+from itertools import islice
+from typing import Optional, List, Dict, Iterable, Iterator, Sequence, Tuple, Union
+
+from catalog import Catalog, Product, compile_catalog
+from inventory import HoldsFullError, Inventory, OutOfStockError, Reservation, sku_key
+from order_db import SqliteOrderStore
+from order_store import OrderStore, OrderWriter
+from search import SearchIndex, edit_distance, name_key, write_index
+from telemetry import span
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, one worker per host
+    fcntl = None
+
+# Product catalog: catalog.json is the editable source, compiled into the
+# binary catalog file that every worker process maps (see catalog.py).
+CATALOG_SOURCE = os.getenv("CATALOG_SOURCE", "catalog.json")
+CATALOG_FILE = os.getenv("CATALOG_FILE", "catalog.bin")
+# Search index of the compiled catalog, built once and mapped by every process
+SEARCH_FILE = os.getenv("SEARCH_FILE", "search.bin")
+
+
+CATALOG_POLL_INTERVAL = 2.0  # seconds between checks for a changed catalog
+
+CATALOG = Catalog.from_products([])
+CATALOG_GENERATION = 0  # bumped every time a new catalog is swapped in
+_catalog_signature = None
+_catalog_reload_seconds = 0.0
+_catalog_loaded_at: Optional[str] = None
+_catalog_lock = threading.Lock()
+_catalog_watcher: Optional[threading.Thread] = None
+# Search index for the catalog it was built from, built on first search
+_search: Optional[Tuple[Catalog, SearchIndex]] = None
+
+
+def _stat_catalog():
+    """Identify the current versions of the catalog source and compiled file."""
+    signature = []
+    for path in (CATALOG_SOURCE, CATALOG_FILE):
+        try:
+            st = os.stat(path)
+            signature.append((st.st_ino, st.st_size, st.st_mtime_ns))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def _open_catalog() -> Catalog:
+    """Open the catalog file, recompiling it first if the source is newer."""
+    if os.path.exists(CATALOG_SOURCE) and (
+        not os.path.exists(CATALOG_FILE)
+        or os.path.getmtime(CATALOG_FILE) < os.path.getmtime(CATALOG_SOURCE)
+    ):
+        compile_catalog(CATALOG_SOURCE, CATALOG_FILE)
+    return Catalog.open(CATALOG_FILE)
+
+
+def reload_catalog(force: bool = False) -> bool:
+    """
+    Load the catalog again if its source or compiled file changed.
+
+    The new catalog is fully opened before it replaces CATALOG in a single
+    assignment, so a caller holding the old one keeps a consistent view and
+    nobody ever sees a half-built catalog. If loading fails the current
+    catalog stays in place.
+
+    Returns:
+        True if a new catalog was swapped in
+    """
+    global CATALOG, CATALOG_GENERATION, _catalog_signature, _catalog_reload_seconds, _catalog_loaded_at, _search
+    with _catalog_lock:
+        signature = _stat_catalog()
+        if not force and signature == _catalog_signature:
+            return False
+        started = time.perf_counter()
+        try:
+            catalog = _open_catalog()
+        except Exception as e:
+            # Don't retry (and log) on every poll until the files change again
+            _catalog_signature = signature
+            print(f"Error loading catalog: {e}")
+            return False
+        if _search is not None:
+            # Search is in use, so index the new catalog before swapping it in
+            _search = (catalog, _open_search(catalog))
+        _catalog_signature = _stat_catalog()
+        CATALOG = catalog
+        CATALOG_GENERATION += 1
+        _catalog_reload_seconds = time.perf_counter() - started
+        _catalog_loaded_at = datetime.now().isoformat()
+        return True
+
+
+def catalog_status() -> Dict:
+    """Get the catalog generation, size and how long its last (re)load took."""
+    return {
+        "generation": CATALOG_GENERATION,
+        "products": len(CATALOG),
+        "reload_seconds": _catalog_reload_seconds,
+        "loaded_at": _catalog_loaded_at,
+    }
 
-# In-memory orders storage
-ORDERS: List[Dict] = []
-ORDERS_FILE = "orders.json"
+
+def _watch_catalog(interval: float):
+    while True:
+        time.sleep(interval)
+        try:
+            reload_catalog()
+        except Exception as e:
+            print(f"Error reloading catalog: {e}")
+        try:
+            reload_inventory()
+        except Exception as e:
+            print(f"Error reloading inventory: {e}")
+
+
+def start_catalog_watcher(interval: float = CATALOG_POLL_INTERVAL):
+    """Poll the catalog files in a background thread and hot-swap changes (and apply stock edits)."""
+    global _catalog_watcher
+    if _catalog_watcher is not None and _catalog_watcher.is_alive():
+        return
+    _catalog_watcher = threading.Thread(
+        target=_watch_catalog, args=(interval,), name="catalog-watcher", daemon=True
+    )
+    _catalog_watcher.start()
+
+
+reload_catalog(force=True)
+
+# Orders are persisted either as an indexed JSON-lines snapshot plus an
+# append-only log of recent orders, see order_store.py, or in a SQLite
+# database for larger volumes, see order_db.py.
+ORDERS_BACKEND = os.getenv("ORDERS_BACKEND", "json")  # "json" or "sqlite"
+ORDERS_DB_FILE = os.getenv("ORDERS_DB_FILE", "orders.db")
+ORDERS_FILE = os.getenv("ORDERS_FILE", "orders.json")
+ORDERS_LOG_FILE = os.getenv("ORDERS_LOG_FILE", "orders.log")
+ORDERS_FSYNC_EVERY = 16  # fsync the log after this many unsynced orders...
+ORDERS_FSYNC_INTERVAL = 1.0  # ...or once this many seconds have passed
+ORDERS_COMPACT_EVERY = 1000  # fold the log into the snapshot at this size (and most orders kept in memory)
+
+ORDER_STORE: Optional[Union[OrderStore, SqliteOrderStore]] = None
+ORDER_QUEUE_SIZE = 1024  # orders waiting for the writer thread before callers wait
+_writer: Optional[OrderWriter] = None
+_writer_lock = threading.Lock()
 
 
 def _load_orders():
-    """Load orders from file on startup."""
-    global ORDERS
-    if os.path.exists(ORDERS_FILE):
+    """Open the configured order store (for JSON, mapping the snapshot index and replaying the log)."""
+    global ORDER_STORE
+    _close_orders()
+    if ORDERS_BACKEND == "sqlite":
+        ORDER_STORE = SqliteOrderStore(ORDERS_DB_FILE)
+        return
+    if ORDERS_BACKEND != "json":
+        raise ValueError(f"Unknown ORDERS_BACKEND {ORDERS_BACKEND!r}; expected 'json' or 'sqlite'")
+    ORDER_STORE = OrderStore(
+        ORDERS_FILE,
+        ORDERS_LOG_FILE,
+        fsync_every=ORDERS_FSYNC_EVERY,
+        fsync_interval=ORDERS_FSYNC_INTERVAL,
+        compact_every=ORDERS_COMPACT_EVERY,
+    )
+
+
+def _close_orders():
+    """Flush queued orders, then sync and close the order log (also run at exit)."""
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
+    if ORDER_STORE is not None:
+        ORDER_STORE.close()
+
+
+def _order_writer() -> OrderWriter:
+    """Get the writer thread for the current order store, starting it if needed."""
+    global _writer
+    with _writer_lock:
+        if _writer is None or _writer.store is not ORDER_STORE:
+            _writer = OrderWriter(ORDER_STORE, max_queue=ORDER_QUEUE_SIZE)
+        return _writer
+
+
+# Stock: inventory.json lists the units on hand of each product (per size
+# for apparel) and seeds the stock file every job and worker process maps,
+# see inventory.py. Products it doesn't list are never out of stock. Later
+# edits to inventory.json are applied as restocks: the difference from the
+# levels it last held, which are kept next to the stock file.
+INVENTORY_SOURCE = os.getenv("INVENTORY_SOURCE", "inventory.json")
+INVENTORY_FILE = os.getenv("INVENTORY_FILE", "inventory.bin")
+INVENTORY_HOLDS = 65536  # most reservations held at once, across all processes
+RESERVATION_TTL = 15 * 60  # seconds a cart holds stock before it lapses
+
+INVENTORY: Optional[Inventory] = None
+_inventory_signature = None
+
+
+def _read_stock_source() -> Dict[str, int]:
+    """Units on hand per SKU key, as inventory.json lists them."""
+    with open(INVENTORY_SOURCE) as f:
+        source = json.load(f)
+    stock = {}
+    for product_id, on_hand in source.items():
+        if isinstance(on_hand, dict):
+            for size, quantity in on_hand.items():
+                stock[sku_key(product_id, size)] = quantity
+        else:
+            stock[sku_key(product_id)] = on_hand
+    return stock
+
+
+def _write_applied_stock(stock: Dict[str, int]):
+    tmp_path = f"{INVENTORY_FILE}.source.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(stock, f)
+    os.replace(tmp_path, f"{INVENTORY_FILE}.source")
+
+
+def _load_inventory():
+    """Map the stock file, creating it from the inventory source on first start."""
+    global INVENTORY, _inventory_signature
+    _close_inventory()
+    _inventory_signature = None
+    if os.path.exists(INVENTORY_FILE):
+        INVENTORY = Inventory.open(INVENTORY_FILE)
+    elif os.path.exists(INVENTORY_SOURCE):
+        stock = _read_stock_source()
+        INVENTORY = Inventory.create(INVENTORY_FILE, stock, INVENTORY_HOLDS)
+        _write_applied_stock(stock)
+    reload_inventory()
+
+
+def reload_inventory() -> bool:
+    """
+    Apply edits to the inventory source to the stock file as restocks.
+
+    Each SKU gets the difference between its new level in the source and
+    the one last applied, so units sold in the meantime stay sold. One
+    process applies an edit; the others then find nothing left to do. SKUs
+    the stock file doesn't have a slot for only take effect once it is
+    rebuilt (remove it and restart the worker).
+
+    Returns:
+        True if any SKU was restocked
+    """
+    global _inventory_signature
+    try:
+        st = os.stat(INVENTORY_SOURCE)
+        signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+    except OSError:
+        signature = None
+    inventory = INVENTORY
+    if inventory is None or signature is None or signature == _inventory_signature:
+        return False
+    _inventory_signature = signature
+    with open(f"{INVENTORY_FILE}.lock", "a+b") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
         try:
-            with open(ORDERS_FILE, "r") as f:
-                ORDERS = json.load(f)
-        except Exception:
-            ORDERS = []
+            stock = _read_stock_source()
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"Error reading inventory: {e}")
+            return False
+        try:
+            with open(f"{INVENTORY_FILE}.source") as f:
+                applied = json.load(f)
+        except (OSError, ValueError):
+            # Stock file from before edits were tracked: take the source as it is now
+            _write_applied_stock(stock)
+            return False
+        changes = {key: quantity - applied.get(key, 0) for key, quantity in stock.items()}
+        changes = {key: delta for key, delta in changes.items() if delta}
+        if not changes:
+            return False
+        # Recorded first: a crash part way through under-restocks rather than
+        # applying the same edit twice
+        _write_applied_stock(stock)
+        for key, delta in changes.items():
+            if key in inventory:
+                inventory.restock(key, delta)
+            else:
+                print(f"No stock slot for {key!r}; rebuild {INVENTORY_FILE} to track it")
+    return True
+
 
+def _close_inventory():
+    global INVENTORY
+    if INVENTORY is not None:
+        INVENTORY.close()
+        INVENTORY = None
 
-def _save_order(order: Dict):
-    """Append order to file."""
+
+def stock_level(product_id: str, size: Optional[str] = None) -> Optional[int]:
+    """
+    Get how many units of a product (in a size) are neither sold nor reserved.
+    
+    Returns:
+        Units available, or None if the product's stock isn't tracked
+    """
+    key = sku_key(product_id, size)
+    if INVENTORY is None or key not in INVENTORY:
+        return None
+    return INVENTORY.available(key)
+
+
+def reserve_items(line_items: List[Dict], ttl: float = RESERVATION_TTL) -> List[Reservation]:
+    """
+    Hold stock for line items, all of them or none.
+    
+    Args:
+        line_items: Same as for create_order
+        ttl: Seconds until the holds lapse unless the order is placed
+    
+    Returns:
+        Reservations to pass to create_order (none for untracked products)
+    
+    Raises:
+        OutOfStockError: if an item doesn't have enough stock left
+        HoldsFullError: if every reservation slot is taken
+    """
+    inventory = INVENTORY
+    held = []
+    if inventory is None:
+        return held
     try:
-        with open(ORDERS_FILE, "w") as f:
-            json.dump(ORDERS, f, indent=2)
-    except Exception as e:
-        print(f"Error saving order: {e}")
+        for item in line_items:
+            key = sku_key(item["product_id"], item.get("size"))
+            if key not in inventory:
+                continue
+            try:
+                held.append(inventory.reserve(key, item.get("quantity", 1), ttl))
+            except OutOfStockError as e:
+                product = CATALOG.get(item["product_id"])
+                name = product["name"] if product else item["product_id"]
+                size_info = f" in size {item['size']}" if item.get("size") else ""
+                raise OutOfStockError(f"Only {e.available} {name}{size_info} left in stock", e.available) from None
+    except BaseException:
+        release_reservations(held)
+        raise
+    return held
+
+
+def release_reservations(reservations: Iterable[Reservation], quantity: Optional[int] = None) -> List[Reservation]:
+    """
+    Give held stock back, all of it or some units (newest holds first).
+    
+    Returns:
+        The reservations still held, with their remaining quantities
+    """
+    kept = list(reservations)
+    if INVENTORY is None:
+        return []
+    remaining = sum(r.quantity for r in kept) if quantity is None else quantity
+    while kept and remaining > 0:
+        reservation = kept.pop()
+        left = INVENTORY.release(reservation, remaining)
+        remaining -= reservation.quantity - left.quantity
+        if left.quantity:
+            kept.append(left)
+            break
+    return kept
+
+
+def _take_stock(line_items: List[Dict], reservations: Optional[List[Reservation]]) -> List[Reservation]:
+    """Commit stock for an order from the caller's reservations, or from new ones."""
+    if INVENTORY is None:
+        return []
+    held = reserve_items(line_items) if reservations is None else list(reservations)
+    committed = []
+    try:
+        for reservation in held:
+            committed.append(INVENTORY.commit(reservation))
+    except BaseException:
+        _return_stock(committed)
+        if reservations is None:
+            release_reservations(held[len(committed) :])
+        raise
+    return committed
+
+
+def _return_stock(committed: List[Reservation]):
+    """Put stock back for an order that couldn't be saved."""
+    for reservation in committed:
+        INVENTORY.cancel(reservation)
+
+
+_load_inventory()
 
 
-def list_products(filters: Optional[Dict] = None) -> List[Dict]:
+class OrderIdGenerator:
+    """
+    Unique, time-ordered order ids without coordination between processes.
+
+    Ids look like order_20251130_100017_370a1b2c3d40000: the UTC time to
+    the millisecond (local time would run backwards when clocks go back),
+    a random per-process node tag, and a counter within the millisecond.
+    Fixed-width fields make string order match creation order (and the
+    older order_YYYYmmdd_HHMMSS ids sort in with them), the node tag keeps
+    concurrent worker processes from colliding, and the counter keeps
+    orders placed in the same millisecond apart.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._seq = 0
+        self._second = None
+        self._prefix = ""
+        self.reseed()
+
+    def reseed(self):
+        """Pick a new node tag; forked children must not reuse the parent's."""
+        self._node = os.urandom(4).hex()
+
+    def __call__(self) -> str:
+        with self._lock:
+            ms = max(time.time_ns() // 1_000_000, self._last_ms)  # never go backwards
+            if ms == self._last_ms:
+                self._seq += 1
+                if self._seq > 0xFFFF:
+                    # Counter exhausted within this millisecond: borrow the next one
+                    ms += 1
+                    self._seq = 0
+            else:
+                self._seq = 0
+            self._last_ms = ms
+            second = ms // 1000
+            if second != self._second:
+                self._second = second
+                self._prefix = time.strftime("order_%Y%m%d_%H%M%S_", time.gmtime(second))
+            return f"{self._prefix}{ms % 1000:03d}{self._node}{self._seq:04x}"
+
+
+next_order_id = OrderIdGenerator()
+
+
+def _after_fork():
+    next_order_id.reseed()
+    if INVENTORY is not None:
+        INVENTORY._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+SORT_ORDERS = ("relevance", "price_asc", "price_desc")
+
+
+def _facets(filters: Optional[Dict]) -> Dict:
+    filters = filters or {}
+    return {
+        "category": filters["category"].lower() if "category" in filters else None,
+        "color": filters["color"].lower() if "color" in filters else None,
+        "max_price": int(filters["max_price"]) if "max_price" in filters else None,
+    }
+
+
+def _page(catalog: Catalog, positions: Iterable[int], limit: Optional[int], offset: int, sort: str) -> List[Product]:
+    """Cut one page out of ranked positions, re-ranking by price if asked."""
+    if sort not in SORT_ORDERS:
+        raise ValueError(f"Unknown sort order {sort!r}, expected one of {', '.join(SORT_ORDERS)}")
+    if sort == "relevance":
+        page = islice(positions, offset, None if limit is None else offset + limit)
+    elif limit is None:
+        page = sorted(positions, key=catalog.price_at, reverse=sort == "price_desc")[offset:]
+    else:
+        # Heap selection of just the products up to the end of this page
+        select = heapq.nlargest if sort == "price_desc" else heapq.nsmallest
+        page = select(offset + limit, positions, key=catalog.price_at)[offset:]
+    return [catalog[pos] for pos in page]
+
+
+def list_products(
+    filters: Optional[Dict] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    sort: str = "relevance",
+) -> List[Product]:
     """
     List products with optional filters.
     
@@ -290,45 +502,271 @@ def list_products(filters: Optional[Dict] = None) -> List[Dict]:
             - category: str (e.g., "mug", "hoodie", "tshirt")
             - max_price: int (maximum price in INR)
             - color: str (e.g., "black", "white", "blue")
+        limit: Maximum number of products to return (None for all)
+        offset: Number of matching products to skip, for paging
+        sort: "relevance" (catalog order), "price_asc" or "price_desc"
     
     Returns:
-        List of product dicts matching the filters
+        List of products (read-only, dict-like) matching the filters
     """
-    results = PRODUCTS.copy()
+    catalog = CATALOG
+    return _page(catalog, catalog.iter_positions(**_facets(filters)), limit, offset, sort)
+
+
+def _open_search(catalog: Catalog) -> SearchIndex:
+    """
+    Map the shared search index of a catalog file, building it if needed.
     
-    if filters:
-        if "category" in filters:
-            category = filters["category"].lower()
-            results = [p for p in results if p["category"] == category]
-        
-        if "max_price" in filters:
-            max_price = int(filters["max_price"])
-            results = [p for p in results if p["price"] <= max_price]
-        
-        if "color" in filters:
-            color = filters["color"].lower()
-            results = [p for p in results if p.get("color", "").lower() == color]
+    One process builds the index file while the others wait on a file lock
+    and then map the same file. In-memory catalogs get an in-memory index.
+    """
+    if catalog.path is None:
+        return SearchIndex(catalog)
+    with open(f"{SEARCH_FILE}.lock", "a+b") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            return SearchIndex.open(SEARCH_FILE, catalog)
+        except (OSError, ValueError):
+            pass  # missing, or built for another version of the catalog
+        write_index(catalog, SEARCH_FILE)
+        return SearchIndex.open(SEARCH_FILE, catalog)
+
+
+def _search_index(catalog: Catalog) -> SearchIndex:
+    global _search
+    search = _search
+    if search is None or search[0] is not catalog:
+        with _catalog_lock:
+            search = _search
+            if search is None or search[0] is not catalog:
+                search = _search = (catalog, _open_search(catalog))
+    return search[1]
+
+
+def prewarm():
+    """
+    Get everything a job needs ready before the first job arrives.
     
-    return results
+    The catalog and stock files are mapped and the order store opened on
+    import; this maps the search index as well (building the file if no
+    process has yet), so every job process reads the same pages instead of
+    building its own index or name tables, and starts the order writer
+    thread, neither of which the first caller then waits for.
+    """
+    _search_index(CATALOG)
+    _order_writer()
 
 
-def create_order(line_items: List[Dict]) -> Dict:
+def search_products(
+    query: str,
+    filters: Optional[Dict] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    sort: str = "relevance",
+) -> List[Product]:
     """
-    Create an order from line items.
+    Full-text search over product names and descriptions.
+
+    Words are matched exactly, by prefix, or within a small edit distance
+    (for mis-heard words like "hoody") and results are ranked by relevance.
+
+    Args:
+        query: Free-text query, e.g. "warm zip jacket"
+        filters: Optional dict with the same keys as list_products; products
+            matching the filters but no query words are listed after the
+            ranked ones
+        limit: Maximum number of products to return (None for all)
+        offset: Number of matching products to skip, for paging
+        sort: "relevance", "price_asc" or "price_desc"
+
+    Returns:
+        List of products, most relevant first unless sorted by price
+    """
+    catalog = CATALOG
+    ranked_limit = None if limit is None or sort != "relevance" else offset + limit
+    positions = _search_index(catalog).search(query, limit=ranked_limit, **_facets(filters))
+    return _page(catalog, positions, limit, offset, sort)
+
+
+ORDINAL_WORDS = {
+    word: n
+    for n, words in enumerate(
+        [
+            ("first", "one"),
+            ("second", "two"),
+            ("third", "three"),
+            ("fourth", "four"),
+            ("fifth", "five"),
+            ("sixth", "six"),
+            ("seventh", "seven"),
+            ("eighth", "eight"),
+            ("ninth", "nine"),
+            ("tenth", "ten"),
+        ],
+        1,
+    )
+    for word in words
+}
+ORDINAL_FILLER = frozenset(("number", "no", "the", "item", "option", "product", "one"))
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def _ordinal(identifier: str) -> Optional[int]:
+    words = _WORD_PATTERN.findall(identifier.lower())
+    if len(words) > 1:
+        words = [word for word in words if word not in ORDINAL_FILLER]
+    if len(words) != 1:
+        return None
+    word = words[0]
+    return int(word) if word.isdigit() else ORDINAL_WORDS.get(word)
+
+
+def resolve_product(identifier: str, shown: Sequence[Product] = ()) -> Optional[Product]:
+    """
+    Find the product a customer means, however they referred to it.
+
+    Tries, in order: an ordinal into the products just shown ("2", "the
+    second one"), a product id, also as spoken ("hoodie 1"), an exact name
+    after normalizing case, punctuation, plurals and spelling variants (shown
+    products win), and finally a near-miss name from speech recognition
+    ("black logo hoody"). Every step is a dict or index lookup; the name
+    tables live in the shared search index file.
+
+    Args:
+        identifier: What the customer (or the LLM) said
+        shown: Products most recently read out, for ordinals and precedence
+
+    Returns:
+        The product, or None if nothing is close enough
+    """
+    catalog = CATALOG
+    identifier = identifier.strip()
+    if not identifier:
+        return None
+
+    ordinal = _ordinal(identifier)
+    if ordinal is not None and 1 <= ordinal <= len(shown):
+        return shown[ordinal - 1]
+
+    product = catalog.get(identifier.lower())
+    if product is not None:
+        return product
+
+    index = _search_index(catalog)
+    words = _WORD_PATTERN.findall(identifier.lower())
+    if len(words) == 2 and words[1].isdigit():
+        pos = index.numbered(words[0], int(words[1]))
+        if pos is not None:
+            return catalog[pos]
+
+    key = name_key(identifier)
+    if not key:
+        return None
+    for product in shown:
+        if name_key(product["name"]) == key:
+            return product
+    pos = index.named(key)
+    if pos is not None:
+        return catalog[pos]
+
+    # Part of a name ("the grey one", "espresso cup") counts if only one product fits
+    words = set(key.split())
+    partial = [product for product in shown if words <= set(name_key(product["name"]).split())]
+    if len(partial) == 1:
+        return partial[0]
+
+    # Near miss: let search find candidates, then insist the whole name is close
+    limit = max(2, len(key) // 5)
+    best = None
+    partial = []
+    for pos in index.search(identifier, limit=3):
+        candidate = catalog[pos]
+        name = name_key(candidate.name)
+        distance = edit_distance(key, name, limit)
+        if distance <= limit and (best is None or distance < best[0]):
+            best = (distance, candidate)
+        if words <= set(name.split()):
+            partial.append(candidate)
+    if best is not None:
+        return best[1]
+    return partial[0] if len(partial) == 1 else None
+
+
+MAX_CACHED_SNIPPETS = 10_000  # rendered product snippets kept per catalog
+MAX_CACHED_ORDER_TEXTS = 1024  # rendered order summaries kept
+_snippets: Tuple[Catalog, Dict[str, Tuple[Product, str]]] = (CATALOG, {})
+_order_texts: Dict[str, str] = {}
+
+
+def product_snippet(product: Product) -> str:
+    """
+    Get the one-line description of a product that tool responses show the LLM.
+
+    Rendered once per product and catalog: a catalog reload starts from an
+    empty cache, so edited names or prices never show up stale.
+    """
+    global _snippets
+    catalog, snippets = _snippets
+    if catalog is not CATALOG:
+        catalog, snippets = CATALOG, {}
+        _snippets = (catalog, snippets)
+    cached = snippets.get(product["id"])
+    if cached is not None and cached[0] is product:
+        return cached[1]
+    sizes = f", sizes: {', '.join(product['sizes'])}" if "sizes" in product else ""
+    snippet = f"{product['name']} (ID: {product['id']}) - {product['description']} - {product['currency']} {product['price']}{sizes}"
+    # Only cache products of the current catalog, not ones held from before a reload
+    if catalog.get(product["id"]) is product:
+        if len(snippets) >= MAX_CACHED_SNIPPETS:
+            snippets.clear()
+        snippets[product["id"]] = (product, snippet)
+    return snippet
+
+
+def order_summary(order: Dict) -> str:
+    """
+    Get an order's item lines and total, as tool responses read them back.
+
+    Rendered when the order is created and reused for its confirmation and
+    for order history; quotes (no id yet) are rendered every time.
+    """
+    text = _order_texts.get(order["id"]) if "id" in order else None
+    if text is None:
+        lines = []
+        for item in order["items"]:
+            size_info = f" (size {item['size']})" if item.get("size") else ""
+            lines.append(f"- {item['quantity']} x {item['product_name']}{size_info}: {order['currency']} {item['line_total']}\n")
+        lines.append(f"Total: {order['currency']} {order['total']}")
+        text = "".join(lines)
+        if "id" in order:
+            if len(_order_texts) >= MAX_CACHED_ORDER_TEXTS:
+                _order_texts.clear()
+            _order_texts[order["id"]] = text
+    return text
+
+
+def quote_order(line_items: List[Dict]) -> Dict:
+    """
+    Validate and price line items without placing an order, e.g. for a cart.
     
     Args:
-        line_items: List of dicts with keys:
-            - product_id: str
-            - quantity: int
-            - size: str (optional, for apparel)
+        line_items: Same as for create_order
     
     Returns:
-        Order dict with id, items, total, currency, created_at
-    """
-    if not line_items:
-        raise ValueError("Cannot create order with empty line items")
+        Dict with items, total and currency, as they would appear in the order
     
-    # Validate products and compute total
+    Raises:
+        ValueError: if a product doesn't exist or a size is missing or unavailable
+    """
+    order_items, total = _price_items(line_items)
+    return {"items": order_items, "total": total, "currency": "INR"}
+
+
+def _price_items(line_items: List[Dict]) -> Tuple[List[Dict], int]:
+    """Validate line items against the catalog and price them."""
+    # Validate products and compute total against one catalog generation
+    catalog = CATALOG
     order_items = []
     total = 0
     
@@ -336,9 +774,11 @@ def create_order(line_items: List[Dict]) -> Dict:
         product_id = item.get("product_id")
         quantity = item.get("quantity", 1)
         size = item.get("size")
+        if quantity < 1:
+            raise ValueError(f"Quantity must be at least 1, got {quantity}")
         
         # Find product
-        product = next((p for p in PRODUCTS if p["id"] == product_id), None)
+        product = catalog.get(product_id)
         if not product:
             raise ValueError(f"Product {product_id} not found")
         
@@ -360,9 +800,17 @@ def create_order(line_items: List[Dict]) -> Dict:
             "price": product["price"],
             "line_total": line_total,
         })
+    return order_items, total
+
+
+def _build_order(line_items: List[Dict], customer_id: Optional[str] = None) -> Dict:
+    """Validate line items against the catalog and price a new order."""
+    if not line_items:
+        raise ValueError("Cannot create order with empty line items")
+    order_items, total = _price_items(line_items)
     
     # Create order
-    order_id = f"order_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    order_id = next_order_id()
     order = {
         "id": order_id,
         "items": order_items,
@@ -371,25 +819,126 @@ def create_order(line_items: List[Dict]) -> Dict:
         "created_at": datetime.now().isoformat(),
         "status": "completed",
     }
+    if customer_id is not None:
+        order["customer_id"] = customer_id
+    order_summary(order)
+    return order
+
+
+def create_order(
+    line_items: List[Dict],
+    customer_id: Optional[str] = None,
+    reservations: Optional[List[Reservation]] = None,
+) -> Dict:
+    """
+    Create an order from line items.
     
-    # Save order
-    ORDERS.append(order)
-    _save_order(order)
+    Args:
+        line_items: List of dicts with keys:
+            - product_id: str
+            - quantity: int
+            - size: str (optional, for apparel)
+        customer_id: Customer placing the order, for get_orders
+        reservations: Stock already held for these line items (see
+            reserve_items); without them the stock is reserved here
     
+    Returns:
+        Order dict with id, items, total, currency, created_at
+    
+    Raises:
+        OutOfStockError: if an item is sold out
+    """
+    order = _build_order(line_items, customer_id)
+    committed = _take_stock(line_items, reservations)
+    try:
+        with span("persist"):
+            ORDER_STORE.append(order)
+    except Exception:
+        _return_stock(committed)
+        raise
     return order
 
 
-def get_last_order() -> Optional[Dict]:
+async def create_order_async(
+    line_items: List[Dict],
+    customer_id: Optional[str] = None,
+    reservations: Optional[List[Reservation]] = None,
+) -> Dict:
+    """
+    Create an order without blocking the event loop.
+
+    Same as create_order, but the order is written by the order writer
+    thread, batched with orders from other sessions, and this returns once
+    it is in the order log.
     """
-    Get the most recent order.
+    order = _build_order(line_items, customer_id)
+    committed = _take_stock(line_items, reservations)
+    try:
+        with span("persist"):
+            writer = _order_writer()
+            try:
+                future = writer.submit(order, block=False)
+            except queue.Full:
+                # Back-pressure: wait for room off the event loop
+                future = await asyncio.to_thread(writer.submit, order)
+            await asyncio.wrap_future(future)
+    except Exception:
+        _return_stock(committed)
+        raise
+    return order
+
+
+def get_orders(
+    customer_id: str,
+    limit: Optional[int] = 10,
+    before: Optional[str] = None,
+    since: Optional[str] = None,
+) -> List[Dict]:
+    """
+    Get a customer's orders, newest first.
+    
+    Only this customer's orders are looked at, so the cost depends on the
+    page size rather than on how many orders the store holds.
+    
+    Args:
+        customer_id: Customer whose orders to get
+        limit: Most orders to return (all if None)
+        before: Order id to page back from; only older orders are returned
+        since: ISO timestamp; only orders created at or after it are returned
     
     Returns:
-        Most recent order dict or None if no orders exist
+        List of order dicts
     """
-    if not ORDERS:
-        return None
-    return ORDERS[-1]
+    return ORDER_STORE.for_customer(customer_id, limit, before, since)
+
+
+def iter_orders() -> Iterator[Dict]:
+    """
+    Stream every order, oldest first, e.g. for reports or exports.
+    
+    Orders are read from disk as the caller goes, so memory use doesn't
+    grow with the number of orders stored.
+    """
+    return ORDER_STORE.iter_orders()
+
+
+def get_last_order(customer_id: Optional[str] = None) -> Optional[Dict]:
+    """
+    Get the most recent order, a customer's or anyone's.
+    
+    Args:
+        customer_id: Customer whose last order to get (None for the last order placed)
+    
+    Returns:
+        Most recent order dict or None if there are no orders
+    """
+    if customer_id is None:
+        return ORDER_STORE.last()
+    orders = get_orders(customer_id, limit=1)
+    return orders[0] if orders else None
 
 
 # Load orders on module import
 _load_orders()
+atexit.register(_close_orders)
+atexit.register(_close_inventory)
@@ -0,0 +1,589 @@
+"""
+Order storage shared by every job and worker process on a host.
+
+Orders are persisted as a snapshot plus an append-only JSON-lines log of the
+orders placed since that snapshot. Appends and compactions hold an exclusive
+OS file lock, reads a shared one, and a thread lock covers callers inside
+one process. Before every operation a store catches up with records other
+processes appended to the log; a compaction swaps in a new log file, which
+tells the others to reload.
+
+The snapshot is itself JSON lines, only ever appended to: a compaction
+copies the log's orders onto its end. Next to it, an index file maps
+(customer, order id) to each record's byte range, sorted, so it can be
+memory-mapped and binary-searched like the catalog. Opening a store reads
+neither the snapshot nor the index; only the log's orders (at most
+compact_every of them) are held in memory. Customer history is a bisect in
+the index plus one read per returned order, and iter_orders() streams the
+full history from disk when something really needs all of it.
+
+Index layout (native byte order):
+
+    header    magic, version, count, snapshot length covered,
+              keys offset, last record offset and length
+    entries   count x (key offset, key length, record offset, record length),
+              sorted by key (customer_id NUL order id)
+    keys      key bytes; compactions only append, so old offsets stay valid
+"""
+
+import json
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, one worker per host
+    fcntl = None
+
+MAGIC = b"EORDERIX"
+VERSION = 1
+# magic, version, count, snapshot length, keys offset, last offset, last length
+INDEX_HEADER = struct.Struct("=8sIQQQQI")
+INDEX_ENTRY = struct.Struct("=QIQI")
+
+
+def _fsync_dir(path: str):
+    """Make a rename in path's directory durable (best effort off POSIX)."""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_dir(path)
+
+
+def _parse_lines(data: bytes) -> Tuple[List[Dict], int]:
+    """Parse complete JSON lines; also return how many bytes they span."""
+    end = data.rfind(b"\n") + 1
+    return [json.loads(line) for line in data[:end].splitlines() if line.strip()], end
+
+
+def _record(order: Dict) -> bytes:
+    return (json.dumps(order, separators=(",", ":")) + "\n").encode()
+
+
+def _key(order: Dict) -> bytes:
+    return f"{order.get('customer_id') or ''}\0{order.get('id', '')}".encode()
+
+
+class _SnapshotIndex:
+    """Memory-mapped, sorted (customer, order id) -> record range table."""
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        magic, version, self.count, self.length, self._keys, last_offset, last_length = INDEX_HEADER.unpack_from(
+            buffer, 0
+        )
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not an order index (or written by another version)")
+        self.last = (last_offset, last_length) if self.count else None
+
+    @classmethod
+    def open(cls, path: str) -> Optional["_SnapshotIndex"]:
+        """Map an index file, or get None if it is missing or unreadable."""
+        try:
+            with open(path, "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):  # ValueError: empty file
+            return None
+        try:
+            return cls(buffer)
+        except (ValueError, struct.error):
+            buffer.close()
+            return None
+
+    @staticmethod
+    def encode(
+        old: Optional["_SnapshotIndex"],
+        new: List[Tuple[bytes, int, int]],
+        length: int,
+        last: Optional[Tuple[int, int]],
+    ) -> bytes:
+        """
+        Index an old index's records plus new (key, offset, length) ones.
+
+        Old entries are copied in runs between the new entries' insertion
+        points and old keys are kept as they are, so the cost is a bisect
+        per new record plus copying bytes.
+        """
+        new = sorted(new)
+        old_keys = old._buffer[old._keys :] if old is not None else b""
+        old_count = old.count if old is not None else 0
+        entries = bytearray()
+        keys = bytearray(old_keys)
+        copied = 0
+        for key, offset, size in new:
+            i = old.bisect(key) if old is not None else 0
+            start = INDEX_HEADER.size + copied * INDEX_ENTRY.size
+            entries += old._buffer[start : INDEX_HEADER.size + i * INDEX_ENTRY.size] if i > copied else b""
+            copied = max(copied, i)
+            entries += INDEX_ENTRY.pack(len(keys), len(key), offset, size)
+            keys += key
+        if old is not None and copied < old_count:
+            entries += old._buffer[INDEX_HEADER.size + copied * INDEX_ENTRY.size : old._keys]
+        count = old_count + len(new)
+        last_offset, last_length = last or (0, 0)
+        header = INDEX_HEADER.pack(
+            MAGIC, VERSION, count, length, INDEX_HEADER.size + len(entries), last_offset, last_length
+        )
+        return header + bytes(entries) + bytes(keys)
+
+    def close(self):
+        self._buffer.close()
+
+    def _entry(self, i: int) -> Tuple[int, int, int, int]:
+        return INDEX_ENTRY.unpack_from(self._buffer, INDEX_HEADER.size + i * INDEX_ENTRY.size)
+
+    def _key_at(self, i: int) -> bytes:
+        key_offset, key_length, _, _ = self._entry(i)
+        start = self._keys + key_offset
+        return self._buffer[start : start + key_length]
+
+    def bisect(self, key: bytes) -> int:
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def __contains__(self, key: bytes) -> bool:
+        i = self.bisect(key)
+        return i < self.count and self._key_at(i) == key
+
+    def history(self, customer_id: str, before: Optional[str] = None) -> Iterator[Tuple[int, int]]:
+        """Yield the record ranges of a customer's orders, newest first."""
+        prefix = f"{customer_id}\0".encode()
+        end = f"{customer_id}\1".encode() if before is None else prefix + before.encode()
+        i = self.bisect(end)
+        while i > 0:
+            i -= 1
+            key_offset, key_length, offset, length = self._entry(i)
+            start = self._keys + key_offset
+            if self._buffer[start : start + key_length][: len(prefix)] != prefix:
+                return
+            yield offset, length
+
+
+class OrderStore:
+    """Append-only order log with an indexed, append-only snapshot, safe across processes."""
+
+    def __init__(
+        self,
+        snapshot_path: str,
+        log_path: str,
+        fsync_every: int = 16,
+        fsync_interval: float = 1.0,
+        compact_every: int = 1000,
+    ):
+        self.snapshot_path = snapshot_path
+        self.index_path = f"{snapshot_path}.idx"
+        self.log_path = log_path
+        self.fsync_every = fsync_every  # fsync the log after this many unsynced orders...
+        self.fsync_interval = fsync_interval  # ...or once this many seconds have passed
+        # Fold the log into the snapshot at this size; also the most orders held in memory
+        self.compact_every = compact_every
+
+        self._lock = threading.RLock()
+        self._lock_file = open(f"{log_path}.lock", "a+b")  # noqa: SIM115 - flocked for the store's lifetime
+        self._index: Optional[_SnapshotIndex] = None
+        self._snapshot = None  # read handle
+        self._tail: List[Dict] = []  # orders in the log, not yet in the snapshot
+        self._by_customer: Dict[str, Tuple[List[str], List[Dict]]] = {}  # order ids, orders (of _tail)
+        self._log = None  # append handle
+        self._log_ino: Optional[int] = None
+        self._log_offset = 0  # bytes of the log already applied to _tail
+        self._log_records = 0
+        self._unsynced = 0
+        self._last_fsync = 0.0
+        with self._locked(exclusive=True):
+            self._prepare_snapshot()
+            self._reload()
+
+    @contextmanager
+    def _locked(self, exclusive: bool) -> Iterator[None]:
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _prepare_snapshot(self):
+        """Convert a JSON array snapshot and (re)build a missing or stale index."""
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                legacy = f.read(64).lstrip()[:1] == b"["
+                if legacy:
+                    # Snapshots used to be one JSON array, loaded whole at startup
+                    f.seek(0)
+                    data = f.read()
+        except FileNotFoundError:
+            return
+        if legacy:
+            try:
+                orders = json.loads(data)
+            except Exception as e:
+                # Keep it for recovery by hand; compactions would replace it
+                aside = f"{self.snapshot_path}.unreadable-{time.strftime('%Y%m%d_%H%M%S', time.gmtime())}"
+                os.replace(self.snapshot_path, aside)
+                _fsync_dir(aside)
+                print(f"Error reading orders snapshot: {e}; moved it to {aside}")
+                return
+            _write_atomic(self.snapshot_path, b"".join(_record(order) for order in orders))
+        else:
+            index = _SnapshotIndex.open(self.index_path)
+            if index is not None:
+                fresh = index.length <= os.path.getsize(self.snapshot_path)
+                index.close()
+                if fresh:
+                    return
+
+        # Index every complete record; a torn one at the end is cut at the next compaction
+        entries = []
+        offset = 0
+        with open(self.snapshot_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                if line.strip():
+                    entries.append((_key(json.loads(line)), offset, len(line)))
+                offset += len(line)
+        last = entries[-1][1:] if entries else None
+        _write_atomic(self.index_path, _SnapshotIndex.encode(None, entries, offset, last))
+
+    def _reload(self):
+        """Map the snapshot index, then replay the whole log tail."""
+        self._close_log()
+        if self._index is not None:
+            self._index.close()
+        self._index = _SnapshotIndex.open(self.index_path)
+        if self._snapshot is not None:
+            self._snapshot.close()
+            self._snapshot = None
+        if self._index is not None:
+            self._snapshot = open(self.snapshot_path, "rb")  # noqa: SIM115 - read by offset until the next reload
+        self._tail = []
+        self._by_customer = {}
+        self._log_ino = None
+        self._log_offset = 0
+        self._log_records = 0
+        try:
+            with open(self.log_path, "rb") as f:
+                self._log_ino = os.fstat(f.fileno()).st_ino
+                tail, self._log_offset = _parse_lines(f.read())
+        except FileNotFoundError:
+            tail = []
+        # A crash between extending the snapshot and replacing the log leaves
+        # records that are already in the snapshot, so skip anything indexed.
+        for order in tail:
+            if self._index is None or _key(order) not in self._index:
+                self._tail.append(order)
+        self._log_records = len(tail)
+        self._index_tail(self._tail)
+
+    def _index_tail(self, orders: List[Dict]):
+        for order in orders:
+            customer_id = order.get("customer_id")
+            if customer_id is None:
+                continue
+            ids, history = self._by_customer.setdefault(customer_id, ([], []))
+            order_id = order.get("id", "")
+            if not ids or ids[-1] <= order_id:
+                ids.append(order_id)
+                history.append(order)
+            else:  # ids from another process can land slightly out of order
+                i = bisect_left(ids, order_id)
+                ids.insert(i, order_id)
+                history.insert(i, order)
+
+    def _refresh(self, exclusive: bool):
+        """Catch up with orders that other processes appended or compacted."""
+        try:
+            st = os.stat(self.log_path)
+        except FileNotFoundError:
+            st = None
+        if st is None or st.st_ino != self._log_ino or st.st_size < self._log_offset:
+            if st is not None or self._log_ino is not None:
+                self._reload()
+        elif st.st_size > self._log_offset:
+            with open(self.log_path, "rb") as f:
+                f.seek(self._log_offset)
+                records, used = _parse_lines(f.read())
+            self._tail.extend(records)
+            self._index_tail(records)
+            self._log_offset += used
+            self._log_records += len(records)
+        if exclusive and st is not None and os.path.getsize(self.log_path) > self._log_offset:
+            # Writers hold the lock for a whole record, so leftovers under an
+            # exclusive lock are a torn write from a crash; cut them off so
+            # new appends start on a clean line.
+            with open(self.log_path, "r+b") as f:
+                f.truncate(self._log_offset)
+
+    def _read(self, offset: int, length: int) -> Dict:
+        self._snapshot.seek(offset)
+        return json.loads(self._snapshot.read(length))
+
+    def _fsync_log(self):
+        if self._log is None:
+            return
+        self._log.flush()
+        os.fsync(self._log.fileno())
+        self._unsynced = 0
+        self._last_fsync = time.monotonic()
+
+    def _close_log(self):
+        if self._log is None:
+            return
+        try:
+            self._fsync_log()
+            self._log.close()
+        finally:
+            self._log = None
+
+    def _compact(self):
+        self._close_log()
+        if self._tail:
+            length = self._index.length if self._index is not None else 0
+            entries = []
+            records = []
+            offset = length
+            for order in self._tail:
+                record = _record(order)
+                entries.append((_key(order), offset, len(record)))
+                records.append(record)
+                offset += len(record)
+            with open(self.snapshot_path, "a+b") as f:
+                # Anything past the indexed length is from a compaction that
+                # crashed before its index was written; those orders are still
+                # in the log, which is what we are appending now.
+                f.truncate(length)
+                f.write(b"".join(records))
+                f.flush()
+                os.fsync(f.fileno())
+            # The index is only ever replaced atomically, never rewritten in place
+            index = _SnapshotIndex.encode(self._index, entries, offset, entries[-1][1:])
+            _write_atomic(self.index_path, index)
+            if self._index is not None:
+                self._index.close()
+            self._index = _SnapshotIndex.open(self.index_path)
+            if self._snapshot is None:
+                self._snapshot = open(self.snapshot_path, "rb")  # noqa: SIM115 - read by offset until the next reload
+        # A fresh log file (new inode) tells other processes to reload
+        tmp_path = f"{self.log_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb"):
+            pass
+        os.replace(tmp_path, self.log_path)
+        _fsync_dir(self.log_path)
+        self._log_ino = os.stat(self.log_path).st_ino
+        self._log_offset = 0
+        self._log_records = 0
+        self._tail = []
+        self._by_customer = {}
+
+    def append(self, order: Dict):
+        """Durably queue an order; syncs in batches and compacts periodically."""
+        self.append_many([order])
+
+    def append_many(self, orders: List[Dict]):
+        """Append several orders with one lock, one write and at most one fsync."""
+        records = b"".join(_record(order) for order in orders)
+        with self._locked(exclusive=True):
+            self._refresh(exclusive=True)
+            if self._log is None:
+                self._log = open(self.log_path, "ab")  # noqa: SIM115 - appended to until the log is replaced
+                self._log_ino = os.fstat(self._log.fileno()).st_ino
+            self._log.write(records)
+            self._log.flush()
+            self._tail.extend(orders)
+            self._index_tail(orders)
+            self._log_offset += len(records)
+            self._log_records += len(orders)
+            self._unsynced += len(orders)
+            if self._unsynced >= self.fsync_every or time.monotonic() - self._last_fsync >= self.fsync_interval:
+                self._fsync_log()
+            if self._log_records >= self.compact_every:
+                self._compact()
+
+    def compact(self):
+        """Fold the log into the snapshot and start a new, empty log."""
+        with self._locked(exclusive=True):
+            self._refresh(exclusive=True)
+            self._compact()
+
+    def iter_orders(self) -> Iterator[Dict]:
+        """Stream every order from disk, oldest first, without holding them all in memory."""
+        with self._locked(exclusive=False):
+            self._refresh(exclusive=False)
+            length = self._index.length if self._index is not None else 0
+            tail = list(self._tail)
+        if length:
+            # The snapshot only grows, so the first length bytes can't change under us
+            with open(self.snapshot_path, "rb") as f:
+                for line in f:
+                    length -= len(line)
+                    if line.strip():
+                        yield json.loads(line)
+                    if length <= 0:
+                        break
+        yield from tail
+
+    def all(self) -> List[Dict]:
+        """Get every order, oldest first."""
+        return list(self.iter_orders())
+
+    def last(self) -> Optional[Dict]:
+        """Get the most recent order from any process."""
+        with self._locked(exclusive=False):
+            self._refresh(exclusive=False)
+            if self._tail:
+                return self._tail[-1]
+            if self._index is not None and self._index.last is not None:
+                return self._read(*self._index.last)
+            return None
+
+    def for_customer(
+        self,
+        customer_id: str,
+        limit: Optional[int] = None,
+        before: Optional[str] = None,
+        since: Optional[str] = None,
+    ) -> List[Dict]:
+        """
+        Get one customer's orders, newest first.
+
+        Args:
+            customer_id: Customer whose orders to get
+            limit: Most orders to return (all if None)
+            before: Only orders older than this order id, to page back in history
+            since: Only orders created at or after this ISO timestamp
+
+        Returns:
+            List of order dicts
+        """
+        if not customer_id:
+            return []
+        with self._locked(exclusive=False):
+            self._refresh(exclusive=False)
+            ids, history = self._by_customer.get(customer_id, ([], []))
+            end = len(ids) if before is None else bisect_left(ids, before)
+            start = 0 if limit is None else max(0, end - limit)
+            orders = history[start:end][::-1]
+            if self._index is not None:
+                older = []
+                for offset, length in self._index.history(customer_id, before):
+                    if limit is not None and len(older) >= limit:
+                        break
+                    order = self._read(offset, length)
+                    if since is not None and order.get("created_at", "") < since:
+                        break
+                    older.append(order)
+                if older:
+                    # Order ids are time-ordered, across the log and the snapshot
+                    orders = sorted(orders + older, key=lambda o: o.get("id", ""), reverse=True)[:limit]
+        if since is not None:
+            # Newest first, so the matching orders are a prefix
+            for i, order in enumerate(orders):
+                if order.get("created_at", "") < since:
+                    return orders[:i]
+        return orders
+
+    def close(self):
+        """Sync and close the log; the store can't be used afterwards."""
+        with self._lock:
+            self._close_log()
+            if self._snapshot is not None:
+                self._snapshot.close()
+                self._snapshot = None
+            if self._index is not None:
+                self._index.close()
+                self._index = None
+            self._lock_file.close()
+
+
+class OrderWriter:
+    """
+    Dedicated thread that persists orders for async callers.
+
+    Orders wait in a bounded queue; the thread drains whatever has piled up
+    and writes it with a single append_many (group commit), then resolves
+    each order's future so callers learn when it is written, or why not.
+    """
+
+    def __init__(self, store: OrderStore, max_queue: int = 1024, max_batch: int = 256):
+        self.store = store
+        self.max_batch = max_batch
+        self._queue: queue.Queue[Optional[Tuple[Dict, Future]]] = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="order-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, order: Dict, block: bool = True) -> Future:
+        """
+        Queue an order for writing.
+
+        Raises:
+            queue.Full: if block is False and the queue is full
+        """
+        future: Future = Future()
+        self._queue.put((order, future), block=block)
+        return future
+
+    def _run(self):
+        running = True
+        while running:
+            item = self._queue.get()
+            batch = []
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.max_batch:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            else:
+                running = False
+            if not batch:
+                continue
+            try:
+                self.store.append_many([order for order, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                for _, future in batch:
+                    future.set_result(None)
+
+    def close(self):
+        """Write everything still queued, then stop the thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
@@ -0,0 +1,624 @@
+"""
+Full-text product search.
+
+An inverted index over product name, description, category and color with
+BM25 scoring. Query words that aren't in the vocabulary fall back to prefix
+matches ("hood" -> "hoodie") and then to terms within a small edit distance,
+found through a trigram index ("hoody" -> "hoodie"), so mis-transcribed
+speech still finds products.
+
+Postings are kept twice per term: ordered by score, so a top-K query can
+stop early (Fagin's threshold algorithm; past SCORE_BUDGET scored
+documents it ranks, exactly, just the matches that can still beat the
+K-th best found, unless that means expanding more than EXPAND_BUDGET
+postings), and ordered by position, so a document's score for any term
+is a bisect away.
+
+The same file holds the name tables resolve_product needs: every product
+name in its normalized spoken form (see name_key), and every id of the form
+"prefix-number" by prefix and number, so "black logo hoody" or "hoodie 1"
+resolve with a bisect instead of a table each process builds.
+
+Like the catalog, the index is one flat buffer: built in memory for a
+catalog, or written next to the catalog file once and memory-mapped by
+every process, which then share its pages instead of each building its
+own copy. Layout (offsets absolute, arrays in native byte order):
+
+    header    magic, version, product count, catalog signature,
+              term and trigram counts, section offsets
+    postings  per term: scores, scores by position (doubles), then
+              positions by score, positions ascending
+    terms     term bytes, then count x (term offset, term length,
+              postings offset, postings length), sorted by term
+    trigrams  term id arrays, then count x (trigram, term count,
+              ids offset), sorted by trigram
+    facets    category id and color id per product, then prices
+    names     key bytes, then count x (key offset, key length, position),
+              sorted by key; once for names, once for prefix NUL number
+    meta      JSON {"categories": [...], "colors": [...]}
+"""
+
+import heapq
+import json
+import math
+import mmap
+import re
+import struct
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from catalog import _align, write_atomic
+
+K1 = 1.2
+B = 0.75
+NAME_BOOST = 2  # name words count this many times towards term frequency
+PREFIX_WEIGHT = 0.7
+FUZZY_WEIGHT = 0.5
+MAX_EXPANSIONS = 8  # prefix/fuzzy terms tried per query word
+MAX_CACHED_WORDS = 10_000  # query word expansions remembered per index
+# Most documents passing the facets a top-K query scores in score order
+# before it gives up on stopping early and ranks what can still beat the K-th.
+SCORE_BUDGET = 128
+# Most postings that ranking may expand; past it the best scored so far stand.
+EXPAND_BUDGET = 1024
+
+STOPWORDS = frozenset(
+    (
+        "a", "an", "and", "any", "are", "do", "for", "have", "i", "in", "is", "it", "me", "of", "on",
+        "or", "please", "show", "some", "the", "to", "under", "want", "with", "you", "your",
+    )
+)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+MAGIC = b"ESEARCHX"
+VERSION = 2
+# magic, version, products, catalog size, catalog mtime, terms, term entries,
+# trigrams, trigram entries, facets, meta offset, meta length, names, name
+# entries, numbers, number entries
+HEADER = struct.Struct("=8sIIQQIQIQQQQIQIQ")
+TERM_ENTRY = struct.Struct("=QIQI")
+GRAM_ENTRY = struct.Struct("=4sIQ")
+KEY_ENTRY = struct.Struct("=QII")
+
+# Spelling variants that should resolve to the same product name
+NAME_ALIASES = {
+    "tshirt": "shirt",
+    "tee": "shirt",
+    "hoody": "hoodie",
+    "gray": "grey",
+    "colour": "color",
+}
+NAME_FILLER = frozenset(("the", "an", "one", "please", "that", "this"))
+
+
+@lru_cache(maxsize=65536)
+def _normalize(word: str) -> str:
+    # Cheap plural folding so "hoodies" and "caps" meet "hoodie" and "cap"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into normalized search terms."""
+    return [_normalize(word) for word in _TOKEN_PATTERN.findall(text.lower()) if len(word) > 1]
+
+
+def name_key(text: str) -> str:
+    """Normalize a product name (or a spoken attempt at one) for lookup."""
+    words = (NAME_ALIASES.get(word, word) for word in tokenize(text))
+    return " ".join(word for word in words if word not in NAME_FILLER)
+
+
+def _number_key(prefix: str, number: int) -> str:
+    return f"{prefix}\0{number}"
+
+
+def _trigrams(term: str) -> Set[str]:
+    padded = f"${term}$"
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, or limit + 1 as soon as it must exceed limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _gram_key(gram: str) -> bytes:
+    return gram.encode().ljust(4, b"\0")
+
+
+def _encode_keys(out: bytearray, table: Dict[str, int]) -> int:
+    """Append a sorted key -> position table; get the offset of its entries."""
+    keys = sorted((key.encode(), pos) for key, pos in table.items())
+    offsets = []
+    for key, _ in keys:
+        offsets.append(len(out))
+        out += key
+    entries_offset = _align(out)
+    for (key, pos), offset in zip(keys, offsets):
+        out += KEY_ENTRY.pack(offset, len(key), pos)
+    return entries_offset
+
+
+def encode_index(catalog) -> bytes:
+    """Build the search index of a catalog in its binary layout."""
+    categories: Dict[str, int] = {}
+    colors: Dict[str, int] = {}
+    category_ids = array("H")
+    color_ids = array("H")
+    prices = array("I")
+
+    term_freqs: Dict[str, List[Tuple[int, int]]] = {}
+    lengths = array("I")
+    names: Dict[str, int] = {}
+    numbers: Dict[str, int] = {}
+    for pos, product in enumerate(catalog):
+        names.setdefault(name_key(product.name), pos)
+        prefix, _, number = product.id.rpartition("-")
+        if prefix and number.isdigit():
+            numbers[_number_key(prefix, int(number))] = pos
+        category_ids.append(categories.setdefault(product.category.lower(), len(categories)))
+        color_ids.append(colors.setdefault(product.color.lower(), len(colors)))
+        prices.append(product.price)
+        counts: Dict[str, int] = {}
+        for term in tokenize(product.name):
+            counts[term] = counts.get(term, 0) + NAME_BOOST
+        for term in tokenize(f"{product.description} {product.category} {product.color}"):
+            counts[term] = counts.get(term, 0) + 1
+        lengths.append(sum(counts.values()))
+        for term, tf in counts.items():
+            term_freqs.setdefault(term, []).append((pos, tf))
+
+    n = len(lengths)
+    avg_length = sum(lengths) / n if n else 0.0
+    out = bytearray(HEADER.size)
+    vocabulary = sorted(term_freqs)
+    postings = []
+    for term in vocabulary:
+        freqs = term_freqs[term]
+        idf = math.log(1 + (n - len(freqs) + 0.5) / (len(freqs) + 0.5))
+        entries = [
+            (pos, idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * lengths[pos] / avg_length)))
+            for pos, tf in freqs
+        ]
+        ranked = sorted(entries, key=lambda e: (-e[1], e[0]))
+        postings.append((_align(out), len(entries)))
+        out += array("d", (score for _, score in ranked)).tobytes()
+        out += array("d", (score for _, score in entries)).tobytes()
+        out += array("I", (pos for pos, _ in ranked)).tobytes()
+        out += array("I", (pos for pos, _ in entries)).tobytes()
+
+    term_offsets = []
+    for term in vocabulary:
+        term_offsets.append(len(out))
+        out += term.encode()
+    terms_offset = _align(out)
+    for term, offset, (postings_offset, count) in zip(vocabulary, term_offsets, postings):
+        out += TERM_ENTRY.pack(offset, len(term.encode()), postings_offset, count)
+
+    by_trigram: Dict[bytes, List[int]] = {}
+    for term_id, term in enumerate(vocabulary):
+        if not term.isdigit():
+            for gram in _trigrams(term):
+                by_trigram.setdefault(_gram_key(gram), []).append(term_id)
+    grams = sorted(by_trigram)
+    gram_offsets = []
+    for gram in grams:
+        gram_offsets.append(_align(out))
+        out += array("I", by_trigram[gram]).tobytes()
+    grams_offset = _align(out)
+    for gram, offset in zip(grams, gram_offsets):
+        out += GRAM_ENTRY.pack(gram, len(by_trigram[gram]), offset)
+
+    facets_offset = _align(out)
+    out += category_ids.tobytes()
+    out += color_ids.tobytes()
+    out += prices.tobytes()
+
+    names_offset = _encode_keys(out, names)
+    numbers_offset = _encode_keys(out, numbers)
+
+    meta = json.dumps({"categories": list(categories), "colors": list(colors)}, separators=(",", ":")).encode()
+    meta_offset = _align(out)
+    out += meta
+
+    size, mtime = catalog.signature
+    HEADER.pack_into(
+        out, 0, MAGIC, VERSION, n, size, mtime, len(vocabulary), terms_offset,
+        len(grams), grams_offset, facets_offset, meta_offset, len(meta),
+        len(names), names_offset, len(numbers), numbers_offset,
+    )
+    return bytes(out)
+
+
+def write_index(catalog, path: str):
+    """Write a catalog's search index file atomically, so readers never see a partial file."""
+    write_atomic(encode_index(catalog), path)
+
+
+class _Terms:
+    """The sorted vocabulary, decoded on access; bisect works on it directly."""
+
+    __slots__ = ("_buffer", "_count", "_offset")
+
+    def __init__(self, buffer, offset: int, count: int):
+        self._buffer = buffer
+        self._offset = offset
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i: int) -> str:
+        offset, length, _, _ = TERM_ENTRY.unpack_from(self._buffer, self._offset + i * TERM_ENTRY.size)
+        return self._buffer[offset : offset + length].decode()
+
+    def postings(self, i: int) -> Tuple[int, int]:
+        return TERM_ENTRY.unpack_from(self._buffer, self._offset + i * TERM_ENTRY.size)[2:]
+
+
+class _Keys:
+    """A sorted key -> position table, searched in place."""
+
+    __slots__ = ("_buffer", "_count", "_offset")
+
+    def __init__(self, buffer, offset: int, count: int):
+        self._buffer = buffer
+        self._offset = offset
+        self._count = count
+
+    def get(self, key: str) -> Optional[int]:
+        target = key.encode()
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset, length, pos = KEY_ENTRY.unpack_from(self._buffer, self._offset + mid * KEY_ENTRY.size)
+            candidate = self._buffer[offset : offset + length]
+            if candidate == target:
+                return pos
+            if candidate < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+
+class _Postings:
+    __slots__ = ("by_pos", "by_score", "pos_scores", "scores")
+
+    def __init__(self, view: memoryview, offset: int, n: int):
+        scores = offset + 8 * n
+        by_score = scores + 8 * n
+        by_pos = by_score + 4 * n
+        self.scores = view[offset:scores].cast("d")
+        self.pos_scores = view[scores:by_score].cast("d")
+        self.by_score = view[by_score:by_pos].cast("I")
+        self.by_pos = view[by_pos : by_pos + 4 * n].cast("I")
+
+    def __len__(self) -> int:
+        return len(self.by_pos)
+
+    def score(self, pos: int) -> float:
+        i = bisect_left(self.by_pos, pos)
+        if i < len(self.by_pos) and self.by_pos[i] == pos:
+            return self.pos_scores[i]
+        return 0.0
+
+    def reaching(self, score: float) -> int:
+        """How many postings, best first, score at least score."""
+        lo, hi = 0, len(self.scores)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.scores[mid] >= score:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+
+class SearchIndex:
+    """Inverted index over a catalog, built once per catalog generation."""
+
+    def __init__(self, catalog, buffer=None):
+        self.catalog = catalog
+        if buffer is None:
+            buffer = encode_index(catalog)
+        self._buffer = buffer
+        view = self._view = memoryview(buffer)
+        (
+            magic, version, n, size, mtime, terms, terms_offset,
+            grams, grams_offset, facets_offset, meta_offset, meta_len,
+            names, names_offset, numbers, numbers_offset,
+        ) = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a search index file (or written by another version)")
+        if n != len(catalog) or (size, mtime) != catalog.signature:
+            raise ValueError("Search index was built for another catalog")
+
+        self._terms = _Terms(buffer, terms_offset, terms)
+        self._names = _Keys(buffer, names_offset, names)
+        self._numbers = _Keys(buffer, numbers_offset, numbers)
+        self._grams = grams
+        self._grams_offset = grams_offset
+        self._categories = view[facets_offset : facets_offset + 2 * n].cast("H")
+        self._colors = view[facets_offset + 2 * n : facets_offset + 4 * n].cast("H")
+        self._prices = view[facets_offset + 4 * n : facets_offset + 8 * n].cast("I")
+        meta = json.loads(bytes(view[meta_offset : meta_offset + meta_len]))
+        self._category_ids = {name: i for i, name in enumerate(meta["categories"])}
+        self._color_ids = {name: i for i, name in enumerate(meta["colors"])}
+        self._postings: Dict[str, Optional[_Postings]] = {}
+        self._expanded: Dict[str, List[Tuple[str, float]]] = {}
+
+    @classmethod
+    def open(cls, path: str, catalog) -> "SearchIndex":
+        """Map an index file read-only; its pages are shared between processes."""
+        with open(path, "rb") as f:
+            return cls(catalog, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def named(self, key: str) -> Optional[int]:
+        """Position of the first product whose name_key is key, or None."""
+        return self._names.get(key)
+
+    def numbered(self, prefix: str, number: int) -> Optional[int]:
+        """Position of the product with id "prefix-number" (any zero padding), or None."""
+        return self._numbers.get(_number_key(prefix, number))
+
+    def _lookup(self, term: str) -> Optional[_Postings]:
+        """Get a term's postings, or None if it isn't in the index."""
+        try:
+            return self._postings[term]
+        except KeyError:
+            pass
+        i = bisect_left(self._terms, term)
+        postings = None
+        if i < len(self._terms) and self._terms[i] == term:
+            postings = _Postings(self._view, *self._terms.postings(i))
+        if len(self._postings) >= MAX_CACHED_WORDS:
+            self._postings.clear()
+        self._postings[term] = postings
+        return postings
+
+    def _trigram_terms(self, gram: str) -> Sequence[int]:
+        """Ids of the terms containing a trigram."""
+        key = _gram_key(gram)
+        lo, hi = 0, self._grams
+        while lo < hi:
+            mid = (lo + hi) // 2
+            candidate, count, offset = GRAM_ENTRY.unpack_from(self._buffer, self._grams_offset + mid * GRAM_ENTRY.size)
+            if candidate == key:
+                return self._view[offset : offset + 4 * count].cast("I")
+            if candidate < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return ()
+
+    def expand(self, word: str) -> List[Tuple[str, float]]:
+        """Map a query word to index terms with a match weight."""
+        expanded = self._expanded.get(word)
+        if expanded is None:
+            if len(self._expanded) >= MAX_CACHED_WORDS:
+                self._expanded.clear()
+            expanded = self._expanded[word] = self._expand(word)
+        return expanded
+
+    def _expand(self, word: str) -> List[Tuple[str, float]]:
+        if self._lookup(word) is not None:
+            return [(word, 1.0)]
+        if word.isdigit():
+            return []
+
+        vocabulary = self._terms
+        if len(word) >= 3:
+            i = bisect_left(vocabulary, word)
+            prefixed = []
+            while i < len(vocabulary) and len(prefixed) < MAX_EXPANSIONS:
+                term = vocabulary[i]
+                if not term.startswith(word):
+                    break
+                prefixed.append((term, PREFIX_WEIGHT))
+                i += 1
+            if prefixed:
+                return prefixed
+
+        limit = 1 if len(word) <= 4 else 2
+        grams = _trigrams(word)
+        shared: Dict[int, int] = {}
+        for gram in grams:
+            for term_id in self._trigram_terms(gram):
+                shared[term_id] = shared.get(term_id, 0) + 1
+        # Each edit destroys at most three trigrams
+        needed = len(grams) - 3 * limit
+        close = []
+        for term_id, count in sorted(shared.items(), key=lambda item: -item[1]):
+            if count < needed:
+                break
+            term = vocabulary[term_id]
+            distance = edit_distance(word, term, limit)
+            if distance <= limit:
+                close.append((distance, term))
+        close.sort()
+        return [(term, FUZZY_WEIGHT) for _, term in close[:MAX_EXPANSIONS]]
+
+    def search(
+        self,
+        query: str,
+        category: Optional[str] = None,
+        color: Optional[str] = None,
+        max_price: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> List[int]:
+        """
+        Rank products for a query and get their positions, best first.
+
+        With facets, products that match the facets but none of the query
+        words still qualify; they follow the scored ones in catalog order.
+        Query words that just name the category or color are left to the
+        facets rather than scored.
+        """
+        terms: Dict[str, float] = {}
+        for word in tokenize(query):
+            if word not in STOPWORDS and word != category and word != color:
+                for term, weight in self.expand(word):
+                    terms[term] = max(weight, terms.get(term, 0.0))
+
+        category_id = None if category is None else self._category_ids.get(category, -1)
+        color_id = None if color is None else self._color_ids.get(color, -1)
+        categories, colors, prices = self._categories, self._colors, self._prices
+
+        def accept(pos: int) -> bool:
+            return (
+                (category_id is None or categories[pos] == category_id)
+                and (color_id is None or colors[pos] == color_id)
+                and (max_price is None or prices[pos] <= max_price)
+            )
+
+        weighted = [(self._lookup(term), weight) for term, weight in terms.items()]
+        if limit is None:
+            results = self._score_all(weighted, accept)
+        else:
+            results = self._top_k(weighted, accept, limit)
+
+        faceted = category is not None or color is not None or max_price is not None
+        if faceted and (limit is None or len(results) < limit):
+            seen = set(results)
+            for pos in self.catalog.iter_positions(category, color, max_price):
+                if limit is not None and len(results) >= limit:
+                    break
+                if pos not in seen:
+                    results.append(pos)
+        return results
+
+    @staticmethod
+    def _score_all(weighted: Sequence[Tuple[_Postings, float]], accept) -> List[int]:
+        scores: Dict[int, float] = {}
+        for postings, weight in weighted:
+            for pos, score in zip(postings.by_pos, postings.pos_scores):
+                scores[pos] = scores.get(pos, 0.0) + weight * score
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [pos for pos, _ in ranked if accept(pos)]
+
+    @staticmethod
+    def _top_k(weighted: Sequence[Tuple[_Postings, float]], accept, limit: int) -> List[int]:
+        # Walk every term's postings in score order; a document's full score
+        # comes from random access into the other terms. Stop once the K-th
+        # best score can't be beaten by anything not yet seen. Only documents
+        # that pass the facets count towards SCORE_BUDGET; if it runs out
+        # first, rank exactly whatever can still reach the K-th best so far,
+        # or settle for the best so far if that is too many postings.
+        lists = [(p.by_score, p.scores, p.by_pos, p.pos_scores, len(p), w) for p, w in weighted]
+        best: List[Tuple[float, int]] = []  # min-heap of (score, -pos)
+        seen: Set[int] = set()
+        scored = 0
+        depth = 0
+        longest = max((n for *_, n, _ in lists), default=0)
+        while depth < longest and limit > 0:
+            if scored >= SCORE_BUDGET:
+                if len(best) < limit:
+                    return SearchIndex._score_all(weighted, accept)[:limit]
+                ranked = SearchIndex._rank_above(weighted, accept, limit, best[0][0])
+                if ranked is not None:
+                    return ranked
+                break
+            threshold = 0.0
+            for by_score, scores, _, _, n, weight in lists:
+                if depth >= n:
+                    continue
+                threshold += weight * scores[depth]
+                pos = by_score[depth]
+                if pos in seen:
+                    continue
+                seen.add(pos)
+                if not accept(pos):
+                    continue
+                scored += 1
+                score = 0.0
+                for _, _, by_pos, pos_scores, m, w in lists:
+                    i = bisect_left(by_pos, pos)
+                    if i < m and by_pos[i] == pos:
+                        score += w * pos_scores[i]
+                if len(best) < limit:
+                    heapq.heappush(best, (score, -pos))
+                elif (score, -pos) > best[0]:
+                    heapq.heapreplace(best, (score, -pos))
+            if len(best) == limit and best[0][0] >= threshold:
+                break
+            depth += 1
+        return [-neg_pos for _, neg_pos in sorted(best, reverse=True)]
+
+    @staticmethod
+    def _rank_above(
+        weighted: Sequence[Tuple[_Postings, float]], accept, limit: int, floor: float
+    ) -> Optional[List[int]]:
+        # At least limit accepted documents score floor or more; nothing under
+        # it can make the page. Per term, only postings scoring at least floor
+        # less the other terms' best can matter, and if that is above zero a
+        # document without one can't make it either. As in MaxScore, the
+        # longest terms are set aside while their best scores add up to less
+        # than floor: only documents in the other terms are candidates. The
+        # sums here run in another order than _top_k's, so floor is eased for
+        # rounding and the candidates left are rescored in query order.
+        reach = floor * (1 - 1e-9)
+        total = sum(weight * postings.scores[0] for postings, weight in weighted if len(postings))
+        bound = 0.0
+        named, aside = [], []
+        for postings, weight in sorted(weighted, key=lambda pw: -len(pw[0])):
+            if not len(postings):
+                continue
+            top = weight * postings.scores[0]
+            need = reach - (total - top)
+            n = postings.reaching(need / weight) if need > 0 else len(postings)
+            if bound + top < reach:
+                bound += top
+                aside.append((postings, weight, n, need > 0))
+            else:
+                named.append((postings, weight, n, need > 0))
+        if sum(n for _, _, n, _ in named + aside) > EXPAND_BUDGET:
+            return None
+        scores: Dict[int, float] = {}
+        for i, (postings, weight, n, required) in enumerate(named):
+            other = dict(zip(postings.by_score[:n], map(weight.__mul__, postings.scores[:n])))
+            if not i:
+                scores = other
+            elif required:
+                scores = {pos: scores.get(pos, 0.0) + score for pos, score in other.items()}
+            else:
+                for pos, score in other.items():
+                    scores[pos] = scores.get(pos, 0.0) + score
+        for postings, weight, n, required in aside:
+            if required:
+                other = dict(zip(postings.by_score[:n], map(weight.__mul__, postings.scores[:n])))
+                scores = {pos: scores[pos] + other[pos] for pos in scores.keys() & other.keys()}
+                continue
+            for pos in scores.keys() & set(postings.by_score[:n]):
+                scores[pos] += weight * postings.score(pos)
+        ranked = []
+        for pos, score in scores.items():
+            if score >= reach:
+                score = 0.0
+                for postings, weight in weighted:
+                    score += weight * postings.score(pos)
+                if score >= floor:
+                    ranked.append((-score, pos))
+        ranked.sort()
+        results = []
+        for _, pos in ranked:
+            if accept(pos):
+                results.append(pos)
+                if len(results) == limit:
+                    break
+        return results
@@ -0,0 +1,347 @@
+"""
+Lightweight runtime measurements for the agent worker.
+"""
+
+import asyncio
+import functools
+import logging
+import math
+import os
+import threading
+import time
+from bisect import bisect_right
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from itertools import accumulate
+from typing import ClassVar, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("telemetry")
+
+# Log every pipeline metrics event and tool call as it happens. Costly at
+# scale; otherwise they are summarized once per METRICS_FLUSH_INTERVAL.
+METRICS_DEBUG = os.getenv("METRICS_DEBUG", "0") == "1"
+METRICS_FLUSH_INTERVAL = 60.0  # seconds per summary window
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class LoopLagMonitor:
+    """
+    Measure how late the event loop wakes up a sleeping task.
+
+    Anything that blocks the loop (file I/O, heavy CPU in a tool) delays
+    audio frames, VAD and TTS for every session in the worker; the same
+    delay shows up here as lag.
+    """
+
+    def __init__(self, interval: float = 0.05, max_samples: int = 10_000):
+        self.interval = interval
+        self.max_samples = max_samples
+        self._lags: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            if len(self._lags) >= self.max_samples:
+                del self._lags[: self.max_samples // 2]
+            self._lags.append(max(0.0, loop.time() - expected))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def reset(self):
+        self._lags.clear()
+
+    def summary(self) -> Dict[str, float]:
+        """Lag percentiles and maximum in milliseconds."""
+        lags = sorted(self._lags)
+        return {
+            "samples": len(lags),
+            "p50_ms": _percentile(lags, 0.50) * 1000,
+            "p99_ms": _percentile(lags, 0.99) * 1000,
+            "max_ms": (lags[-1] if lags else 0.0) * 1000,
+        }
+
+
+class LatencyHistogram:
+    """
+    Latencies in log-spaced buckets: fixed memory however many are recorded.
+
+    Each bucket is GROWTH times wider than the one below it, so a quantile
+    is off by at most half of that (about 5%) from the true value.
+    """
+
+    MIN = 1e-6  # seconds; anything faster lands in the first bucket
+    GROWTH = 1.1
+    BUCKETS = 200  # up to about 3 minutes
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        if seconds <= self.MIN:
+            bucket = 0
+        else:
+            bucket = min(self.BUCKETS - 1, int(math.log(seconds / self.MIN) / math.log(self.GROWTH)) + 1)
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, fraction: float) -> float:
+        """Approximate latency below which the given fraction of samples fall."""
+        if not self.count:
+            return 0.0
+        # First bucket whose running count passes the rank
+        bucket = min(bisect_right(list(accumulate(self.counts)), fraction * self.count), self.BUCKETS - 1)
+        if bucket == 0:
+            return self.MIN
+        # Middle of the bucket, in log space
+        return min(self.max, self.MIN * self.GROWTH ** (bucket - 0.5))
+
+
+class ToolMetrics:
+    """
+    Call counts, error counts and latency histograms per tool and per step.
+
+    Steps (spans) inside a tool are keyed "tool.step", e.g.
+    "checkout.create_order"; a span timed outside any tool is keyed by its
+    own name.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()  # spans are timed on worker threads too
+        self._calls: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        self._latency: Dict[str, LatencyHistogram] = {}
+
+    def record(self, name: str, seconds: float, error: bool = False):
+        with self._lock:
+            histogram = self._latency.get(name)
+            if histogram is None:
+                histogram = self._latency[name] = LatencyHistogram()
+                self._calls[name] = 0
+                self._errors[name] = 0
+            histogram.record(seconds)
+            self._calls[name] += 1
+            self._errors[name] += error
+
+    def reset(self):
+        with self._lock:
+            self._calls.clear()
+            self._errors.clear()
+            self._latency.clear()
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Calls, errors and latency percentiles (milliseconds) per tool and step."""
+        with self._lock:
+            return {
+                name: {
+                    "calls": self._calls[name],
+                    "errors": self._errors[name],
+                    "p50_ms": histogram.quantile(0.50) * 1000,
+                    "p95_ms": histogram.quantile(0.95) * 1000,
+                    "p99_ms": histogram.quantile(0.99) * 1000,
+                    "max_ms": histogram.max * 1000,
+                }
+                for name, histogram in sorted(self._latency.items())
+            }
+
+
+TOOL_METRICS = ToolMetrics()
+_tracer = None  # OpenTelemetry tracer for tool spans; see set_tracer
+_tool_call: ContextVar[Optional[Dict]] = ContextVar("tool_call", default=None)
+
+
+def set_tracer(tracer):
+    """
+    Also report tool calls and their steps as tracing spans.
+
+    With the agent framework's tracer they nest under its span for the
+    function call, in the same trace as the LLM and TTS spans of the turn.
+    """
+    global _tracer
+    _tracer = tracer
+
+
+def _traced(name: str):
+    return _tracer.start_as_current_span(name) if _tracer is not None else nullcontext()
+
+
+def instrument_tool(fn):
+    """
+    Record the latency and outcome of every call of an async tool.
+
+    Put it under @function_tool so the tool keeps its name, docstring and
+    signature. Each call is timed into TOOL_METRICS and traced if a tracer
+    is set; with METRICS_DEBUG it is also logged with the time spent in each
+    of its spans.
+    """
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        call = {"tool": name, "spans": {}}
+        token = _tool_call.set(call)
+        error = False
+        started = time.perf_counter()
+        try:
+            with _traced(name):
+                return await fn(*args, **kwargs)
+        except Exception:
+            error = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            _tool_call.reset(token)
+            TOOL_METRICS.record(name, elapsed, error)
+            if METRICS_DEBUG:
+                logger.info(
+                    "tool metrics",
+                    extra={
+                        "tool": name,
+                        "duration": round(elapsed, 6),
+                        "error": error,
+                        "spans": {step: round(seconds, 6) for step, seconds in call["spans"].items()},
+                    },
+                )
+
+    return wrapper
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time one step of the current tool call (query parsing, persistence, ...)."""
+    call = _tool_call.get()
+    error = False
+    started = time.perf_counter()
+    try:
+        with _traced(name):
+            yield
+    except Exception:
+        error = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        if call is None:
+            TOOL_METRICS.record(name, elapsed, error)
+        else:
+            TOOL_METRICS.record(f"{call['tool']}.{name}", elapsed, error)
+            call["spans"][name] = call["spans"].get(name, 0.0) + elapsed
+
+
+class MetricsAggregator:
+    """
+    Fold the pipeline's metrics events into a compact summary per window.
+
+    Logging every STT, LLM, TTS, VAD and end-of-utterance event of every
+    session costs real CPU and I/O in a busy worker. Instead each event
+    bumps a few counters and latency histograms; every interval one line
+    sums up the window and the window starts over. Memory stays fixed
+    however many events arrive. Given the tools' ToolMetrics, the line also
+    carries their latency; those keep counting across windows, as the
+    shutdown summary reports them too.
+    """
+
+    # Latencies kept as histograms and amounts summed, per event type
+    LATENCIES: ClassVar[Dict[str, Tuple[str, ...]]] = {
+        "llm_metrics": ("ttft",),
+        "realtime_model_metrics": ("ttft",),
+        "tts_metrics": ("ttfb",),
+        "eou_metrics": ("end_of_utterance_delay", "transcription_delay"),
+    }
+    TOTALS: ClassVar[Dict[str, Tuple[str, ...]]] = {
+        "llm_metrics": ("prompt_tokens", "completion_tokens"),
+        "realtime_model_metrics": ("input_tokens", "output_tokens"),
+        "tts_metrics": ("characters_count", "audio_duration"),
+        "stt_metrics": ("audio_duration",),
+        "vad_metrics": ("inference_count",),
+    }
+
+    def __init__(self, interval: float = METRICS_FLUSH_INTERVAL, tools: Optional[ToolMetrics] = None):
+        self.interval = interval
+        self.tools = tools
+        self._task: Optional[asyncio.Task] = None
+        self._reset()
+
+    def _reset(self):
+        self._started = time.monotonic()
+        self._events: Dict[str, int] = {}
+        self._latency: Dict[str, LatencyHistogram] = {}
+        self._totals: Dict[str, float] = {}
+
+    def collect(self, event):
+        """Add one metrics event (the metrics of a MetricsCollectedEvent)."""
+        kind = event.type
+        self._events[kind] = self._events.get(kind, 0) + 1
+        prefix = kind[: -len("_metrics")]
+        for field in self.LATENCIES.get(kind, ()):
+            value = getattr(event, field)
+            if value < 0:  # cancelled before the first token or byte
+                continue
+            key = f"{prefix}.{field}"
+            histogram = self._latency.get(key)
+            if histogram is None:
+                histogram = self._latency[key] = LatencyHistogram()
+            histogram.record(value)
+        for field in self.TOTALS.get(kind, ()):
+            key = f"{prefix}.{field}"
+            self._totals[key] = self._totals.get(key, 0) + getattr(event, field)
+
+    def summary(self) -> Dict:
+        """The current window: event counts, latency percentiles (ms) and totals."""
+        summary = {
+            "window_s": round(time.monotonic() - self._started, 1),
+            "events": dict(self._events),
+            **{
+                key: {
+                    "count": histogram.count,
+                    "p50_ms": round(histogram.quantile(0.50) * 1000, 1),
+                    "p95_ms": round(histogram.quantile(0.95) * 1000, 1),
+                    "p99_ms": round(histogram.quantile(0.99) * 1000, 1),
+                }
+                for key, histogram in sorted(self._latency.items())
+            },
+            **{key: round(total, 2) for key, total in sorted(self._totals.items())},
+        }
+        if self.tools is not None:
+            summary["tools"] = self.tools.summary()
+        return summary
+
+    def flush(self) -> Dict:
+        """Log the current window, if anything happened in it, and start a new one."""
+        summary = self.summary()
+        if self._events:
+            logger.info(f"Pipeline metrics: {summary}")
+        self._reset()
+        return summary
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
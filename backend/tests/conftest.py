@@ -0,0 +1,31 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# merchant compiles the catalog and opens its stock and order files on
+# import, before any fixture runs; keep all of that out of the checkout.
+SCRATCH = tempfile.mkdtemp(prefix="echomart-tests-")
+FILES = {
+    "CATALOG_FILE": "catalog.bin",
+    "SEARCH_FILE": "search.bin",
+    "INVENTORY_FILE": "inventory.bin",
+    "ORDERS_FILE": "orders.json",
+    "ORDERS_LOG_FILE": "orders.log",
+    "ORDERS_DB_FILE": "orders.db",
+}
+os.environ.update({name: os.path.join(SCRATCH, file) for name, file in FILES.items()})
+
+import merchant  # noqa: E402 - reads the paths above on import
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(SCRATCH, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def merchant_files(tmp_path, monkeypatch):
+    """Files a test has merchant build or write go to its tmp_path."""
+    for name, file in FILES.items():
+        monkeypatch.setattr(merchant, name, str(tmp_path / file))
@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+from catalog import Catalog, compile_catalog, write_catalog
+
+PRODUCTS = [
+    {"id": "mug-001", "name": "Mug", "description": "A mug", "price": 800, "currency": "INR", "category": "mug", "color": "white"},
+    {"id": "hoodie-001", "name": "Hoodie", "description": "A hoodie", "price": 1499, "currency": "INR", "category": "hoodie", "color": "Black", "sizes": ["S", "M"]},
+    {"id": "cap-001", "name": "Cap", "description": "A cap", "price": 499, "currency": "INR", "category": "cap", "color": "black"},
+    {"id": "bag-001", "name": "Bag", "description": "A bag", "price": 1499, "currency": "INR", "category": "bag", "color": "black"},
+]
+
+
+@pytest.fixture
+def catalog_file(tmp_path):
+    path = str(tmp_path / "catalog.bin")
+    write_catalog(PRODUCTS, path)
+    return path
+
+
+def test_open_decodes_lazily(catalog_file) -> None:
+    """Opening a catalog file decodes nothing until a product is touched."""
+    catalog = Catalog.open(catalog_file)
+
+    assert len(catalog) == 4
+    assert catalog._decoded == {}
+    assert catalog.get("cap-001")["name"] == "Cap"
+    assert list(catalog._decoded) == [2]
+
+
+def test_decoded_products_are_bounded(catalog_file, monkeypatch) -> None:
+    monkeypatch.setattr("catalog.MAX_DECODED", 2)
+    catalog = Catalog.open(catalog_file)
+
+    products = list(catalog)
+
+    assert len(catalog._decoded) <= 2
+    assert [p["id"] for p in products] == [p["id"] for p in PRODUCTS]
+
+
+def test_round_trip(catalog_file) -> None:
+    catalog = Catalog.open(catalog_file)
+
+    assert [p["id"] for p in catalog] == [p["id"] for p in PRODUCTS]
+    assert catalog[1]["sizes"] == ("S", "M")
+    assert "sizes" not in catalog[0]
+    assert catalog.get("hoodie-001") is catalog[1]
+    assert catalog.get("hoodie-999") is None
+
+
+@pytest.mark.parametrize(
+    ("facets", "expected"),
+    [
+        ({}, ["mug-001", "hoodie-001", "cap-001", "bag-001"]),
+        ({"color": "black"}, ["hoodie-001", "cap-001", "bag-001"]),
+        ({"max_price": 1000}, ["mug-001", "cap-001"]),
+        ({"max_price": 100}, []),
+        ({"color": "black", "max_price": 1499}, ["hoodie-001", "cap-001", "bag-001"]),
+        ({"color": "black", "category": "bag"}, ["bag-001"]),
+        ({"category": "sofa"}, []),
+    ],
+)
+def test_filter(catalog_file, facets, expected) -> None:
+    catalog = Catalog.open(catalog_file)
+
+    assert [p["id"] for p in catalog.filter(**facets)] == expected
+
+
+def test_price_filter_matches_linear_scan() -> None:
+    products = [dict(PRODUCTS[i % 4], id=f"p-{i}", price=(i * 37) % 101) for i in range(200)]
+    catalog = Catalog.from_products(products)
+
+    for max_price in (0, 5, 50, 100):  # few matches are sorted, many are streamed
+        expected = [pos for pos, p in enumerate(products) if p["price"] <= max_price]
+        assert catalog.positions(max_price=max_price) == expected
+
+
+def test_compile_from_json(tmp_path) -> None:
+    source = tmp_path / "catalog.json"
+    source.write_text(json.dumps(PRODUCTS))
+    compile_catalog(str(source), str(tmp_path / "catalog.bin"))
+
+    assert Catalog.open(str(tmp_path / "catalog.bin")).get("bag-001")["price"] == 1499
+
+
+def test_records_are_checked_and_extra_fields_dropped() -> None:
+    catalog = Catalog.from_products([dict(PRODUCTS[0], brand="Acme", price=800.0)])
+    assert dict(catalog[0]) == dict(PRODUCTS[0], image="")
+
+    for bad, message in [
+        ({k: v for k, v in PRODUCTS[0].items() if k != "price"}, "missing price"),
+        (dict(PRODUCTS[0], price="800"), "price"),
+        (dict(PRODUCTS[0], color=None, category=3), "category"),
+        (dict(PRODUCTS[1], sizes="SM"), "sizes"),
+    ]:
+        with pytest.raises(ValueError, match=message):
+            Catalog.from_products([PRODUCTS[2], bad])
+    with pytest.raises(ValueError, match="repeats the id"):
+        Catalog.from_products([PRODUCTS[0], PRODUCTS[1], PRODUCTS[0]])
+
+
+def test_empty_catalog() -> None:
+    catalog = Catalog.from_products([])
+
+    assert len(catalog) == 0
+    assert catalog.filter(category="mug", max_price=10) == []
+    assert catalog.get("mug-001") is None
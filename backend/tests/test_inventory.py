@@ -0,0 +1,149 @@
+import math
+import multiprocessing
+import threading
+
+import pytest
+
+from inventory import MAGIC, V1_HEADER, V1_SKU, Inventory, OutOfStockError, sku_key
+
+STOCK = {"mug-001": 5, sku_key("hoodie-001", "L"): 3}
+
+
+def _inventory(tmp_path, **kwargs) -> Inventory:
+    return Inventory.create(str(tmp_path / "inventory.bin"), STOCK, **kwargs)
+
+
+def test_reserve_commit_release(tmp_path) -> None:
+    inventory = _inventory(tmp_path)
+    sold = inventory.reserve("mug-001", 2, ttl=60)
+    kept = inventory.reserve("mug-001", 2, ttl=60)
+    assert inventory.available("mug-001") == 1
+
+    inventory.commit(sold)
+    assert inventory.levels()["mug-001"] == (3, 2)
+    assert inventory.release(kept, 1).quantity == 1
+    assert inventory.available("mug-001") == 2
+    inventory.release(kept)
+
+    assert inventory.levels()["mug-001"] == (3, 0)
+    assert inventory.reservations() == []
+    inventory.close()
+
+
+def test_reserve_beyond_stock_fails(tmp_path) -> None:
+    inventory = _inventory(tmp_path)
+    inventory.reserve("hoodie-001/L", 2, ttl=60)
+
+    with pytest.raises(OutOfStockError) as raised:
+        inventory.reserve("hoodie-001/L", 2, ttl=60)
+
+    assert raised.value.available == 1
+    assert inventory.available("hoodie-001/L") == 1
+    inventory.close()
+
+
+def test_lapsed_holds_return_to_stock(tmp_path) -> None:
+    inventory = _inventory(tmp_path)
+    lapsed = inventory.reserve("mug-001", 4, ttl=0)
+
+    held = inventory.reserve("mug-001", 5, ttl=60)
+
+    assert inventory.available("mug-001") == 0
+    assert inventory.release(lapsed).quantity == 0  # already swept; nothing to give back
+    assert inventory.levels()["mug-001"] == (5, 5)
+    inventory.commit(held)
+    with pytest.raises(OutOfStockError):
+        inventory.commit(lapsed)  # its units went to someone else
+    inventory.close()
+
+
+def test_sweep_follows_each_skus_chain(tmp_path) -> None:
+    inventory = Inventory.create(str(tmp_path / "inventory.bin"), {"a": 100, "b": 100}, hold_capacity=64)
+    lapsing = [inventory.reserve("a", 1, ttl=0) for _ in range(10)]
+    kept = [inventory.reserve(key, 1, ttl=60) for key in ("a", "b") * 10]
+    inventory.release(lapsing[3])
+    inventory.commit(lapsing[7])
+    inventory.release(kept[4])
+
+    assert inventory.available("a") == 100 - 1 - 9
+    assert inventory.available("b") == 100 - 10
+    assert inventory.levels() == {"a": (99, 9), "b": (100, 10)}
+    assert sorted(r.slot for r in inventory.reservations()) == sorted(r.slot for r in kept if r is not kept[4])
+    inventory.close()
+
+
+def test_version_1_stock_file_is_upgraded(tmp_path) -> None:
+    path = tmp_path / "inventory.bin"
+    v1 = [V1_HEADER.pack(MAGIC, 1, 2, 8)]
+    v1 += [V1_SKU.pack(b"mug-001", 4, 1, 0.0), V1_SKU.pack(b"cap-001", 7, 0, math.inf)]
+    path.write_bytes(b"".join(v1) + bytes(8 * 24))
+
+    upgraded = Inventory.open(str(path))
+
+    assert upgraded.levels() == {"mug-001": (4, 0), "cap-001": (7, 0)}
+    assert upgraded.hold_capacity == 8
+    upgraded.commit(upgraded.reserve("mug-001", 4, ttl=60))
+    assert upgraded.available("mug-001") == 0
+    upgraded.close()
+
+
+def test_existing_stock_file_is_kept(tmp_path) -> None:
+    inventory = _inventory(tmp_path)
+    inventory.commit(inventory.reserve("mug-001", 5, ttl=60))
+
+    again = Inventory.create(str(tmp_path / "inventory.bin"), {"mug-001": 100})
+
+    assert again.available("mug-001") == 0
+    assert "hoodie-001/L" in again
+    again.close()
+    inventory.close()
+
+
+def _buy(inventory: Inventory, key: str, attempts: int) -> int:
+    sold = 0
+    for _ in range(attempts):
+        try:
+            inventory.commit(inventory.reserve(key, 1, ttl=60))
+            sold += 1
+        except OutOfStockError:
+            pass
+    return sold
+
+
+def test_threads_never_oversell(tmp_path) -> None:
+    inventory = Inventory.create(str(tmp_path / "inventory.bin"), {"hot": 500})
+    sold = []
+    threads = [threading.Thread(target=lambda: sold.append(_buy(inventory, "hot", 100))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(sold) == 500
+    assert inventory.levels()["hot"] == (0, 0)
+    inventory.close()
+
+
+def _buy_in_child(path: str, results):
+    inventory = Inventory(path)
+    results.put(_buy(inventory, "hot", 200))
+    inventory.close()
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_processes_never_oversell(tmp_path) -> None:
+    path = str(tmp_path / "inventory.bin")
+    Inventory.create(path, {"hot": 500}, hold_capacity=16).close()
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.Queue()
+    children = [ctx.Process(target=_buy_in_child, args=(path, results)) for _ in range(4)]
+    for child in children:
+        child.start()
+    sold = sum(results.get(timeout=60) for _ in children)
+    for child in children:
+        child.join()
+
+    inventory = Inventory(path)
+    assert sold == 500
+    assert inventory.levels()["hot"] == (0, 0)
+    inventory.close()
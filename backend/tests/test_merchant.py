@@ -0,0 +1,447 @@
+import asyncio
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import merchant
+
+
+@pytest.fixture
+def orders_dir(tmp_path, monkeypatch):
+    """Point the order snapshot and log (and stock, untracked) at a scratch directory."""
+    monkeypatch.setattr(merchant, "ORDERS_FILE", str(tmp_path / "orders.json"))
+    monkeypatch.setattr(merchant, "ORDERS_LOG_FILE", str(tmp_path / "orders.log"))
+    monkeypatch.setattr(merchant, "INVENTORY_SOURCE", str(tmp_path / "inventory.json"))
+    monkeypatch.setattr(merchant, "INVENTORY_FILE", str(tmp_path / "inventory.bin"))
+    merchant._load_orders()
+    merchant._load_inventory()
+    yield tmp_path
+    merchant._close_orders()
+    merchant._close_inventory()
+
+
+@pytest.fixture
+def stock(orders_dir):
+    """Track stock for a few products."""
+    (orders_dir / "inventory.json").write_text(json.dumps({"mug-001": 5, "hoodie-001": {"M": 2}}))
+    merchant._load_inventory()
+    return orders_dir
+
+
+def _place(quantity: int = 1) -> dict:
+    return merchant.create_order([{"product_id": "mug-001", "quantity": quantity}])
+
+
+def test_orders_are_appended_to_log(orders_dir) -> None:
+    """Placing orders appends to the log and leaves the snapshot untouched."""
+    (orders_dir / "orders.json").write_text("[]")
+    _place(1)
+    _place(2)
+
+    lines = (orders_dir / "orders.log").read_text().splitlines()
+    assert [json.loads(line)["items"][0]["quantity"] for line in lines] == [1, 2]
+    assert json.loads((orders_dir / "orders.json").read_text()) == []
+
+
+def test_replay_snapshot_and_tail(orders_dir, monkeypatch) -> None:
+    """Startup sees orders from both the snapshot and the log tail."""
+    monkeypatch.setattr(merchant, "ORDERS_COMPACT_EVERY", 3)
+    merchant._load_orders()
+    placed = [_place(q) for q in range(1, 6)]
+
+    merchant._load_orders()
+
+    assert merchant.ORDER_STORE.all() == placed
+    assert len((orders_dir / "orders.json").read_text().splitlines()) == 3
+    assert len((orders_dir / "orders.log").read_text().splitlines()) == 2
+
+
+def test_torn_log_record_is_dropped(orders_dir) -> None:
+    """A partially written final record is discarded, not fatal."""
+    first = _place()
+    merchant._close_orders()
+    with open(orders_dir / "orders.log", "a") as f:
+        f.write('{"id": "order_torn", "ite')
+
+    merchant._load_orders()
+    second = _place()
+
+    assert merchant.ORDER_STORE.all() == [first, second]
+    merchant._load_orders()
+    assert merchant.ORDER_STORE.all() == [first, second]
+
+
+def test_replay_skips_records_already_compacted(orders_dir) -> None:
+    """A crash after snapshotting but before truncating the log is harmless."""
+    first = _place()
+    merchant._close_orders()
+    log = (orders_dir / "orders.log").read_text()
+    merchant._load_orders()
+    merchant.ORDER_STORE.compact()
+    (orders_dir / "orders.log").write_text(log)
+
+    merchant._load_orders()
+
+    assert merchant.ORDER_STORE.all() == [first]
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [
+        None,
+        {"category": "hoodie"},
+        {"color": "Black"},
+        {"max_price": 900},
+        {"max_price": 1},
+        {"category": "TSHIRT", "color": "white"},
+        {"category": "bag", "max_price": "1500"},
+        {"category": "cap", "color": "black", "max_price": 700},
+        {"category": "sofa"},
+    ],
+)
+def test_list_products_matches_linear_scan(filters) -> None:
+    """The indexed catalog returns exactly what filtering the list would."""
+    expected = list(merchant.CATALOG)
+    if filters:
+        if "category" in filters:
+            expected = [p for p in expected if p["category"] == filters["category"].lower()]
+        if "max_price" in filters:
+            expected = [p for p in expected if p["price"] <= int(filters["max_price"])]
+        if "color" in filters:
+            expected = [p for p in expected if p["color"] == filters["color"].lower()]
+
+    assert merchant.list_products(filters) == expected
+
+
+def test_create_order_unknown_product(orders_dir) -> None:
+    with pytest.raises(ValueError, match="not found"):
+        merchant.create_order([{"product_id": "mug-999", "quantity": 1}])
+
+
+def test_quote_order_prices_without_placing(orders_dir) -> None:
+    quote = merchant.quote_order(
+        [{"product_id": "mug-001", "quantity": 2}, {"product_id": "hoodie-001", "quantity": 1, "size": "L"}]
+    )
+
+    assert quote["total"] == 2 * 800 + 1499
+    assert [item["line_total"] for item in quote["items"]] == [1600, 1499]
+    assert "id" not in quote
+    assert merchant.ORDER_STORE.last() is None
+    with pytest.raises(ValueError, match="at least 1"):
+        merchant.quote_order([{"product_id": "mug-001", "quantity": 0}])
+
+
+def test_product_behaves_like_a_dict() -> None:
+    """Compact records keep the dict shape the agent tools rely on."""
+    mug = merchant.CATALOG.get("mug-001")
+    hoodie = merchant.CATALOG.get("hoodie-001")
+
+    assert mug["name"] == "Stoneware Coffee Mug"
+    assert "sizes" not in mug
+    assert mug.get("sizes") is None
+    assert "sizes" not in dict(mug)
+    assert hoodie["sizes"] == ("S", "M", "L", "XL")
+    assert hoodie.sizes is merchant.CATALOG.get("tshirt-001").sizes
+    assert hoodie.currency is mug.currency
+    with pytest.raises(KeyError):
+        mug["stock"]
+    assert not hasattr(mug, "__dict__")
+
+
+@pytest.fixture
+def catalog_dir(tmp_path, monkeypatch):
+    """Serve the catalog from a scratch copy of catalog.json."""
+    source = tmp_path / "catalog.json"
+    source.write_text(json.dumps([dict(p, sizes=list(p["sizes"])) if "sizes" in p else dict(p) for p in merchant.CATALOG]))
+    monkeypatch.setattr(merchant, "CATALOG_SOURCE", str(source))
+    monkeypatch.setattr(merchant, "CATALOG_FILE", str(tmp_path / "catalog.bin"))
+    monkeypatch.setattr(merchant, "CATALOG", merchant.CATALOG)
+    monkeypatch.setattr(merchant, "CATALOG_GENERATION", merchant.CATALOG_GENERATION)
+    monkeypatch.setattr(merchant, "_catalog_signature", merchant._catalog_signature)
+    merchant.reload_catalog(force=True)
+    return source
+
+
+def test_reload_swaps_changed_catalog(catalog_dir) -> None:
+    """Editing the source swaps in a new catalog; holders of the old one are unaffected."""
+    old = merchant.CATALOG
+    generation = merchant.catalog_status()["generation"]
+    assert not merchant.reload_catalog()
+
+    products = json.loads(catalog_dir.read_text())
+    products[0]["price"] = 1
+    catalog_dir.write_text(json.dumps(products))
+    st = catalog_dir.stat()
+    os.utime(catalog_dir, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    assert merchant.reload_catalog()
+    assert merchant.CATALOG.get("mug-001")["price"] == 1
+    assert old.get("mug-001")["price"] == 800
+    status = merchant.catalog_status()
+    assert status["generation"] == generation + 1
+    assert status["reload_seconds"] > 0
+
+
+def test_product_snippets_follow_catalog_reloads(catalog_dir) -> None:
+    old = merchant.CATALOG.get("mug-001")
+    assert merchant.product_snippet(old).endswith("- INR 800")
+    assert merchant.product_snippet(old) is merchant.product_snippet(merchant.CATALOG.get("mug-001"))
+
+    products = json.loads(catalog_dir.read_text())
+    products[0]["price"] = 1
+    catalog_dir.write_text(json.dumps(products))
+    st = catalog_dir.stat()
+    os.utime(catalog_dir, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert merchant.reload_catalog()
+
+    assert merchant.product_snippet(merchant.CATALOG.get("mug-001")).endswith("- INR 1")
+    # A product held from before the reload still renders as it was, without polluting the cache
+    assert merchant.product_snippet(old).endswith("- INR 800")
+    assert merchant.product_snippet(merchant.CATALOG.get("mug-001")).endswith("- INR 1")
+
+
+def test_order_summary(orders_dir) -> None:
+    order = merchant.create_order(
+        [{"product_id": "hoodie-001", "quantity": 2, "size": "M"}, {"product_id": "mug-001", "quantity": 1}]
+    )
+
+    assert merchant.order_summary(order) == (
+        "- 2 x Black Logo Hoodie (size M): INR 2998\n- 1 x Stoneware Coffee Mug: INR 800\nTotal: INR 3798"
+    )
+    assert merchant.order_summary(merchant.ORDER_STORE.last()) is merchant.order_summary(order)
+
+
+def test_failed_reload_keeps_current_catalog(catalog_dir) -> None:
+    current = merchant.CATALOG
+    catalog_dir.write_text("[{not json")
+    st = catalog_dir.stat()
+    os.utime(catalog_dir, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    assert not merchant.reload_catalog()
+    assert merchant.CATALOG is current
+    # The broken file isn't retried until it changes again
+    assert not merchant.reload_catalog()
+
+
+def test_reload_drops_unknown_fields_and_rejects_bad_records(catalog_dir, orders_dir) -> None:
+    products = json.loads(catalog_dir.read_text())
+    products[0]["brand"] = "EchoMart"
+    catalog_dir.write_text(json.dumps(products))
+    st = catalog_dir.stat()
+    os.utime(catalog_dir, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert merchant.reload_catalog()
+
+    assert "brand" not in merchant.list_products()[0]
+    assert merchant.create_order([{"product_id": products[0]["id"], "quantity": 1}])["total"] == products[0]["price"]
+
+    current = merchant.CATALOG
+    del products[1]["price"]
+    catalog_dir.write_text(json.dumps(products))
+    os.utime(catalog_dir, ns=(st.st_atime_ns, st.st_mtime_ns + 2 * 10**9))
+    assert not merchant.reload_catalog()
+    assert merchant.CATALOG is current
+
+
+def test_list_products_pages_and_sorts() -> None:
+    everything = merchant.list_products()
+    by_price = sorted(everything, key=lambda p: p["price"])
+
+    assert merchant.list_products(limit=5, offset=5) == everything[5:10]
+    assert merchant.list_products(limit=4, offset=2, sort="price_asc") == by_price[2:6]
+    assert merchant.list_products(sort="price_desc") == sorted(everything, key=lambda p: -p["price"])
+    assert merchant.list_products({"category": "hoodie"}, limit=1, sort="price_desc")[0]["id"] == "hoodie-002"
+    with pytest.raises(ValueError):
+        merchant.list_products(sort="name")
+
+
+def test_search_products_pages() -> None:
+    ranked = merchant.search_products("cotton hoodie")
+
+    assert merchant.search_products("cotton hoodie", limit=2, offset=1) == ranked[1:3]
+    assert merchant.search_products("cotton hoodie", limit=2, sort="price_asc") == sorted(ranked, key=lambda p: p["price"])[:2]
+
+
+def test_order_ids_are_unique_and_time_ordered() -> None:
+    next_id = merchant.OrderIdGenerator()
+    ids = []
+
+    def generate():
+        for _ in range(20_000):
+            ids.append(next_id())
+
+    threads = [threading.Thread(target=generate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(ids)) == len(ids)
+    in_order = [next_id() for _ in range(1000)]
+    assert sorted(in_order) == in_order
+    assert in_order[0] > "order_20251130_100017"
+
+
+def test_order_ids_ignore_daylight_saving(monkeypatch) -> None:
+    """Clocks going back an hour in local time must not send ids backwards."""
+    monkeypatch.setenv("TZ", "Europe/London")
+    time.tzset()
+    try:
+        before_change = 1761439500  # 2025-10-26 00:45 UTC, 01:45 BST; at 01:00 UTC it's 01:00 GMT
+        clock = iter([before_change * 10**9, (before_change + 1800) * 10**9])
+        monkeypatch.setattr(merchant.time, "time_ns", lambda: next(clock))
+        next_id = merchant.OrderIdGenerator()
+
+        before, after = next_id(), next_id()
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+    assert before.startswith("order_20251026_004500_")
+    assert before < after
+
+
+def test_order_ids_differ_between_processes() -> None:
+    next_id = merchant.OrderIdGenerator()
+    parent = next_id()
+    next_id.reseed()
+
+    assert next_id()[-12:-4] != parent[-12:-4]
+
+
+async def test_create_order_async_persists(orders_dir) -> None:
+    orders = await asyncio.gather(
+        *(merchant.create_order_async([{"product_id": "mug-001", "quantity": q}], customer_id="alice") for q in range(1, 21))
+    )
+
+    assert merchant.get_last_order("alice") in orders
+    merchant._load_orders()
+    assert sorted(o["items"][0]["quantity"] for o in merchant.ORDER_STORE.all()) == list(range(1, 21))
+
+
+def test_prewarm_leaves_nothing_for_the_first_caller(orders_dir, monkeypatch) -> None:
+    monkeypatch.setattr(merchant, "SEARCH_FILE", str(orders_dir / "search.bin"))
+    monkeypatch.setattr(merchant, "_search", None)
+
+    merchant.prewarm()
+
+    assert merchant._search[0] is merchant.CATALOG
+    assert merchant._search[1].named("black logo hoodie") == merchant.CATALOG.position("hoodie-001")
+    assert merchant._writer is not None and merchant._writer.store is merchant.ORDER_STORE
+
+
+async def test_create_order_async_validates(orders_dir) -> None:
+    with pytest.raises(ValueError, match="Size required"):
+        await merchant.create_order_async([{"product_id": "hoodie-001", "quantity": 1}])
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_orders_are_kept_per_customer(orders_dir, monkeypatch, backend) -> None:
+    """One caller never hears another caller's orders."""
+    monkeypatch.setattr(merchant, "ORDERS_BACKEND", backend)
+    monkeypatch.setattr(merchant, "ORDERS_DB_FILE", str(orders_dir / "orders.db"))
+    merchant._load_orders()
+    for i in range(5):
+        merchant.create_order([{"product_id": "mug-001", "quantity": i + 1}], customer_id="alice")
+        merchant.create_order([{"product_id": "cap-001", "quantity": i + 1}], customer_id="bob")
+    merchant.create_order([{"product_id": "bag-001", "quantity": 1}])
+
+    assert merchant.get_last_order("bob")["items"][0]["product_id"] == "cap-001"
+    assert merchant.get_last_order("carol") is None
+    assert merchant.get_last_order()["items"][0]["product_id"] == "bag-001"
+    streamed = [o["id"] for o in merchant.iter_orders()]
+    assert len(streamed) == 11 and streamed == sorted(streamed)
+
+    newest = merchant.get_orders("alice", limit=2)
+    assert [o["items"][0]["quantity"] for o in newest] == [5, 4]
+    older = merchant.get_orders("alice", limit=10, before=newest[-1]["id"])
+    assert [o["items"][0]["quantity"] for o in older] == [3, 2, 1]
+
+    # The index is rebuilt from disk on restart
+    expected = merchant.get_orders("alice", limit=None)
+    merchant._load_orders()
+    assert merchant.get_orders("alice", limit=None) == expected
+
+
+@pytest.mark.parametrize(
+    "identifier, expected",
+    [
+        ("2", "hoodie-002"),
+        ("the second one", "hoodie-002"),
+        ("number three", "hoodie-003"),
+        ("hoodie-004", "hoodie-004"),
+        ("Hoodie 1", "hoodie-001"),
+        ("mug-001", "mug-001"),
+        ("Black Logo Hoodie", "hoodie-001"),
+        ("black logo hoodies", "hoodie-001"),
+        ("black graphic t-shirt", "tshirt-003"),
+        ("the grey one", "hoodie-002"),
+        ("espresso cup", "mug-003"),
+        ("stone ware coffee mug", "mug-001"),
+        ("navy blew pullover hoodie", "hoodie-003"),
+        ("mug", None),
+        ("something else entirely", None),
+        ("9", None),
+    ],
+)
+def test_resolve_product(identifier, expected) -> None:
+    shown = merchant.list_products({"category": "hoodie"})
+
+    product = merchant.resolve_product(identifier, shown)
+
+    assert (product and product["id"]) == expected
+
+
+def test_orders_take_stock(stock) -> None:
+    merchant.create_order([{"product_id": "mug-001", "quantity": 4}, {"product_id": "cap-001", "quantity": 9}])
+
+    with pytest.raises(merchant.OutOfStockError, match="Only 1 Stoneware Coffee Mug left"):
+        merchant.create_order([{"product_id": "hoodie-001", "quantity": 1, "size": "M"}, {"product_id": "mug-001", "quantity": 2}])
+
+    assert merchant.stock_level("mug-001") == 1
+    assert merchant.stock_level("hoodie-001", "M") == 2  # the failed order's holds went back
+    assert merchant.stock_level("cap-001") is None
+
+
+def test_inventory_edits_are_applied_as_restocks(stock) -> None:
+    merchant.create_order([{"product_id": "mug-001", "quantity": 2}])
+    source = stock / "inventory.json"
+    source.write_text(json.dumps({"mug-001": 8, "hoodie-001": {"M": 2}, "cap-001": 3}))
+    st = source.stat()
+    os.utime(source, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    assert merchant.reload_inventory()
+    assert merchant.stock_level("mug-001") == 6  # 3 more than the 5 it held, less the 2 sold
+    assert merchant.stock_level("cap-001") is None  # needs a rebuilt stock file
+    assert not merchant.reload_inventory()
+
+    merchant._load_inventory()  # another process attaching later applies nothing again
+    assert merchant.stock_level("mug-001") == 6
+
+
+def test_reserved_stock_is_sold_at_checkout(stock) -> None:
+    line_items = [{"product_id": "hoodie-001", "quantity": 2, "size": "M"}]
+    held = merchant.reserve_items(line_items)
+    with pytest.raises(merchant.OutOfStockError):
+        merchant.reserve_items(line_items)
+
+    held = merchant.release_reservations(held, 1)
+    assert merchant.stock_level("hoodie-001", "M") == 1
+    merchant.create_order([{"product_id": "hoodie-001", "quantity": 1, "size": "M"}], reservations=held)
+
+    assert merchant.stock_level("hoodie-001", "M") == 1
+    assert merchant.INVENTORY.levels()["hoodie-001/M"] == (1, 0)
+
+
+async def test_failed_write_returns_stock(stock, monkeypatch) -> None:
+    def fail(orders):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(merchant.ORDER_STORE, "append_many", fail)
+
+    with pytest.raises(OSError):
+        await merchant.create_order_async([{"product_id": "mug-001", "quantity": 3}])
+
+    assert merchant.stock_level("mug-001") == 5
@@ -0,0 +1,91 @@
+import multiprocessing
+import sqlite3
+
+import pytest
+
+from order_db import SqliteOrderStore
+
+
+def _order(order_id: str, customer_id: str = "alice", created_at: str = "2025-01-01T00:00:00") -> dict:
+    return {
+        "id": order_id,
+        "customer_id": customer_id,
+        "created_at": created_at,
+        "items": [{"product_id": "mug-001", "quantity": 1, "size": None, "line_total": 299}],
+    }
+
+
+def test_orders_round_trip(tmp_path) -> None:
+    store = SqliteOrderStore(str(tmp_path / "orders.db"))
+    orders = [_order(f"order_{i}") for i in range(5)]
+    store.append_many(orders[:3])
+    store.append(orders[3])
+    store.append(orders[4])
+    store.close()
+
+    store = SqliteOrderStore(str(tmp_path / "orders.db"))
+    assert store.all() == orders
+    assert store.last() == orders[-1]
+    store.close()
+
+
+def test_orders_are_streamed_in_batches(tmp_path) -> None:
+    store = SqliteOrderStore(str(tmp_path / "orders.db"))
+    store.append_many([_order(f"order_{i:02d}") for i in range(25)])
+
+    streamed = store.iter_orders(batch=10)
+    first = next(streamed)
+    store.append(_order("order_99"))  # placed after the stream started
+
+    assert [first["id"]] + [o["id"] for o in streamed] == [f"order_{i:02d}" for i in range(25)]
+    assert store.all()[-1]["id"] == "order_99"
+    store.close()
+
+
+def test_customer_history(tmp_path) -> None:
+    store = SqliteOrderStore(str(tmp_path / "orders.db"))
+    for day in range(1, 6):
+        store.append(_order(f"order_{day}", created_at=f"2025-01-0{day}T12:00:00"))
+    store.append(_order("order_9", customer_id="bob"))
+
+    assert [o["id"] for o in store.for_customer("alice", limit=2)] == ["order_5", "order_4"]
+    assert [o["id"] for o in store.for_customer("alice", before="order_4")] == ["order_3", "order_2", "order_1"]
+    assert [o["id"] for o in store.for_customer("alice", since="2025-01-04")] == ["order_5", "order_4"]
+    assert [o["id"] for o in store.for_customer("bob")] == ["order_9"]
+    assert store.for_customer("carol") == []
+    store.close()
+
+
+def test_failed_batch_is_rolled_back(tmp_path) -> None:
+    store = SqliteOrderStore(str(tmp_path / "orders.db"))
+    store.append(_order("order_1"))
+
+    with pytest.raises(sqlite3.IntegrityError):
+        store.append_many([_order("order_2"), _order("order_1")])
+
+    assert [o["id"] for o in store.all()] == ["order_1"]
+    items = store._connect().execute("SELECT COUNT(*) FROM order_items").fetchone()[0]
+    assert items == 1
+    store.close()
+
+
+def _append_in_child(path: str):
+    store = SqliteOrderStore(path)
+    store.append_many([_order(f"child_{i}") for i in range(50)])
+    store.close()
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_store_is_shared_across_processes(tmp_path) -> None:
+    path = str(tmp_path / "orders.db")
+    store = SqliteOrderStore(path)
+    store.append(_order("parent"))
+
+    child = multiprocessing.get_context("fork").Process(target=_append_in_child, args=(path,))
+    child.start()
+    child.join()
+
+    assert child.exitcode == 0
+    assert len(store.all()) == 51
+    assert store.last()["id"] == "child_49"
+    store.close()
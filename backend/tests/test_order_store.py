@@ -0,0 +1,198 @@
+import json
+import multiprocessing
+import threading
+
+import pytest
+
+from order_store import OrderStore, OrderWriter
+
+PROCESSES = 4
+THREADS = 4
+ORDERS_PER_THREAD = 150
+
+
+def _open(tmp_path, **kwargs) -> OrderStore:
+    return OrderStore(str(tmp_path / "orders.json"), str(tmp_path / "orders.log"), **kwargs)
+
+
+def _place_orders(tmp_path, worker: int):
+    """Hammer one shared store from several threads of this process."""
+    store = _open(tmp_path, compact_every=97)
+
+    def place(thread: int):
+        for i in range(ORDERS_PER_THREAD):
+            store.append({"id": f"{worker}-{thread}-{i}", "created_at": "", "items": []})
+
+    threads = [threading.Thread(target=place, args=(t,)) for t in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.close()
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_concurrent_appends_from_many_processes(tmp_path) -> None:
+    """Thousands of interleaved appends and compactions lose nothing."""
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=_place_orders, args=(tmp_path, w)) for w in range(PROCESSES)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=120)
+        assert worker.exitcode == 0
+
+    ids = [order["id"] for order in _open(tmp_path).all()]
+    expected = {
+        f"{w}-{t}-{i}" for w in range(PROCESSES) for t in range(THREADS) for i in range(ORDERS_PER_THREAD)
+    }
+    assert len(ids) == len(expected)
+    assert set(ids) == expected
+
+
+def test_store_sees_other_writers(tmp_path) -> None:
+    """A store picks up orders appended and compacted by another store."""
+    mine, theirs = _open(tmp_path), _open(tmp_path, compact_every=2)
+
+    mine.append({"id": "a"})
+    theirs.append({"id": "b"})
+    assert mine.last() == {"id": "b"}
+
+    theirs.append({"id": "c"})  # compacts into a new log file
+    mine.append({"id": "d"})
+
+    assert [o["id"] for o in mine.all()] == ["a", "b", "c", "d"]
+    assert [o["id"] for o in theirs.all()] == ["a", "b", "c", "d"]
+    mine.close()
+    theirs.close()
+
+
+def test_writer_group_commits_queued_orders(tmp_path, monkeypatch) -> None:
+    store = _open(tmp_path)
+    batches = []
+    append_many = store.append_many
+    monkeypatch.setattr(store, "append_many", lambda orders: batches.append(len(orders)) or append_many(orders))
+    writer = OrderWriter(store)
+
+    futures = [writer.submit({"id": str(i)}) for i in range(500)]
+    for future in futures:
+        future.result(timeout=10)
+    writer.close()
+
+    assert [o["id"] for o in store.all()] == [str(i) for i in range(500)]
+    assert sum(batches) == 500
+    assert len(batches) < 500
+    store.close()
+
+
+def test_writer_reports_failures(tmp_path) -> None:
+    store = _open(tmp_path)
+    writer = OrderWriter(store)
+
+    future = writer.submit({"id": "a", "bad": object()})
+    with pytest.raises(TypeError):
+        future.result(timeout=10)
+    writer.submit({"id": "b"}).result(timeout=10)
+    writer.close()
+
+    assert [o["id"] for o in store.all()] == ["b"]
+    store.close()
+
+
+def test_customer_history_follows_other_writers(tmp_path) -> None:
+    reader = _open(tmp_path)
+    writer = _open(tmp_path, compact_every=3)
+
+    # Order ids from different processes can arrive slightly out of order
+    for order_id in ["b", "a", "d", "c", "e"]:
+        writer.append({"id": order_id, "customer_id": "alice"})
+    writer.append({"id": "z", "customer_id": "bob"})
+
+    assert [o["id"] for o in reader.for_customer("alice")] == ["e", "d", "c", "b", "a"]
+    assert [o["id"] for o in reader.for_customer("alice", limit=2, before="d")] == ["c", "b"]
+    assert [o["id"] for o in reader.for_customer("bob")] == ["z"]
+    assert reader.for_customer("carol") == []
+    reader.close()
+    writer.close()
+
+
+def _orders(n: int, start: int = 0) -> list:
+    return [{"id": f"order_{i:04d}", "customer_id": f"c{i % 3}"} for i in range(start, start + n)]
+
+
+def test_reopen_loads_only_the_log(tmp_path) -> None:
+    """History in the snapshot is read through the index, not held in memory."""
+    store = _open(tmp_path, compact_every=50)
+    for start in range(0, 120, 10):
+        store.append_many(_orders(10, start))
+    store.close()
+
+    store = _open(tmp_path, compact_every=50)
+    assert len(store._tail) == 20
+    assert [o["id"] for o in store.for_customer("c0", limit=3)] == ["order_0117", "order_0114", "order_0111"]
+    assert [o["id"] for o in store.for_customer("c0", limit=2, before="order_0006")] == ["order_0003", "order_0000"]
+    assert store.last()["id"] == "order_0119"
+    assert [o["id"] for o in store.iter_orders()] == [o["id"] for o in _orders(120)]
+    store.close()
+
+
+def test_json_array_snapshot_is_converted(tmp_path) -> None:
+    (tmp_path / "orders.json").write_text(json.dumps(_orders(10), indent=2))
+
+    store = _open(tmp_path)
+
+    assert store.all() == _orders(10)
+    assert [o["id"] for o in store.for_customer("c1")] == ["order_0007", "order_0004", "order_0001"]
+    store.close()
+
+
+def test_unreadable_json_array_snapshot_is_kept(tmp_path) -> None:
+    torn = json.dumps(_orders(2), indent=2)[:-20]
+    (tmp_path / "orders.json").write_text(torn)
+
+    store = _open(tmp_path)
+    store.append_many(_orders(2, start=2))
+    store.compact()
+    store.close()
+
+    (aside,) = tmp_path.glob("orders.json.unreadable-*")
+    assert aside.read_text() == torn
+    store = _open(tmp_path)
+    assert [o["id"] for o in store.all()] == ["order_0002", "order_0003"]
+    store.close()
+
+
+def test_missing_index_is_rebuilt(tmp_path) -> None:
+    store = _open(tmp_path)
+    store.append_many(_orders(10))
+    store.compact()
+    store.close()
+    (tmp_path / "orders.json.idx").unlink()
+
+    store = _open(tmp_path)
+
+    assert [o["id"] for o in store.for_customer("c2")] == ["order_0008", "order_0005", "order_0002"]
+    store.close()
+
+
+def test_interrupted_compaction_is_recovered(tmp_path) -> None:
+    """Orders appended to the snapshot but not yet indexed come back once, from the log."""
+    store = _open(tmp_path)
+    store.append_many(_orders(5))
+    store.compact()
+    store.append_many(_orders(3, start=5))
+    store.close()
+    # Crash after extending the snapshot, before writing its index
+    log = (tmp_path / "orders.log").read_bytes()
+    with open(tmp_path / "orders.json", "ab") as f:
+        f.write(log)
+
+    store = _open(tmp_path)
+    assert store.all() == _orders(8)
+    store.compact()
+    store.close()
+
+    store = _open(tmp_path)
+    assert store.all() == _orders(8)
+    assert len((tmp_path / "orders.json").read_text().splitlines()) == 8
+    store.close()
@@ -0,0 +1,133 @@
+import pytest
+
+import merchant
+from catalog import Catalog, write_catalog
+from search import SearchIndex, edit_distance, name_key, tokenize, write_index
+
+
+@pytest.fixture(scope="module")
+def index() -> SearchIndex:
+    return SearchIndex(merchant.CATALOG)
+
+
+def _ids(index: SearchIndex, query: str, **kwargs) -> list:
+    return [index.catalog[pos]["id"] for pos in index.search(query, **kwargs)]
+
+
+def test_tokenize() -> None:
+    assert tokenize("Black T-Shirts, 2 caps & a glass") == ["black", "shirt", "cap", "glass"]
+
+
+@pytest.mark.parametrize(
+    ("a", "b", "limit", "expected"),
+    [("hoody", "hoodie", 2, 2), ("leathr", "leather", 2, 1), ("mug", "bag", 1, 2), ("cap", "cap", 1, 0)],
+)
+def test_edit_distance(a, b, limit, expected) -> None:
+    assert edit_distance(a, b, limit) == expected
+
+
+def test_words_in_name_and_description(index) -> None:
+    assert _ids(index, "warm zip jacket", limit=3)[0] == "hoodie-002"
+    assert _ids(index, "canvas tote")[0] == "bag-005"
+
+
+def test_prefix_and_fuzzy_matches(index) -> None:
+    hoodies = {"hoodie-001", "hoodie-002", "hoodie-003", "hoodie-004"}
+    assert set(_ids(index, "hood")) == hoodies
+    assert set(_ids(index, "hoody")) == hoodies
+    assert "bag-004" in _ids(index, "leathr tote")
+
+
+def test_unknown_words_match_nothing(index) -> None:
+    assert _ids(index, "zzzz qqqq") == []
+
+
+def test_facet_words_are_left_to_filters(index) -> None:
+    """With facets, products are kept even if no other query word matches."""
+    assert _ids(index, "black hoodies", category="hoodie", color="black") == ["hoodie-001"]
+    assert _ids(index, "mugs under 800", category="mug", max_price=800) == ["mug-001", "mug-003", "mug-004"]
+
+
+def test_top_k_agrees_with_full_ranking(index) -> None:
+    for query in ["cotton hoodie", "black cap", "ceramic mug with logo", "travel bag"]:
+        everything = index.search(query)
+        assert index.search(query, limit=3) == everything[:3]
+
+
+def _batches(count: int) -> SearchIndex:
+    products = []
+    for batch in range(count):
+        for product in merchant.CATALOG:
+            products.append(dict(product, id=f"{product['id']}-{batch}", name=f"{product['name']} {batch}"))
+    return SearchIndex(Catalog.from_products(products))
+
+
+def test_top_k_agrees_with_full_ranking_past_the_budget() -> None:
+    """Facets that reject most of a term's postings must not cut the ranking short."""
+    index = _batches(60)  # 1,380 products, well over SCORE_BUDGET
+    for query, facets in [
+        ("bag", {"color": "black"}),
+        ("black", {"category": "mug"}),
+        ("shirt", {"color": "grey"}),
+        ("hoodie", {"max_price": 1500}),
+        ("travel bag", {}),
+    ]:
+        everything = index.search(query, **facets)
+        assert index.search(query, limit=10, **facets) == everything[:10]
+
+
+def test_spent_budget_ranks_what_is_left_exactly(monkeypatch) -> None:
+    monkeypatch.setattr("search.SCORE_BUDGET", 4)
+    index = _batches(20)
+    for query, facets in [
+        ("warm zip hoodie", {}),
+        ("leathr travel bag", {}),
+        ("black ceramic mug", {}),
+        ("cotton grey", {"category": "tshirt"}),
+        ("logo", {"max_price": 800}),
+    ]:
+        everything = index.search(query, **facets)
+        for limit in (1, 10, 30):
+            assert index.search(query, limit=limit, **facets) == everything[:limit]
+
+    # Past EXPAND_BUDGET the best scored so far stand, still a full page
+    monkeypatch.setattr("search.EXPAND_BUDGET", 0)
+    page = index.search("warm zip hoodie", limit=10)
+    assert len(set(page)) == 10
+    assert set(page) <= set(index.search("warm zip hoodie"))
+
+
+def test_search_products_reindexes_on_reload(monkeypatch) -> None:
+    monkeypatch.setattr(merchant, "CATALOG", Catalog.from_products([dict(merchant.CATALOG.get("cap-001"), name="Wool Beanie")]))
+
+    assert [p["id"] for p in merchant.search_products("beanie")] == ["cap-001"]
+
+
+def test_index_file_is_shared_and_checked(tmp_path) -> None:
+    write_catalog(merchant.CATALOG, str(tmp_path / "catalog.bin"))
+    catalog = Catalog.open(str(tmp_path / "catalog.bin"))
+    write_index(catalog, str(tmp_path / "search.bin"))
+
+    mapped = SearchIndex.open(str(tmp_path / "search.bin"), catalog)
+
+    in_memory = SearchIndex(catalog)
+    for query in ["black hoodies", "hoody", "leathr tote", "ceramic mug"]:
+        assert mapped.search(query, limit=5) == in_memory.search(query, limit=5)
+    assert catalog[mapped.named(name_key("Black Logo Hoodies"))]["id"] == "hoodie-001"
+    assert catalog[mapped.numbered("bag", 4)]["id"] == "bag-004"
+    assert mapped.named("blue logo hoodie") is None and mapped.numbered("bag", 9) is None
+    with pytest.raises(ValueError, match="another catalog"):
+        SearchIndex.open(str(tmp_path / "search.bin"), merchant.CATALOG)
+
+
+def test_search_file_is_built_once(tmp_path, monkeypatch) -> None:
+    write_catalog(merchant.CATALOG, str(tmp_path / "catalog.bin"))
+    catalog = Catalog.open(str(tmp_path / "catalog.bin"))
+    monkeypatch.setattr(merchant, "SEARCH_FILE", str(tmp_path / "search.bin"))
+
+    merchant._open_search(catalog)
+    built = (tmp_path / "search.bin").stat().st_ino
+    index = merchant._open_search(catalog)
+
+    assert (tmp_path / "search.bin").stat().st_ino == built
+    assert [catalog[pos]["id"] for pos in index.search("canvas tote", limit=1)] == ["bag-005"]
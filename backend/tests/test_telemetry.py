@@ -0,0 +1,127 @@
+import random
+
+import pytest
+from livekit.agents import metrics
+
+import agent
+import merchant
+import telemetry
+from agent import Assistant
+from telemetry import LatencyHistogram, MetricsAggregator, instrument_tool, span
+
+
+@pytest.fixture(autouse=True)
+def tool_metrics():
+    telemetry.TOOL_METRICS.reset()
+    yield telemetry.TOOL_METRICS
+    telemetry.TOOL_METRICS.reset()
+
+
+def test_histogram_quantiles_are_close() -> None:
+    rng = random.Random(7)
+    samples = [rng.lognormvariate(-4, 1) for _ in range(10_000)]
+    histogram = LatencyHistogram()
+    for sample in samples:
+        histogram.record(sample)
+
+    samples.sort()
+    for fraction in (0.5, 0.95, 0.99):
+        exact = samples[int(fraction * len(samples))]
+        assert histogram.quantile(fraction) == pytest.approx(exact, rel=0.06)
+    assert histogram.count == len(samples)
+    assert histogram.max == samples[-1]
+
+
+async def test_tool_calls_errors_and_spans_are_counted(tool_metrics) -> None:
+    @instrument_tool
+    async def lookup(fail: bool):
+        with span("parse"):
+            pass
+        if fail:
+            raise ValueError("no such product")
+        return "ok"
+
+    assert await lookup(False) == "ok"
+    with pytest.raises(ValueError):
+        await lookup(True)
+    with span("parse"):
+        pass
+
+    summary = tool_metrics.summary()
+    assert summary["lookup"]["calls"] == 2
+    assert summary["lookup"]["errors"] == 1
+    assert summary["lookup.parse"]["calls"] == 2
+    assert summary["parse"]["calls"] == 1
+    assert summary["lookup"]["p50_ms"] <= summary["lookup"]["p99_ms"] <= summary["lookup"]["max_ms"] * 1.05
+
+
+async def test_checkout_times_order_creation(tool_metrics, tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(merchant, "INVENTORY_FILE", str(tmp_path / "inventory.bin"))
+    monkeypatch.setattr(merchant, "ORDERS_FILE", str(tmp_path / "orders.json"))
+    monkeypatch.setattr(merchant, "ORDERS_LOG_FILE", str(tmp_path / "orders.log"))
+    merchant._load_inventory()
+    merchant._load_orders()
+    agent._browse.cache_clear()
+    try:
+        assistant = Assistant(customer_id="alice")
+        await assistant.browse_catalog(None, "black hoodies")
+        await assistant.add_to_cart(None, "hoodie-001", 1, "M")
+        await assistant.checkout(None)
+    finally:
+        merchant._close_orders()
+        merchant._close_inventory()
+
+    assert {
+        "browse_catalog",
+        "browse_catalog.parse_query",
+        "browse_catalog.search_products",
+        "add_to_cart.reserve_items",
+        "checkout",
+        "checkout.create_order",
+        "checkout.persist",
+    } <= set(tool_metrics.summary())
+
+
+def test_metrics_are_folded_into_windows(caplog) -> None:
+    aggregator = MetricsAggregator()
+    for ttft in (0.3, 0.4, -1.0):  # the last was cancelled before its first token
+        aggregator.collect(
+            metrics.LLMMetrics(
+                label="llm", request_id="r", timestamp=0, duration=1.0, ttft=ttft, cancelled=ttft < 0,
+                completion_tokens=10, prompt_tokens=100, prompt_cached_tokens=0,
+                total_tokens=110, tokens_per_second=10.0,
+            )
+        )
+    aggregator.collect(
+        metrics.TTSMetrics(
+            label="tts", request_id="r", timestamp=0, ttfb=0.2, duration=1.0,
+            audio_duration=2.5, cancelled=False, characters_count=40, streamed=True,
+        )
+    )
+
+    with caplog.at_level("INFO", logger="telemetry"):
+        summary = aggregator.flush()
+
+    assert summary["events"] == {"llm_metrics": 3, "tts_metrics": 1}
+    assert summary["llm.ttft"]["count"] == 2
+    assert summary["llm.ttft"]["p50_ms"] == pytest.approx(400, rel=0.06)
+    assert summary["tts.ttfb"]["p99_ms"] == pytest.approx(200, rel=0.06)
+    assert summary["llm.prompt_tokens"] == 300
+    assert summary["tts.audio_duration"] == 2.5
+    assert len(caplog.records) == 1
+    assert aggregator.summary()["events"] == {}
+    aggregator.flush()  # an empty window isn't logged
+    assert len(caplog.records) == 1
+
+
+def test_windows_carry_tool_latency(tool_metrics) -> None:
+    tool_metrics.record("browse_catalog", 0.02)
+    aggregator = MetricsAggregator(tools=tool_metrics)
+
+    first = aggregator.flush()
+    tool_metrics.record("browse_catalog", 0.03)
+    second = aggregator.flush()
+
+    assert first["tools"]["browse_catalog"]["calls"] == 1
+    assert second["tools"]["browse_catalog"]["calls"] == 2
+    assert "tools" not in MetricsAggregator().summary()
@@ -0,0 +1,242 @@
+import re
+import threading
+
+import pytest
+
+import agent
+import merchant
+from agent import Assistant, parse_query
+
+
+@pytest.fixture(autouse=True)
+def stock(tmp_path, monkeypatch):
+    """Keep carts' stock holds in a scratch stock file."""
+    monkeypatch.setattr(merchant, "INVENTORY_FILE", str(tmp_path / "inventory.bin"))
+    merchant._load_inventory()
+    yield
+    merchant._close_inventory()
+
+
+def _legacy_parse(query_lower: str) -> dict:
+    """The keyword spotting browse_catalog did before the compiled parser."""
+    filters = {}
+    if "mug" in query_lower or "cup" in query_lower:
+        filters["category"] = "mug"
+    elif "hoodie" in query_lower:
+        filters["category"] = "hoodie"
+    elif "tshirt" in query_lower or "t-shirt" in query_lower or "tee" in query_lower or "shirt" in query_lower:
+        filters["category"] = "tshirt"
+    elif "cap" in query_lower or "hat" in query_lower:
+        filters["category"] = "cap"
+    elif "bag" in query_lower:
+        filters["category"] = "bag"
+    for color in ["black", "white", "blue", "grey", "gray", "red", "brown", "green", "navy"]:
+        if color in query_lower:
+            filters["color"] = color if color != "gray" else "grey"
+            break
+    price_match = re.search(r"under\s+(\d+)", query_lower)
+    if price_match:
+        filters["max_price"] = int(price_match.group(1))
+    return filters
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "black hoodies",
+        "show me caps and mugs",
+        "a gray t-shirt under 600",
+        "navy blue tee",
+        "bags under 2000 or under 500",
+        "something nice",
+        "white cup under   900",
+    ],
+)
+def test_parse_query_matches_keyword_spotting(query) -> None:
+    assert parse_query(query) == _legacy_parse(query)
+
+
+async def test_repeated_browse_is_cached(monkeypatch) -> None:
+    """A repeated query is answered without parsing or searching again."""
+    calls = []
+    search_products = agent.search_products
+    monkeypatch.setattr(
+        agent, "search_products", lambda query, *args, **kwargs: calls.append(args) or search_products(query, *args, **kwargs)
+    )
+    agent._browse.cache_clear()
+    assistant = Assistant()
+
+    first = await assistant.browse_catalog(None, "Black  Hoodies")
+    assistant.last_products = []
+    second = await assistant.browse_catalog(None, "black hoodies")
+
+    assert first == second
+    assert "hoodie-001" in first
+    assert calls == [({"category": "hoodie", "color": "black"},)]
+    assert [p["id"] for p in assistant.last_products] == ["hoodie-001"]
+
+
+async def test_browse_finds_misheard_words() -> None:
+    agent._browse.cache_clear()
+
+    result = await Assistant().browse_catalog(None, "a warm hoody with a zip")
+
+    assert result.splitlines()[1].startswith("1. Grey Zip Hoodie (ID: hoodie-002)")
+
+
+async def test_browse_pages_through_results() -> None:
+    agent._browse.cache_clear()
+    assistant = Assistant()
+
+    first = await assistant.browse_catalog(None, "anything at all")
+    assert first.startswith(f"Found {agent.BROWSE_PAGE_SIZE} product(s):")
+    assert "More products are available" in first
+
+    second = await assistant.show_more_products(None)
+    assert second.startswith(f"Found {agent.BROWSE_PAGE_SIZE} more product(s):")
+    assert f"\n{agent.BROWSE_PAGE_SIZE + 1}. " in second
+    assert len(assistant.last_products) == 2 * agent.BROWSE_PAGE_SIZE
+
+    while assistant.browse_cursor is not None:
+        await assistant.show_more_products(None)
+    assert [p["id"] for p in assistant.last_products] == [p["id"] for p in agent.list_products()]
+    assert await assistant.show_more_products(None) == "There are no more products for that search."
+
+
+class _Session:
+    def __init__(self):
+        self.spoken = []
+
+    def say(self, text):
+        self.spoken.append(text)
+
+
+class _Context:
+    def __init__(self):
+        self.session = _Session()
+
+
+async def test_streaming_browse_speaks_products(monkeypatch) -> None:
+    """With streaming on, products go straight to TTS and the LLM is told not to repeat them."""
+    monkeypatch.setattr(agent, "BROWSE_STREAMING", True)
+    agent._browse.cache_clear()
+    context = _Context()
+
+    result = await Assistant().browse_catalog(context, "black hoodies")
+
+    assert result.endswith(agent.BROWSE_STREAMED_NOTE)
+    assert "hoodie-001" in result
+    (stream,) = context.session.spoken
+    lines = [line async for line in stream]
+    assert lines[0] == "I found 1 product. "
+    assert lines[1] == "Number 1, Black Logo Hoodie, 1499 rupees, available in sizes S, M, L, XL. "
+    assert lines[-1] == "Which one would you like?"
+
+
+async def test_adding_unknown_product_asks_again() -> None:
+    assistant = Assistant()
+
+    result = await assistant.add_to_cart(None, "a unicorn onesie")
+
+    assert result.startswith("Sorry, I couldn't find a product matching 'a unicorn onesie'")
+    assert assistant.cart == {}
+
+
+async def test_cart_add_update_remove() -> None:
+    """Adds merge by product and size; a bad size is refused without touching the cart."""
+    assistant = Assistant()
+    await assistant.add_to_cart(None, "hoodie-001", 1, "l")
+    await assistant.add_to_cart(None, "hoodie-001", 2, "L")
+    await assistant.add_to_cart(None, "Stoneware Coffee Mug")
+
+    refused = await assistant.add_to_cart(None, "hoodie-001", 1, "XXS")
+    assert refused.startswith("Sorry, I couldn't add that to the cart")
+    assert assistant.cart == {("hoodie-001", "L"): 3, ("mug-001", None): 1}
+
+    await assistant.update_cart_item(None, "mug-001", 4)
+    await assistant.remove_from_cart(None, "Black Logo Hoodie")
+    result = await assistant.view_cart(None)
+
+    assert assistant.cart == {("mug-001", None): 4}
+    assert result == "Cart:\n- 4 x Stoneware Coffee Mug: INR 3200\nTotal: INR 3200"
+    assert merchant.stock_level("hoodie-001", "L") == 30
+    assert merchant.stock_level("mug-001") == 56
+
+
+async def test_cart_holds_stock_until_released() -> None:
+    assistant = Assistant()
+    await assistant.add_to_cart(None, "hoodie-001", 10, "S")
+    other = Assistant()
+
+    result = await other.add_to_cart(None, "hoodie-001", 10, "S")
+    await assistant.update_cart_item(None, "hoodie-001", 4)
+
+    assert result == "Sorry, I couldn't add that to the cart: Only 5 Black Logo Hoodie in size S left in stock"
+    assert merchant.stock_level("hoodie-001", "S") == 11
+    await assistant.release_cart()
+    assert merchant.stock_level("hoodie-001", "S") == 15
+
+
+async def test_cart_refuses_bad_quantities_and_full_hold_tables(tmp_path, monkeypatch) -> None:
+    assistant = Assistant()
+    await assistant.add_to_cart(None, "cap-001", 2)
+
+    refused = await assistant.add_to_cart(None, "cap-001", -1)
+    assert refused.startswith("The quantity to add must be at least 1")
+    assert assistant.cart == {("cap-001", None): 2}
+
+    merchant._close_inventory()
+    monkeypatch.setattr(merchant, "INVENTORY_FILE", str(tmp_path / "one-hold.bin"))
+    monkeypatch.setattr(merchant, "INVENTORY_HOLDS", 1)
+    merchant._load_inventory()
+    shopper = Assistant()
+    await shopper.add_to_cart(None, "hoodie-001", 1, "M")
+
+    result = await shopper.add_to_cart(None, "mug-001")
+
+    assert result == "Sorry, I can't reserve that right now; please try again in a moment."
+    assert shopper.cart == {("hoodie-001", "M"): 1}
+
+
+async def test_checkout_places_one_order(monkeypatch) -> None:
+    placed = []
+
+    async def create_order_async(line_items, customer_id=None, reservations=None):
+        placed.append((line_items, customer_id))
+        assert [r.quantity for r in reservations] == [1, 2]
+        return {"id": "order-1", "items": [], "total": 0, "currency": "INR"}
+
+    monkeypatch.setattr(agent, "create_order_async", create_order_async)
+    assistant = Assistant(customer_id="alice")
+    await assistant.add_to_cart(None, "hoodie-001", 1, "M")
+    await assistant.add_to_cart(None, "cap-001", 2)
+
+    result = await assistant.checkout(None)
+
+    assert result.startswith("Order order-1 created successfully!")
+    assert placed == [
+        (
+            [
+                {"product_id": "hoodie-001", "quantity": 1, "size": "M"},
+                {"product_id": "cap-001", "quantity": 2, "size": None},
+            ],
+            "alice",
+        )
+    ]
+    assert assistant.cart == {}
+    assert await assistant.checkout(None) == "The cart is empty, so there is nothing to order yet."
+
+
+async def test_order_history_is_read_off_the_event_loop(monkeypatch) -> None:
+    threads = []
+
+    def get_orders(customer_id, limit=10):
+        threads.append(threading.get_ident())
+        return [{"id": "order-1", "items": [], "total": 0, "currency": "INR", "created_at": "2025-01-01T10:00:00"}]
+
+    monkeypatch.setattr(agent, "get_orders", get_orders)
+
+    result = await Assistant(customer_id="alice").get_order_history(None)
+
+    assert result.startswith("Your last order (order-1)")
+    assert threads and threads[0] != threading.get_ident()